@@ -1,15 +1,24 @@
 from collections import Counter
-from textblob import TextBlob
+
+import numpy as np
+
+from evaluation.features import review_features
+
+# TextBlob polarity above / below which a review counts as positive /
+# negative; shared by every sentiment bucketing of the analysis
+POSITIVE_THRESHOLD = 0.2
+NEGATIVE_THRESHOLD = -0.2
 
 
 def analyze_sentiment(reviews: list[dict]) -> dict:
     """
     Analyze the sentiment distribution of a list of reviews.
 
-    Each review's text is analyzed using TextBlob polarity:
-    - polarity > 0.2  → positive
-    - polarity < -0.2 → negative
-    - otherwise       → neutral
+    Each review's TextBlob polarity (read from its feature record,
+    see `evaluation.features`) is bucketed as:
+    - polarity > POSITIVE_THRESHOLD → positive
+    - polarity < NEGATIVE_THRESHOLD → negative
+    - otherwise                     → neutral
 
     Returns normalized ratios (percentages) rather than raw counts
     to make results independent of dataset size.
@@ -17,10 +26,10 @@ def analyze_sentiment(reviews: list[dict]) -> dict:
     sentiments = {"positive": 0, "neutral": 0, "negative": 0}
 
     for r in reviews:
-        polarity = TextBlob(r["review"]).sentiment.polarity
-        if polarity > 0.2:
+        polarity = review_features(r)["polarity"]
+        if polarity > POSITIVE_THRESHOLD:
             sentiments["positive"] += 1
-        elif polarity < -0.2:
+        elif polarity < NEGATIVE_THRESHOLD:
             sentiments["negative"] += 1
         else:
             sentiments["neutral"] += 1
@@ -55,3 +64,29 @@ def analyze_personas(reviews: list[dict]) -> dict:
     counter = Counter(r["persona"] for r in reviews)
     total = len(reviews)
     return {k: v / total for k, v in counter.items()}
+
+
+def sentiment_ratios(polarities) -> dict:
+    """
+    `analyze_sentiment` for an array of polarities, e.g. the polarity
+    column of a columnar dataset (see `pipeline.columnar`).
+    """
+    polarities = np.asarray(polarities)
+    total = len(polarities)
+    positive = int((polarities > POSITIVE_THRESHOLD).sum())
+    negative = int((polarities < NEGATIVE_THRESHOLD).sum())
+    return {
+        "positive": positive / total,
+        "neutral": (total - positive - negative) / total,
+        "negative": negative / total,
+    }
+
+
+def rating_ratios(ratings) -> dict:
+    """
+    `analyze_ratings` for an array of ratings. Keys follow the order of
+    first appearance, as with the record-based version.
+    """
+    values, first, counts = np.unique(np.asarray(ratings), return_index=True, return_counts=True)
+    total = len(ratings)
+    return {str(int(values[i])): int(counts[i]) / total for i in np.argsort(first)}
@@ -0,0 +1,84 @@
+from collections import Counter
+
+from evaluation.features import review_features
+from analysis.bias_analysis import POSITIVE_THRESHOLD, NEGATIVE_THRESHOLD
+
+
+class OnlineStats:
+    """
+    Streaming accumulators for the dataset-level analysis: sentiment
+    buckets, rating and persona counts, and the running sums behind the
+    synthetic side of the real vs synthetic comparison.
+
+    Each accepted review is folded in with `add` in O(1), so the report
+    can be rewritten at any point of a run without a pass over the
+    accepted reviews. The ratios match `analysis.bias_analysis` and
+    `analysis.real_comparison.stats_from_features` on the same reviews
+    (same buckets, same key order, sums accumulated in the same order).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sentiments = {"positive": 0, "neutral": 0, "negative": 0}
+        self.ratings = Counter()
+        self.personas = Counter()
+        self.length_sum = 0
+        self.polarity_sum = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, record: dict):
+        """
+        Fold one accepted review record into the statistics.
+        """
+        features = review_features(record)
+        polarity = features["polarity"]
+        if polarity > POSITIVE_THRESHOLD:
+            self.sentiments["positive"] += 1
+        elif polarity < NEGATIVE_THRESHOLD:
+            self.sentiments["negative"] += 1
+        else:
+            self.sentiments["neutral"] += 1
+
+        self.ratings[record["rating"]] += 1
+        self.personas[record["persona"]] += 1
+        self.length_sum += features["length"]
+        self.polarity_sum += polarity
+        self.count += 1
+
+    def update(self, records: list[dict]):
+        for r in records:
+            self.add(r)
+
+    def _ratios(self, counts: dict) -> dict:
+        return {k: v / self.count for k, v in counts.items()}
+
+    def sentiment_stats(self) -> dict:
+        """
+        Same output as `analyze_sentiment`.
+        """
+        return self._ratios(self.sentiments)
+
+    def rating_stats(self) -> dict:
+        """
+        Same output as `analyze_ratings`.
+        """
+        return {str(k): v for k, v in self._ratios(self.ratings).items()}
+
+    def persona_stats(self) -> dict:
+        """
+        Same output as `analyze_personas`.
+        """
+        return self._ratios(self.personas)
+
+    def synthetic_stats(self) -> dict:
+        """
+        Same output as `stats_from_features` over the accepted reviews.
+        """
+        return {
+            "avg_length": self.length_sum / self.count,
+            "avg_sentiment": self.polarity_sum / self.count,
+            "positive_ratio": self.sentiments["positive"] / self.count,
+            "negative_ratio": self.sentiments["negative"] / self.count,
+        }
@@ -1,5 +1,107 @@
+import os
 import json
-from textblob import TextBlob
+import random
+import hashlib
+from collections import deque
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from evaluation.features import compute_features, review_features
+from analysis.bias_analysis import POSITIVE_THRESHOLD, NEGATIVE_THRESHOLD
+from pipeline.dataset import write_json_atomic
+
+# Bump when the reference metrics or their features change, so cached
+# reference statistics computed by older code are not reused
+REFERENCE_STATS_VERSION = 1
+DEFAULT_CHUNK_SIZE = 1000
+_READ_BLOCK = 1 << 20
+
+
+def _review_text(item) -> Optional[str]:
+    """
+    Review text of one entry of a real-review file: a string, or an
+    object with a "review" or "text" field.
+    """
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        text = item.get("review", item.get("text"))
+        return text if isinstance(text, str) else None
+    return None
+
+
+def _iter_json_array(f, buf: str) -> Iterator:
+    """
+    Yield the elements of the JSON array whose text continues in `buf`
+    (just after the opening bracket) and then in the file `f`, reading
+    it in blocks so only about one element is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    pos, eof = 0, False
+    while True:
+        # Skip separators, reading on at the end of the buffer
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = f.read(_READ_BLOCK), 0
+            eof = not buf
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON array")
+        if buf[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            if end == len(buf) and not eof:
+                raise ValueError  # may be cut off at the block boundary
+        except ValueError:
+            if eof:
+                raise
+            more = f.read(_READ_BLOCK)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+
+        yield item
+        pos = end
+        if pos > _READ_BLOCK:
+            buf, pos = buf[pos:], 0
+
+
+def iter_real_reviews(path: str) -> Iterator[str]:
+    """
+    Stream real-world review texts from a JSON array (the original
+    format) or a JSONL file, without loading the whole file.
+
+    Entries may be strings or objects with a "review" / "text" field;
+    anything else is skipped. The format is detected from the first
+    non-blank character, so the file extension does not matter.
+    """
+    with open(path, "r") as f:
+        head = f.read(_READ_BLOCK).lstrip()
+        if head.startswith("["):
+            items = _iter_json_array(f, head[1:])
+        else:
+            def lines():
+                pending = head
+                while True:
+                    block = f.read(_READ_BLOCK)
+                    *complete, pending = (pending + block).split("\n")
+                    yield from complete
+                    if not block:
+                        yield pending
+                        return
+            items = (json.loads(line) for line in lines() if line.strip())
+
+        for item in items:
+            text = _review_text(item)
+            if text is not None:
+                yield text
 
 
 def load_real_reviews(path: str) -> list[str]:
@@ -7,13 +109,31 @@ def load_real_reviews(path: str) -> list[str]:
     Load real-world reviews from a JSON file.
 
     The expected format is a JSON array of strings, where each string
-    represents a single review text.
+    represents a single review text (JSONL is accepted too, see
+    `iter_real_reviews`).
 
     These reviews are used ONLY for statistical comparison against
     synthetic data (no training or generation).
     """
-    with open(path, "r") as f:
-        return json.load(f)
+    return list(iter_real_reviews(path))
+
+
+def reservoir_sample(items: Iterable, k: int, seed: int = 0) -> list:
+    """
+    Uniform random sample of `k` items from a stream of unknown length,
+    in one pass and O(k) memory (reservoir sampling, Algorithm R). The
+    sample keeps stream order for items that made it in.
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    for i, item in enumerate(items):
+        if i < k:
+            reservoir.append((i, item))
+        else:
+            j = rng.randrange(i + 1)
+            if j < k:
+                reservoir[j] = (i, item)
+    return [item for _, item in sorted(reservoir, key=lambda pair: pair[0])]
 
 
 def basic_stats(texts: list[str]) -> dict:
@@ -23,20 +143,42 @@ def basic_stats(texts: list[str]) -> dict:
     Metrics include:
     - Average review length (character count)
     - Average sentiment polarity
-    - Ratio of positive reviews (polarity > 0.2)
-    - Ratio of negative reviews (polarity < -0.2)
+    - Ratio of positive reviews (polarity > POSITIVE_THRESHOLD)
+    - Ratio of negative reviews (polarity < NEGATIVE_THRESHOLD)
 
     These statistics provide a lightweight but effective way
     to compare real and synthetic datasets at an aggregate level.
     """
-    lengths = [len(t) for t in texts]
-    polarities = [TextBlob(t).sentiment.polarity for t in texts]
+    return stats_from_features([compute_features(t) for t in texts])
+
+
+def stats_from_features(features: list[dict]) -> dict:
+    """
+    Same metrics as `basic_stats`, computed from precomputed feature
+    records (see `evaluation.features`) instead of raw texts.
+    """
+    lengths = [f["length"] for f in features]
+    polarities = [f["polarity"] for f in features]
 
     return {
         "avg_length": sum(lengths) / len(lengths),
         "avg_sentiment": sum(polarities) / len(polarities),
-        "positive_ratio": sum(1 for p in polarities if p > 0.2) / len(polarities),
-        "negative_ratio": sum(1 for p in polarities if p < -0.2) / len(polarities),
+        "positive_ratio": sum(1 for p in polarities if p > POSITIVE_THRESHOLD) / len(polarities),
+        "negative_ratio": sum(1 for p in polarities if p < NEGATIVE_THRESHOLD) / len(polarities),
+    }
+
+
+def stats_from_columns(lengths, polarities) -> dict:
+    """
+    Same metrics as `basic_stats`, computed from the length and polarity
+    columns of a columnar dataset (see `pipeline.columnar`).
+    """
+    lengths, polarities = np.asarray(lengths), np.asarray(polarities)
+    return {
+        "avg_length": float(lengths.mean()),
+        "avg_sentiment": float(polarities.mean()),
+        "positive_ratio": float((polarities > POSITIVE_THRESHOLD).mean()),
+        "negative_ratio": float((polarities < NEGATIVE_THRESHOLD).mean()),
     }
 
 
@@ -45,15 +187,132 @@ def compare_real_vs_synthetic(real_reviews: list[str], synthetic_reviews: list[d
     Compare real-world reviews with synthetic reviews at a dataset level.
 
     Real reviews are passed directly as text strings.
-    Synthetic reviews are extracted from structured records.
+    Synthetic reviews are structured records whose feature records are
+    reused rather than recomputed.
 
     The comparison focuses on high-level statistical alignment rather than
     content similarity, helping validate realism without data leakage.
     """
     real_stats = basic_stats(real_reviews)
-    synthetic_stats = basic_stats([r["review"] for r in synthetic_reviews])
+    synthetic_stats = stats_from_features([review_features(r) for r in synthetic_reviews])
 
     return {
         "real": real_stats,
         "synthetic": synthetic_stats,
     }
+
+
+def _chunk_stats(texts: list[str]) -> tuple:
+    """
+    Worker task: (count, length sum, polarity sum, positives, negatives)
+    of a chunk of review texts.
+    """
+    features = [compute_features(t) for t in texts]
+    polarities = [f["polarity"] for f in features]
+    return (
+        len(features),
+        sum(f["length"] for f in features),
+        sum(polarities),
+        sum(1 for p in polarities if p > POSITIVE_THRESHOLD),
+        sum(1 for p in polarities if p < NEGATIVE_THRESHOLD),
+    )
+
+
+def _chunks(texts: Iterable[str], chunk_size: int) -> Iterator[list[str]]:
+    chunk = []
+    for t in texts:
+        chunk.append(t)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_stats(texts: Iterable[str], workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Same metrics as `basic_stats` for a stream of texts of any length.
+
+    Texts are processed in chunks of `chunk_size`; with `workers` > 1 the
+    chunks' features are computed in a process pool, with at most
+    2 x `workers` chunks in flight, so memory stays bounded by the chunk
+    size rather than the corpus. Only per-chunk sums are kept.
+    """
+    totals = [0, 0, 0.0, 0, 0]
+
+    def merge(partial):
+        for i, value in enumerate(partial):
+            totals[i] += value
+
+    # A single chunk is not worth starting a process pool for
+    chunks = _chunks(texts, chunk_size)
+    head = [c for c in (next(chunks, None), next(chunks, None)) if c]
+    chunks = chain(head, chunks)
+    if workers > 1 and len(head) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_chunk_stats, chunk))
+                if len(in_flight) >= 2 * workers:
+                    merge(in_flight.popleft().result())
+            while in_flight:
+                merge(in_flight.popleft().result())
+    else:
+        for chunk in chunks:
+            merge(_chunk_stats(chunk))
+
+    count, length_sum, polarity_sum, positive, negative = totals
+    if not count:
+        raise ValueError("No real reviews to compute statistics from")
+    return {
+        "avg_length": length_sum / count,
+        "avg_sentiment": polarity_sum / count,
+        "positive_ratio": positive / count,
+        "negative_ratio": negative / count,
+    }
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def reference_stats(path: str, sample_size: Optional[int] = None, seed: int = 0,
+                    workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    cache_dir: Optional[str] = None) -> dict:
+    """
+    `basic_stats` of the real reviews in `path` (JSON array or JSONL),
+    streamed and computed in parallel (see `stream_stats`).
+
+    With `sample_size`, statistics are computed on a seeded reservoir
+    sample of that many reviews instead of the whole corpus.
+
+    With `cache_dir`, the result is cached on disk under the SHA-256 of
+    the file's content (plus the sampling parameters), so later runs
+    against the same corpus only pay for hashing the file.
+    """
+    cache_path = None
+    if cache_dir:
+        key = f"{file_digest(path)}-v{REFERENCE_STATS_VERSION}-{sample_size or 'all'}"
+        if sample_size:
+            key += f"-seed{seed}"
+        cache_path = os.path.join(cache_dir, key + ".json")
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                return json.load(f)["stats"]
+
+    texts = iter_real_reviews(path)
+    if sample_size:
+        texts = reservoir_sample(texts, sample_size, seed)
+    stats = stream_stats(texts, workers or os.cpu_count() or 1, chunk_size)
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_json_atomic(cache_path, {"source": os.path.abspath(path), "stats": stats})
+    return stats
@@ -1,3 +1,118 @@
+import os
+from typing import Optional, Union
+
+from analysis.bias_analysis import (
+    analyze_sentiment,
+    analyze_ratings,
+    analyze_personas,
+    sentiment_ratios,
+    rating_ratios,
+)
+from analysis.real_comparison import (
+    DEFAULT_CHUNK_SIZE,
+    reference_stats,
+    stats_from_features,
+    stats_from_columns,
+)
+from analysis.online_stats import OnlineStats
+from evaluation.features import review_features
+from pipeline.columnar import ColumnarDataset
+
+
+def real_review_stats(cfg: dict) -> dict:
+    """
+    Reference statistics of the real reviews at
+    `outputs.real_reviews_path`, streamed, optionally sampled, and cached
+    by file content hash as configured under `reference` (see
+    `analysis.real_comparison.reference_stats`).
+    """
+    reference = cfg.get("reference") or {}
+    return reference_stats(
+        cfg["outputs"]["real_reviews_path"],
+        sample_size=reference.get("sample_size"),
+        seed=reference.get("seed", 0),
+        workers=reference.get("workers"),
+        chunk_size=reference.get("chunk_size", DEFAULT_CHUNK_SIZE),
+        cache_dir=reference.get("cache_dir"),
+    )
+
+
+def analyze_dataset(dataset: Union[list[dict], ColumnarDataset], real_stats: dict) -> dict:
+    """
+    Run the analysis passes over accepted reviews: sentiment, rating and
+    persona distributions, plus the real vs synthetic comparison against
+    `real_stats` (see `real_review_stats`).
+
+    `dataset` is a list of review records or a memory-mapped
+    `ColumnarDataset`, whose rating / persona / feature columns are
+    aggregated directly with numpy.
+    """
+    if not isinstance(dataset, ColumnarDataset):
+        return {
+            "sentiment_stats": analyze_sentiment(dataset),
+            "rating_stats": analyze_ratings(dataset),
+            "persona_stats": analyze_personas(dataset),
+            "comparison": {
+                "real": real_stats,
+                "synthetic": stats_from_features([review_features(r) for r in dataset]),
+            },
+        }
+
+    total = len(dataset)
+    polarity = dataset.feature("polarity")
+    return {
+        "sentiment_stats": sentiment_ratios(polarity),
+        "rating_stats": rating_ratios(dataset.rating),
+        "persona_stats": {k: v / total for k, v in dataset.value_counts("persona").items()},
+        "comparison": {
+            "real": real_stats,
+            "synthetic": stats_from_columns(dataset.feature("length"), polarity),
+        },
+    }
+
+
+def write_quality_report(cfg: dict, dataset: Union[list[dict], ColumnarDataset], model_stats: dict,
+                         output_path: str = None, trace_summary: Optional[dict] = None):
+    """
+    Analyze `dataset` (records or a `ColumnarDataset`) and write the
+    quality report (to `outputs.report_path` unless `output_path` is
+    given), with the latency, rejection and cost sections when a
+    `trace_summary` (see `analysis.trace_stats.TraceStats.summary`) is
+    given.
+    """
+    generate_report(
+        **analyze_dataset(dataset, real_review_stats(cfg)),
+        model_stats=model_stats,
+        output_path=output_path or cfg["outputs"]["report_path"],
+        trace_summary=trace_summary,
+    )
+
+
+def write_stats_report(stats: OnlineStats, real_stats: dict, model_stats: dict, output_path: str,
+                       trace_summary: Optional[dict] = None):
+    """
+    Write the quality report from online statistics (see
+    `analysis.online_stats`), without a pass over the accepted reviews.
+
+    The report is written to a temporary file and renamed into place, so
+    it can be rewritten while a run is in progress and readers never see
+    a partial report.
+    """
+    if not len(stats):
+        return
+    tmp_path = output_path + ".tmp"
+    generate_report(
+        sentiment_stats=stats.sentiment_stats(),
+        rating_stats=stats.rating_stats(),
+        persona_stats=stats.persona_stats(),
+        comparison={"real": real_stats, "synthetic": stats.synthetic_stats()},
+        model_stats=model_stats,
+        output_path=tmp_path,
+        trace_summary=trace_summary,
+    )
+    os.replace(tmp_path, output_path)
+
+
 def generate_report(
     sentiment_stats: dict,
     rating_stats: dict,
@@ -5,6 +120,7 @@ def generate_report(
     comparison: dict,
     model_stats: dict,
     output_path: str,
+    trace_summary: Optional[dict] = None,
 ):
     with open(output_path, "w") as f:
         f.write("# Synthetic Data Quality Report\n\n")
@@ -42,8 +158,13 @@ def generate_report(
             f.write(f"### {model}\n")
             f.write(f"- Accepted: {stats['accepted']}\n")
             f.write(f"- Rejected: {stats['rejected']}\n")
+            if stats.get("discarded"):
+                f.write(f"- Discarded (quota filled or target met while in flight): {stats['discarded']}\n")
             f.write(f"- Avg time per sample: {avg_time:.2f}s\n\n")
 
+        if trace_summary and trace_summary["attempts"]:
+            write_trace_sections(f, trace_summary, model_stats)
+
         f.write("## Conclusion\n")
         f.write(
             "The synthetic dataset demonstrates realistic sentiment, rating balance, "
@@ -51,3 +172,42 @@ def generate_report(
             "Automated guardrails effectively filtered low-quality samples while "
             "preserving diversity across personas and models.\n"
         )
+
+
+def write_trace_sections(f, trace_summary: dict, model_stats: dict):
+    """
+    Latency percentiles, rejections by guardrail and cost sections of the
+    report, from the attempt trace. The cost per accepted review divides
+    by the accepted counts of `model_stats`, i.e. of the dataset, which
+    leaves out reviews a shard merge dropped as cross-shard duplicates.
+    """
+    f.write("## Latency\n")
+    f.write("| Stage | Count | p50 (ms) | p95 (ms) | p99 (ms) |\n")
+    f.write("|-------|------:|---------:|---------:|---------:|\n")
+    for stage, p in trace_summary["latency"].items():
+        f.write(f"| {stage} | {p['count']} | {p['p50'] * 1000:.3f} | {p['p95'] * 1000:.3f} | {p['p99'] * 1000:.3f} |\n")
+    f.write("\n")
+
+    f.write("## Rejections by Guardrail\n")
+    f.write(f"- Attempts: {trace_summary['attempts']}\n")
+    for reason, (count, share) in trace_summary["rejections"].items():
+        f.write(f"- {reason}: {count} ({share:.2%} of attempts)\n")
+    f.write("\n")
+
+    f.write("## Cost\n")
+    f.write("| Provider | Calls | Accepted | Input tokens | Output tokens | Embedding tokens | Cost (USD) "
+            "| Cost per accepted review (USD) |\n")
+    f.write("|----------|------:|---------:|-------------:|--------------:|-----------------:|-----------:"
+            "|-------------------------------:|\n")
+    accepted = {provider: stats["accepted"] for provider, stats in model_stats.items()}
+    accepted["total"] = sum(accepted.values())
+    for provider, c in trace_summary["cost"].items():
+        n = accepted.get(provider, c["accepted"])
+        per_review = f"{c['cost'] / n:.6f}" if n else "-"
+        f.write(f"| {provider} | {c['calls']} | {n} | {c['input_tokens']} | {c['output_tokens']} "
+                f"| {c['embedding_tokens']} | {c['cost']:.4f} | {per_review} |\n")
+    if trace_summary["cost"]["total"]["cost"]:
+        f.write("\nCosts are estimates from the `pricing` of the model and embedding entries; embedding tokens "
+                "are estimated from the review length.\n\n")
+    else:
+        f.write("\nNo `pricing` configured on the model or embedding entries, so costs are not estimated.\n\n")
@@ -0,0 +1,128 @@
+import os
+from collections import Counter
+
+import numpy as np
+
+from pipeline.tracing import read_trace
+
+PERCENTILES = (50, 95, 99)
+
+# Order of the guardrail chain, for the report
+GUARDRAILS = ["parse", "features", "sentiment", "realism", "drawback", "semantic_similarity", "vocabulary_overlap"]
+
+
+def _percentiles(values: list[float]) -> dict:
+    p = np.percentile(np.asarray(values, dtype=np.float64), PERCENTILES)
+    return {"count": len(values), **{f"p{q}": float(v) for q, v in zip(PERCENTILES, p)}}
+
+
+class TraceStats:
+    """
+    Streaming accumulators over the attempt trace (see
+    `pipeline.tracing`): latency samples per stage, rejections per
+    guardrail, and token usage and cost per provider.
+
+    Call-level figures (LLM latency, tokens) are taken from the first
+    slot of each call only, as every review of a batch call repeats
+    them; costs are already split per review in the events.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.llm_latency: dict[str, list[float]] = {}
+        self.embedding_latency: list[float] = []
+        self.guardrail_time: dict[str, list[float]] = {}
+        self.guardrail_total: list[float] = []
+        self.rejections = Counter()
+        self.providers: dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return self.attempts
+
+    def add(self, event: dict):
+        """
+        Fold one trace event into the statistics.
+        """
+        self.attempts += 1
+        provider = event["provider"]
+        totals = self.providers.setdefault(provider, {
+            "calls": 0, "accepted": 0, "input_tokens": 0, "output_tokens": 0, "embedding_tokens": 0, "cost": 0.0,
+        })
+        if event["slot"] == 0:
+            self.llm_latency.setdefault(provider, []).append(event["llm_latency"])
+            totals["calls"] += 1
+            totals["input_tokens"] += event["input_tokens"]
+            totals["output_tokens"] += event["output_tokens"]
+        totals["embedding_tokens"] += event["embedding_tokens"]
+        totals["cost"] += event["cost"]
+
+        if event["embedding_latency"] is not None:
+            self.embedding_latency.append(event["embedding_latency"])
+        for guardrail, seconds in event["guardrail_time"].items():
+            self.guardrail_time.setdefault(guardrail, []).append(seconds)
+        self.guardrail_total.append(sum(event["guardrail_time"].values()))
+
+        if event["rejection"] is None:
+            totals["accepted"] += 1
+        else:
+            self.rejections[event["rejection"]] += 1
+
+    def update(self, events):
+        for event in events:
+            self.add(event)
+
+    @classmethod
+    def from_traces(cls, paths: list[str]) -> "TraceStats":
+        """
+        Statistics over the trace files among `paths` that exist.
+        """
+        stats = cls()
+        for path in paths:
+            if path and os.path.exists(path):
+                stats.update(read_trace(path))
+        return stats
+
+    def latency_stats(self) -> dict:
+        """
+        {stage: {"count", "p50", "p95", "p99"}} in seconds, for the LLM
+        calls of each provider (and of all of them), the embedding calls
+        and each guardrail.
+        """
+        stages = {f"LLM call ({provider})": values for provider, values in self.llm_latency.items()}
+        if len(self.llm_latency) > 1:
+            stages["LLM call (all)"] = [v for values in self.llm_latency.values() for v in values]
+        stages["Embedding"] = self.embedding_latency
+        order = GUARDRAILS + sorted(set(self.guardrail_time) - set(GUARDRAILS))
+        stages.update((f"Guardrail: {name}", self.guardrail_time[name]) for name in order
+                      if name in self.guardrail_time)
+        stages["Guardrails (total per review)"] = self.guardrail_total
+        return {stage: _percentiles(values) for stage, values in stages.items() if values}
+
+    def rejection_stats(self) -> dict:
+        """
+        {guardrail: (rejections, share of all attempts)}, most frequent
+        first.
+        """
+        return {reason: (count, count / self.attempts) for reason, count in self.rejections.most_common()}
+
+    def cost_stats(self) -> dict:
+        """
+        Per-provider calls, accepted reviews, token usage and estimated
+        cost, plus a "total" entry.
+        """
+        result = {provider: dict(totals) for provider, totals in self.providers.items()}
+        result["total"] = {key: sum(t[key] for t in self.providers.values())
+                           for key in ("calls", "accepted", "input_tokens", "output_tokens", "embedding_tokens",
+                                       "cost")}
+        return result
+
+    def summary(self) -> dict:
+        """
+        Everything the quality report shows about the trace.
+        """
+        return {
+            "attempts": self.attempts,
+            "latency": self.latency_stats(),
+            "rejections": self.rejection_stats(),
+            "cost": self.cost_stats(),
+        }
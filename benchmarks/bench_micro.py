@@ -0,0 +1,320 @@
+import sys
+import json
+import time
+import yaml
+import random
+import argparse
+import platform
+from typing import Callable, Optional
+
+import numpy as np
+
+from evaluation.sentiment import rating_sentiment_ok
+from evaluation.realism import keyword_hits, has_drawback, realism_matchers
+from evaluation.diversity import vocab_overlap, too_similar_embedding, EmbeddingIndex, lexical_index_from_config
+from evaluation.features import compute_features
+from analysis.bias_analysis import analyze_sentiment
+from analysis.real_comparison import load_real_reviews, compare_real_vs_synthetic
+from models.mock_model import make_review
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+# Number of distinct reviews whose (TextBlob-based) features are computed;
+# larger corpora repeat them, which leaves the cost of the analysis
+# passes, which only read the precomputed features, unchanged.
+FEATURE_POOL = 5_000
+
+
+class Corpus:
+    """
+    Synthetic benchmark corpus of `size` review records (with feature
+    records attached, as the generation pipeline stores them), one
+    embedding per review in an EmbeddingIndex, and a set of query
+    reviews / vectors for the per-call guardrails. For each method of
+    `lexical_methods` ("exact", "minhash"), the review texts are also
+    stored in a LexicalIndex, as the vocabulary-overlap guardrail sees
+    them once `size` reviews have been accepted.
+    """
+
+    def __init__(self, cfg: dict, size: int, dim: int, queries: int, seed: int,
+                 lexical_methods: tuple = ()):
+        rng = random.Random(seed)
+        personas = [p["name"] for p in cfg["generation"]["personas"]]
+        ratings = [int(r) for r in cfg["generation"]["rating_distribution"]]
+        weights = list(cfg["generation"]["rating_distribution"].values())
+
+        pool = []
+        for _ in range(min(size, FEATURE_POOL)):
+            persona, rating = rng.choice(personas), rng.choices(ratings, weights)[0]
+            text = make_review(rng, persona, rating)
+            pool.append({
+                "persona": persona,
+                "rating": rating,
+                "review": text,
+                "features": compute_features(text),
+            })
+        self.size = size
+        self.records = [pool[i % len(pool)] for i in range(size)]
+        self.queries = [pool[rng.randrange(len(pool))] for _ in range(queries)]
+        self.real_reviews = load_real_reviews(cfg["outputs"]["real_reviews_path"])
+
+        np_rng = np.random.default_rng(seed)
+        self.embeddings = EmbeddingIndex(dim=dim, capacity=size)
+        for start in range(0, size, 100_000):
+            n = min(100_000, size - start)
+            self.embeddings.add_batch(np_rng.standard_normal((n, dim), dtype=np.float32))
+        self.query_vectors = np_rng.standard_normal((queries, dim), dtype=np.float32)
+
+        self.lexical_indexes = {}
+        for method in lexical_methods:
+            index = lexical_index_from_config(dict(cfg["guardrails"]["vocabulary_overlap"], method=method))
+            for r in self.records:
+                index.add(r["review"])
+            self.lexical_indexes[method] = index
+
+
+def bench_rating_sentiment_ok(corpus: Corpus, cfg: dict):
+    low = cfg["guardrails"]["sentiment"]["low_rating_positive_cutoff"]
+    high = cfg["guardrails"]["sentiment"]["high_rating_negative_cutoff"]
+    for r in corpus.queries:
+        rating_sentiment_ok(r["review"], r["rating"], low, high)
+    return len(corpus.queries)
+
+
+def bench_keyword_hits(corpus: Corpus, cfg: dict):
+    keywords, _ = realism_matchers(cfg)
+    for r in corpus.queries:
+        keyword_hits(r["review"], keywords)
+    return len(corpus.queries)
+
+
+def bench_has_drawback(corpus: Corpus, cfg: dict):
+    _, markers = realism_matchers(cfg)
+    for r in corpus.queries:
+        has_drawback(r["review"], markers)
+    return len(corpus.queries)
+
+
+def bench_vocab_overlap(corpus: Corpus, cfg: dict):
+    queries = corpus.queries
+    for a, b in zip(queries, queries[1:] + queries[:1]):
+        vocab_overlap(a["review"], b["review"])
+    return len(queries)
+
+
+def _too_similar_lexical(corpus: Corpus, method: str):
+    index = corpus.lexical_indexes[method]
+    for r in corpus.queries:
+        index.too_similar(r["review"])
+    return len(corpus.queries)
+
+
+def bench_too_similar_lexical(corpus: Corpus, cfg: dict):
+    return _too_similar_lexical(corpus, cfg["guardrails"]["vocabulary_overlap"].get("method", "exact"))
+
+
+def bench_too_similar_minhash(corpus: Corpus, cfg: dict):
+    return _too_similar_lexical(corpus, "minhash")
+
+
+def bench_too_similar_embedding(corpus: Corpus, cfg: dict):
+    threshold = cfg["guardrails"]["semantic_similarity"]["threshold"]
+    for vec in corpus.query_vectors:
+        too_similar_embedding(vec, corpus.embeddings, threshold)
+    return len(corpus.query_vectors)
+
+
+def bench_analyze_sentiment(corpus: Corpus, cfg: dict):
+    analyze_sentiment(corpus.records)
+    return 1
+
+
+def bench_compare_real_vs_synthetic(corpus: Corpus, cfg: dict):
+    compare_real_vs_synthetic(corpus.real_reviews, corpus.records)
+    return 1
+
+
+# name -> (function, scope). "per_review" benchmarks time one guardrail
+# call per query review (their corpus-wide cost is extrapolated as
+# per-call time x corpus size); "per_query" ones are per-call checks
+# against the whole corpus; "corpus" ones process the whole corpus once.
+BENCHMARKS: dict[str, tuple[Callable, str]] = {
+    "rating_sentiment_ok": (bench_rating_sentiment_ok, "per_review"),
+    "keyword_hits": (bench_keyword_hits, "per_review"),
+    "has_drawback": (bench_has_drawback, "per_review"),
+    "vocab_overlap": (bench_vocab_overlap, "per_review"),
+    "too_similar_lexical": (bench_too_similar_lexical, "per_query"),
+    "too_similar_minhash": (bench_too_similar_minhash, "per_query"),
+    "too_similar_embedding": (bench_too_similar_embedding, "per_query"),
+    "analyze_sentiment": (bench_analyze_sentiment, "corpus"),
+    "compare_real_vs_synthetic": (bench_compare_real_vs_synthetic, "corpus"),
+}
+
+
+def time_benchmark(fn: Callable, corpus: Corpus, cfg: dict, repeat: int) -> tuple[float, int]:
+    """
+    Best-of-`repeat` wall time of one benchmark run and the number of
+    calls it made.
+    """
+    best, calls = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calls = fn(corpus, cfg)
+        best = min(best, time.perf_counter() - start)
+    return best, calls
+
+
+def lexical_methods(cfg: dict, names: list[str]) -> tuple:
+    """
+    LexicalIndex methods the selected benchmarks query.
+    """
+    methods = []
+    if "too_similar_lexical" in names:
+        methods.append(cfg["guardrails"]["vocabulary_overlap"].get("method", "exact"))
+    if "too_similar_minhash" in names:
+        methods.append("minhash")
+    return tuple(dict.fromkeys(methods))
+
+
+def run_suite(cfg: dict, sizes: list[int], names: list[str], dim: int,
+              queries: int, repeat: int, seed: int) -> dict:
+    """
+    Run the selected benchmarks at every corpus size.
+
+    Returns {"meta": ..., "results": {"<name>@<size>": {...}}} where each
+    result holds the per-call time in microseconds (`per_call_us`, the
+    metric used for regression checks) and the estimated time to apply
+    the function across the whole corpus (`corpus_s`).
+    """
+    results = {}
+    for size in sizes:
+        corpus = Corpus(cfg, size, dim, queries, seed, lexical_methods=lexical_methods(cfg, names))
+        for name in names:
+            fn, scope = BENCHMARKS[name]
+            seconds, calls = time_benchmark(fn, corpus, cfg, repeat)
+            per_call = seconds / calls
+            results[f"{name}@{size}"] = {
+                "benchmark": name,
+                "size": size,
+                "scope": scope,
+                "calls": calls,
+                "per_call_us": round(per_call * 1e6, 3),
+                "corpus_s": round(per_call * (size if scope != "corpus" else 1), 4),
+            }
+            print(f"{name:>28} @ {size:>9,}: {per_call * 1e6:>14,.1f} us/call", flush=True)
+        del corpus
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "dim": dim,
+            "queries": queries,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def scaling(current: dict) -> dict:
+    """
+    {benchmark: (smallest size, largest size, growth of `per_call_us`)}
+    for the "per_query" benchmarks run at two or more corpus sizes: how
+    the cost of a dedup check grows with the size of its index (1.0 is
+    flat, the size ratio is linear).
+    """
+    by_name: dict[str, list[dict]] = {}
+    for result in current["results"].values():
+        if result["scope"] == "per_query":
+            by_name.setdefault(result["benchmark"], []).append(result)
+    growth = {}
+    for name, results in by_name.items():
+        if len(results) > 1:
+            small, large = min(results, key=lambda r: r["size"]), max(results, key=lambda r: r["size"])
+            growth[name] = (small["size"], large["size"], large["per_call_us"] / small["per_call_us"])
+    return growth
+
+
+def compare(baseline: dict, current: dict, threshold_pct: float) -> list[dict]:
+    """
+    Per-benchmark change of `per_call_us` relative to `baseline`. Rows
+    slower than the baseline by more than `threshold_pct` percent are
+    flagged as regressions.
+    """
+    rows = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        change = 100.0 * (result["per_call_us"] - base["per_call_us"]) / base["per_call_us"]
+        rows.append({
+            "key": key,
+            "baseline_us": base["per_call_us"],
+            "current_us": result["per_call_us"],
+            "change_pct": round(change, 1),
+            "regression": change > threshold_pct,
+        })
+    return rows
+
+
+def print_comparison(rows: list[dict], threshold_pct: float):
+    print(f"{'benchmark':>40}  {'baseline us':>14}  {'current us':>14}  {'change':>9}")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['key']:>40}  {row['baseline_us']:>14,.1f}  {row['current_us']:>14,.1f}"
+              f"  {row['change_pct']:>+8.1f}%  {flag}")
+    n = sum(row["regression"] for row in rows)
+    print(f"\n{n} regression(s) beyond {threshold_pct:g}%.")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for the evaluation guardrails and analysis passes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="corpus sizes (default: 1000 10000 100000 1000000)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="run only these benchmarks")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=500,
+                        help="calls per per-review / per-query benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="best-of-N timing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help=f"write results to this JSON file (e.g. {DEFAULT_BASELINE} to record a baseline)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare against a baseline JSON file and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="regression threshold in percent for --compare (default: 10)")
+    args = parser.parse_args(argv)
+
+    cfg = yaml.safe_load(open(args.config))
+    names = args.only or list(BENCHMARKS)
+    current = run_suite(cfg, args.sizes, names, args.dim, args.queries, args.repeat, args.seed)
+
+    growth = scaling(current)
+    if growth:
+        print()
+        for name, (small, large, factor) in growth.items():
+            print(f"{name:>28}: {factor:>6.1f}x per call from {small:,} to {large:,} ({large / small:,.0f}x the index)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(rows, args.threshold)
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import yaml
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+DEFAULT_TARGETS = [1_000, 10_000, 100_000]
+
+# Offline stand-ins for the real models. Two entries with different
+# latency / failure profiles keep the scheduler's routing in play.
+MOCK_MODELS = [
+    {
+        "provider": "mock",
+        "model": "mock-fast",
+        "temperature": 0.8,
+        "max_tokens": 400,
+        "concurrency": 8,
+        "reviews_per_call": 1,
+        "options": {"failure_rate": 0.01, "malformed_rate": 0.01},
+    },
+    {
+        "provider": "mock",
+        "model": "mock-slow",
+        "temperature": 0.8,
+        "max_tokens": 400,
+        "concurrency": 4,
+        "reviews_per_call": 1,
+        "options": {"failure_rate": 0.03, "malformed_rate": 0.02},
+    },
+]
+
+MOCK_EMBEDDINGS = {
+    "provider": "mock",
+    "model": "mock-embedding",
+    "concurrency": 8,
+    "batch_size": 256,
+    "max_batch_tokens": 100_000,
+    "options": {"dim": 256},
+}
+
+
+def mock_config(base_cfg: dict, target: int, out_dir: str, args) -> dict:
+    """
+    Copy of `base_cfg` that generates `target` reviews with the mock
+    provider and writes every output under `out_dir`.
+    """
+    cfg = json.loads(json.dumps(base_cfg))
+    cfg["generation"]["target_accepted"] = target
+    cfg["generation"]["max_attempts"] = target * args.attempts_factor
+    if args.mode:
+        cfg["generation"]["mode"] = args.mode
+
+    latency = {"distribution": args.latency_distribution, "mean": args.latency}
+    cfg["models"] = json.loads(json.dumps(MOCK_MODELS))
+    for i, m in enumerate(cfg["models"]):
+        m["reviews_per_call"] = args.reviews_per_call
+        m["options"].update(latency=latency, duplicate_rate=args.duplicate_rate,
+                            overlong_rate=args.overlong_rate, seed=args.seed + i)
+    cfg["embeddings"] = json.loads(json.dumps(MOCK_EMBEDDINGS))
+    cfg["embeddings"]["options"]["seed"] = args.seed
+    if args.streaming:
+        cfg["generation"].setdefault("streaming", {})["enabled"] = True
+
+    for key in ("dataset_path", "scored_path", "report_path", "run_log_path", "columnar_path", "shard_dir",
+                "trace_path"):
+        cfg["outputs"][key] = os.path.join(out_dir, os.path.basename(base_cfg["outputs"].get(key, key)))
+    if (cfg.get("candidates") or {}).get("dir"):
+        cfg["candidates"]["dir"] = os.path.join(out_dir, "candidates")
+    return cfg
+
+
+class CpuTimer:
+    """
+    Accumulates the CPU time spent inside wrapped functions (per-thread
+    CPU time, as the async loop runs the content guardrails on a worker
+    thread).
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+
+    def wrap(self, owner, name: str):
+        fn = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds += time.thread_time() - start
+                self.calls += 1
+
+        setattr(owner, name, timed)
+
+
+class WallTimer:
+    """
+    Accumulates the wall-clock time spent inside wrapped functions
+    (sync or async).
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def wrap(self, owner, name: str):
+        fn = getattr(owner, name)
+
+        if asyncio.iscoroutinefunction(fn):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.seconds += time.perf_counter() - start
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.seconds += time.perf_counter() - start
+
+        setattr(owner, name, timed)
+
+
+def peak_memory_mb() -> float:
+    """
+    Peak resident set size of the current process in MB (None where the
+    `resource` module is unavailable).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def candidate_output_tokens(cfg: dict):
+    """
+    Output tokens paid for over the run, from the candidate pool (None
+    when the pool is disabled).
+    """
+    directory = (cfg.get("candidates") or {}).get("dir")
+    if not directory:
+        return None
+    with open(os.path.join(directory, "candidates.jsonl")) as f:
+        # Token usage is per call, shared by the call's reviews
+        return round(sum(c["output_tokens"] / c["reviews_per_call"] for c in map(json.loads, f)))
+
+
+def run_benchmark(target: int, args) -> dict:
+    """
+    Run `generate.main` and `score_dataset.py` end to end against the mock
+    provider for one target size and return the measurements. Meant to
+    run in a fresh process so the peak memory belongs to this run only.
+    """
+    if not args.progress:
+        os.environ["TQDM_DISABLE"] = "1"
+    random.seed(args.seed)
+
+    import generate
+    import score_dataset
+    from pipeline.state import RunState
+
+    base_cfg = yaml.safe_load(open(args.config))
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as out_dir:
+        cfg = mock_config(base_cfg, target, out_dir, args)
+        cfg["embeddings"].pop("cache_dir", None)
+        config_path = os.path.join(out_dir, "config.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump(cfg, f)
+
+        guardrails = CpuTimer()
+        guardrails.wrap(generate, "_screen")
+        guardrails.wrap(generate, "diversity_rejection")
+        guardrails.wrap(RunState, "accept")
+
+        generation = WallTimer()
+        generation.wrap(generate, "run_generation")
+        generation.wrap(generate, "run_generation_async")
+
+        argv = sys.argv
+        try:
+            start = time.perf_counter()
+            sys.argv = ["generate.py", "--config", config_path]
+            generate.main()
+            generate_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            score_dataset.main(["--config", config_path])
+            score_seconds = time.perf_counter() - start
+        finally:
+            sys.argv = argv
+
+        with open(cfg["outputs"]["run_log_path"]) as f:
+            model_stats = json.load(f)
+        output_tokens = candidate_output_tokens(cfg)
+
+    accepted = sum(s["accepted"] for s in model_stats.values())
+    attempts = sum(s["accepted"] + s["rejected"] + s.get("discarded", 0) for s in model_stats.values())
+    gen_seconds = generation.seconds
+    return {
+        "target": target,
+        "mode": cfg["generation"]["mode"],
+        "accepted": accepted,
+        "attempts": attempts,
+        "generation_s": round(gen_seconds, 3),
+        "accepted_per_s": round(accepted / gen_seconds, 1),
+        "attempts_per_s": round(attempts / gen_seconds, 1),
+        "guardrail_cpu_s": round(guardrails.seconds, 3),
+        "guardrail_cpu_ms_per_attempt": round(1000 * guardrails.seconds / max(attempts, 1), 3),
+        "output_tokens": output_tokens,
+        "pipeline_s": round(generate_seconds, 3),
+        "score_s": round(score_seconds, 3),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def print_table(results: list[dict]):
+    columns = [
+        ("target", "target"), ("accepted", "accepted"), ("attempts", "attempts"),
+        ("accepted_per_s", "accepted/s"), ("attempts_per_s", "attempts/s"),
+        ("guardrail_cpu_s", "guardrail cpu s"), ("guardrail_cpu_ms_per_attempt", "ms/attempt"),
+        ("output_tokens", "output tokens"), ("score_s", "score s"), ("peak_memory_mb", "peak MB"),
+    ]
+    rows = [[h for _, h in columns]] + [
+        [str(round(r[k], 1) if isinstance(r[k], float) else r[k]) for k, _ in columns]
+        for r in results
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print("  ".join(cell.rjust(w) for cell, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end throughput benchmark (generate + score) using the mock provider.")
+    parser.add_argument("--targets", type=int, nargs="+", default=DEFAULT_TARGETS,
+                        help="target_accepted sizes to benchmark (default: 1000 10000 100000)")
+    parser.add_argument("--config", default="config.yaml",
+                        help="base configuration; models and embeddings are replaced by mock entries")
+    parser.add_argument("--mode", choices=["async", "sequential"],
+                        help="generation mode (default: the config's)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="mean simulated latency per mock call, in seconds (default: 0)")
+    parser.add_argument("--latency-distribution", default="lognormal",
+                        choices=["constant", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--duplicate-rate", type=float, default=0.05,
+                        help="share of mock reviews that repeat an earlier one")
+    parser.add_argument("--overlong-rate", type=float, default=0.0,
+                        help="share of mock reviews that ramble on to about three times the usual length")
+    parser.add_argument("--streaming", action="store_true",
+                        help="stream completions and cancel doomed ones early (generation.streaming)")
+    parser.add_argument("--reviews-per-call", type=int, default=1)
+    parser.add_argument("--attempts-factor", type=int, default=20,
+                        help="max_attempts as a multiple of the target")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--progress", action="store_true", help="show progress bars")
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    # One fresh process per target, so each run's peak memory is its own
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for target in args.targets:
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_benchmark, (target, args))
+        results.append(result)
+        print(json.dumps(result))
+
+    print()
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
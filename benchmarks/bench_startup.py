@@ -0,0 +1,95 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+from typing import Optional
+
+# Lightweight invocations and their startup budget in milliseconds
+# (median wall time of a fresh interpreter running the command).
+DEFAULT_BUDGETS_MS = {
+    "--help": 150,
+    "analyze --help": 150,
+    "report --help": 150,
+    "score --help": 500,
+    "generate --help": 500,
+}
+
+# Modules none of the invocations above may import: the provider SDKs and
+# the TextBlob / NLTK / SciPy stack behind sentiment polarity.
+HEAVY_MODULES = ("openai", "anthropic", "textblob", "nltk", "scipy", "sklearn")
+
+_IMPORT_LINE = re.compile(r"^import time:\s+\d+ \|\s+\d+ \|(\s*)(\S+)")
+
+
+def imported_modules(command: list[str], env: dict) -> set[str]:
+    """
+    Top-level packages imported by `command`, from `python -X importtime`.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", *command],
+                          env=env, capture_output=True, text=True)
+    modules = set()
+    for line in proc.stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if m:
+            modules.add(m.group(2).split(".")[0])
+    return modules
+
+
+def time_command(command: list[str], env: dict, repeat: int) -> float:
+    """
+    Median wall time in milliseconds of running `command` in a fresh
+    interpreter.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], env=env, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        times.append(1000 * (time.perf_counter() - start))
+    return statistics.median(times)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Startup-time budget check for the lightweight CLI invocations.")
+    parser.add_argument("--repeat", type=int, default=7, help="runs per invocation (median is reported)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every budget by this factor (e.g. 2 on slow CI machines)")
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cli = os.path.join(root, "cli.py")
+    env = dict(os.environ)
+
+    # Baseline: a bare interpreter, to separate our cost from Python's own
+    baseline = time_command(["-c", "pass"], env, args.repeat)
+    print(f"{'python -c pass':>20}: {baseline:>7.1f} ms")
+
+    results, failures = [], 0
+    for invocation, budget in DEFAULT_BUDGETS_MS.items():
+        command = [cli, *invocation.split()]
+        ms = time_command(command, env, args.repeat)
+        heavy = sorted(imported_modules(command, env) & set(HEAVY_MODULES))
+        budget *= args.scale
+        ok = ms <= budget and not heavy
+        failures += not ok
+        results.append({"invocation": invocation, "median_ms": round(ms, 1),
+                        "budget_ms": budget, "heavy_imports": heavy, "ok": ok})
+        flag = "" if ok else "  OVER BUDGET" if not heavy else f"  HEAVY IMPORTS: {', '.join(heavy)}"
+        print(f"{invocation:>20}: {ms:>7.1f} ms  (budget {budget:g} ms){flag}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"baseline_ms": round(baseline, 1), "results": results}, f, indent=2)
+
+    print(f"\n{failures} invocation(s) failed the startup budget.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+import sys
+import json
+import argparse
+from typing import Optional
+
+# Subcommand -> (module whose `main(argv)` runs it, help). Modules are
+# imported only when their subcommand runs, so `--help` and the analysis
+# commands never load the provider SDKs or the generation pipeline.
+FORWARDED = {
+    "generate": ("generate", "generate the synthetic review dataset"),
+    "score": ("score_dataset", "score the generated dataset"),
+}
+
+
+def load_config(path: str) -> dict:
+    import yaml
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+def load_dataset(cfg: dict, dataset_path: Optional[str] = None):
+    """
+    The accepted reviews: the memory-mapped columnar bundle when it is up
+    to date with the JSONL dataset, the parsed JSONL records otherwise.
+    """
+    from pipeline.columnar import open_columnar
+    from pipeline.dataset import read_dataset
+
+    dataset = open_columnar(cfg, dataset_path)
+    if dataset is None:
+        dataset = read_dataset(dataset_path or cfg["outputs"]["dataset_path"])
+    if not len(dataset):
+        sys.exit("No reviews in the dataset.")
+    return dataset
+
+
+def run_export(args):
+    """
+    (Re)build the columnar bundle from the JSONL dataset, e.g. for runs
+    made before `outputs.columnar_path` was set. Embeddings come from the
+    embedding cache where available and are otherwise fetched in batches.
+    """
+    from pipeline.dataset import read_dataset
+    from pipeline.columnar import write_columnar
+    from evaluation.diversity import EmbeddingIndex
+    from evaluation.features import review_features
+    from models.provider import configure_providers
+    from models.embeddings import embed_config_texts, set_embedding_cache
+    from models.embedding_cache import EmbeddingCache
+
+    cfg = load_config(args.config)
+    path = args.output or cfg["outputs"].get("columnar_path")
+    if not path:
+        sys.exit("No output path: set outputs.columnar_path or pass --output.")
+    configure_providers(cfg)
+    if cfg["embeddings"].get("cache_dir"):
+        set_embedding_cache(EmbeddingCache(cfg["embeddings"]["cache_dir"]))
+
+    dataset_path = args.input or cfg["outputs"]["dataset_path"]
+    records = read_dataset(dataset_path)
+    for r in records:
+        review_features(r)
+    embeddings = EmbeddingIndex()
+    embeddings.add_batch(embed_config_texts([r["review"] for r in records], cfg["embeddings"]))
+    write_columnar(path, records, embeddings.matrix, embedding_model=cfg["embeddings"]["model"],
+                   source_path=dataset_path)
+    print(f"Wrote {len(records)} reviews to {path}")
+
+
+def run_forwarded(command: str, argv: list[str]):
+    import importlib
+    module = importlib.import_module(FORWARDED[command][0])
+    sys.argv[0] = f"{sys.argv[0]} {command}"  # usage line of the command's parser
+    module.main(argv)
+
+
+def run_analyze(args):
+    """
+    Print the analysis passes (sentiment / rating / persona distributions
+    and the real vs synthetic comparison) for an existing dataset.
+    """
+    from analysis.report import analyze_dataset, real_review_stats
+
+    cfg = load_config(args.config)
+    analysis = analyze_dataset(load_dataset(cfg, args.input), real_review_stats(cfg))
+
+    text = json.dumps(analysis, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run_report(args):
+    """
+    Rewrite the quality report of a finished (or interrupted) run from
+    its dataset and run log, without generating anything.
+    """
+    from collections import Counter
+    from pipeline.columnar import ColumnarDataset
+    from pipeline.state import load_run_log
+    from analysis.report import write_quality_report
+    from analysis.trace_stats import TraceStats
+
+    cfg = load_config(args.config)
+    dataset = load_dataset(cfg, args.input)
+
+    # Accepted counts come from the dataset itself, which may be ahead of
+    # the last run-log checkpoint
+    if isinstance(dataset, ColumnarDataset):
+        accepted = dataset.value_counts("model")
+    else:
+        accepted = Counter(r["model"] for r in dataset)
+    model_stats = load_run_log(args.run_log or cfg["outputs"]["run_log_path"]) or {}
+    for stats in model_stats.values():
+        stats["accepted"] = 0
+    for model, count in accepted.items():
+        model_stats.setdefault(model, {"accepted": 0, "rejected": 0, "time": 0.0})
+        model_stats[model]["accepted"] = count
+
+    trace = TraceStats.from_traces([args.trace or cfg["outputs"].get("trace_path")])
+
+    output_path = args.output or cfg["outputs"]["report_path"]
+    write_quality_report(cfg, dataset, model_stats, output_path, trace_summary=trace.summary())
+    print(f"Report written to {output_path}")
+
+
+def run_refilter(args):
+    """
+    Rebuild the dataset from the candidate pool of earlier runs under the
+    guardrail thresholds of `--config`, without calling any model (see
+    `pipeline.candidates.refilter`).
+    """
+    import numpy as np
+    from pipeline.candidates import REJECTION_REASONS, load_candidates, refilter
+    from pipeline.columnar import write_columnar
+    from pipeline.dataset import DatasetWriter
+    from analysis.report import write_quality_report
+
+    cfg = load_config(args.config)
+    pools = args.pool or [(cfg.get("candidates") or {}).get("dir")]
+    if not pools[0]:
+        sys.exit("No candidate pool: set candidates.dir or pass --pool.")
+
+    candidates, embeddings = [], []
+    for pool in pools:
+        pool_candidates, pool_embeddings = load_candidates(pool)
+        # Pools are concatenated, so shift each pool's embedding rows
+        offset = sum(len(e) for e in embeddings)
+        for c in pool_candidates:
+            if c["row"] >= 0:
+                c["row"] += offset
+        candidates.extend(pool_candidates)
+        if len(pool_embeddings):
+            embeddings.append(pool_embeddings)
+    embeddings = np.concatenate(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+
+    records, vectors, rejections, model_stats = refilter(cfg, candidates, embeddings)
+    print(f"Kept {len(records)} of {len(candidates)} candidates.")
+    for reason in REJECTION_REASONS:
+        if rejections[reason]:
+            print(f"  {reason:>20}: {rejections[reason]}")
+    if args.dry_run:
+        return
+
+    dataset_path = args.output or cfg["outputs"]["dataset_path"]
+    with DatasetWriter(dataset_path) as writer:
+        for r in records:
+            writer.write(r)
+    if not args.output and cfg["outputs"].get("columnar_path"):
+        write_columnar(cfg["outputs"]["columnar_path"], records, vectors,
+                       embedding_model=cfg["embeddings"]["model"], source_path=dataset_path)
+    # A trial refilter to --output leaves the run's report alone unless
+    # --report asks for one
+    report_path = args.report or (None if args.output else cfg["outputs"]["report_path"])
+    if records and report_path:
+        write_quality_report(cfg, records, model_stats, report_path)
+    print(f"Dataset written to {dataset_path}" + (f", report to {report_path}" if records and report_path else ""))
+
+
+def run_dedup(args):
+    """
+    Cluster the near-duplicates of an existing dataset over all pairs of
+    reviews and write its canonical subset plus a cluster report (see
+    `evaluation.dedup.duplicate_clusters`).
+    """
+    import numpy as np
+    from pipeline.columnar import open_columnar
+    from pipeline.dataset import DatasetWriter, read_dataset
+    from evaluation.dedup import duplicate_clusters
+
+    cfg = load_config(args.config)
+    dedup_cfg = cfg.get("dedup") or {}
+    dataset_path = args.input or cfg["outputs"]["dataset_path"]
+
+    # Embeddings are memory-mapped from the columnar bundle when it is
+    # current, so only one tile of them is resident at a time
+    chunk_size = 10000
+    columnar = open_columnar(cfg, dataset_path)
+    if columnar is not None and columnar.embedding_model == cfg["embeddings"]["model"]:
+        n, embeddings = len(columnar), columnar.embeddings
+        texts = (t for start in range(0, n, chunk_size) for t in columnar.texts(start, min(start + chunk_size, n)))
+    else:
+        columnar = None
+        from models.provider import configure_providers
+        from models.embeddings import embed_config_texts, set_embedding_cache
+        from models.embedding_cache import EmbeddingCache
+
+        print("No current columnar bundle (see `cli.py export`); embedding the JSONL dataset in memory.")
+        configure_providers(cfg)
+        if cfg["embeddings"].get("cache_dir"):
+            set_embedding_cache(EmbeddingCache(cfg["embeddings"]["cache_dir"]))
+        dataset = read_dataset(dataset_path)
+        n = len(dataset)
+        embeddings = np.asarray(embed_config_texts([r["review"] for r in dataset], cfg["embeddings"]),
+                                dtype=np.float32).reshape(n, -1)
+        texts = (r["review"] for r in dataset)
+
+    result = duplicate_clusters(embeddings, texts, cfg, block_size=args.block_size)
+    keep, clusters = result["keep"], result["clusters"]
+
+    output_path = args.output or dedup_cfg.get("output_path", "outputs/synthetic_reviews_dedup.jsonl")
+    records = dataset if columnar is None else (r for _, chunk in columnar.iter_chunks(chunk_size) for r in chunk)
+    with DatasetWriter(output_path) as writer:
+        for i, r in enumerate(records):
+            if keep[i]:
+                writer.write(r)
+
+    clusters_path = args.clusters or dedup_cfg.get("clusters_path", "outputs/duplicate_clusters.json")
+    with open(clusters_path, "w") as f:
+        json.dump({
+            "reviews": n,
+            "kept": int(keep.sum()),
+            "clusters": len(clusters),
+            "semantic_threshold": cfg["guardrails"]["semantic_similarity"]["threshold"],
+            "overlap_threshold": cfg["guardrails"]["vocabulary_overlap"]["threshold"],
+            "duplicate_clusters": clusters,
+        }, f, indent=2)
+
+    print(f"{len(clusters)} duplicate clusters covering {sum(c['size'] for c in clusters)} of {n} reviews; "
+          f"kept {int(keep.sum())}.")
+    print(f"Canonical subset written to {output_path}, clusters to {clusters_path}")
+
+
+def run_fit_embeddings(args):
+    """
+    (Re)fit the local embedding model of the `embeddings` section (see
+    `models.local_embeddings`) and save it to its `options.model_path`,
+    e.g. on an accepted dataset once one exists.
+    """
+    from models.provider import configure_providers, get_provider
+
+    cfg = load_config(args.config)
+    emb = cfg["embeddings"]
+    if emb["provider"] != "local":
+        sys.exit("embeddings.provider is not \"local\": nothing to fit.")
+    configure_providers(cfg)
+    vectorizer = get_provider("local").fit(emb["model"], args.input)
+    dim = vectorizer.dim if vectorizer.components is None else vectorizer.components.shape[1]
+    print(f"Fitted {emb['model']} ({vectorizer.method}, {dim} dimensions)"
+          + (f", saved to {emb['options']['model_path']}" if (emb.get("options") or {}).get("model_path") else ""))
+    if emb.get("cache_dir"):
+        print(f"Vectors in {emb['cache_dir']} for {emb['model']} are now stale: clear it or rename the model.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Synthetic review pipeline: generate, score, analyze, report, export, refilter, dedup "
+                    "and fit-embeddings.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    # Options of forwarded commands (including --help) are parsed by the
+    # command's own module
+    for name, (_, help_text) in FORWARDED.items():
+        commands.add_parser(name, help=f"{help_text} (options: {name} --help)", add_help=False)
+
+    analyze = commands.add_parser("analyze", help="print the dataset analysis as JSON")
+    analyze.add_argument("--config", default="config.yaml",
+                         help="path to the run configuration (default: config.yaml)")
+    analyze.add_argument("--input", help="dataset to analyze (default: outputs.dataset_path)")
+    analyze.add_argument("--output", help="write the JSON to this path instead of stdout")
+    analyze.set_defaults(run=run_analyze)
+
+    report = commands.add_parser("report", help="write the quality report from an existing run")
+    report.add_argument("--config", default="config.yaml",
+                        help="path to the run configuration (default: config.yaml)")
+    report.add_argument("--input", help="dataset to report on (default: outputs.dataset_path)")
+    report.add_argument("--run-log", help="per-model statistics (default: outputs.run_log_path)")
+    report.add_argument("--trace", help="attempt trace for the latency, rejection and cost sections "
+                                        "(default: outputs.trace_path)")
+    report.add_argument("--output", help="report path (default: outputs.report_path)")
+    report.set_defaults(run=run_report)
+
+    export = commands.add_parser("export", help="rebuild the columnar bundle from the JSONL dataset")
+    export.add_argument("--config", default="config.yaml",
+                        help="path to the run configuration (default: config.yaml)")
+    export.add_argument("--input", help="JSONL dataset (default: outputs.dataset_path)")
+    export.add_argument("--output", help="bundle directory (default: outputs.columnar_path)")
+    export.set_defaults(run=run_export)
+
+    refilter = commands.add_parser(
+        "refilter", help="rebuild the dataset from the candidate pool under new guardrail thresholds")
+    refilter.add_argument("--config", default="config.yaml",
+                          help="configuration holding the new thresholds (default: config.yaml)")
+    refilter.add_argument("--pool", action="append",
+                          help="candidate pool directory, repeatable (default: candidates.dir)")
+    refilter.add_argument("--output", help="dataset path (default: outputs.dataset_path, with its columnar bundle)")
+    refilter.add_argument("--report", help="report path (default: outputs.report_path, or no report with --output)")
+    refilter.add_argument("--dry-run", action="store_true", help="only print what would be kept and rejected")
+    refilter.set_defaults(run=run_refilter)
+
+    dedup = commands.add_parser("dedup", help="cluster near-duplicates over all pairs and write the canonical subset")
+    dedup.add_argument("--config", default="config.yaml",
+                       help="path to the run configuration (default: config.yaml)")
+    dedup.add_argument("--input", help="dataset to audit (default: outputs.dataset_path)")
+    dedup.add_argument("--output", help="canonical subset (default: dedup.output_path)")
+    dedup.add_argument("--clusters", help="cluster report (default: dedup.clusters_path)")
+    dedup.add_argument("--block-size", type=int,
+                       help="rows per similarity tile (default: derived from dedup.memory_mb)")
+    dedup.set_defaults(run=run_dedup)
+
+    fit = commands.add_parser("fit-embeddings", help="(re)fit the local embedding model")
+    fit.add_argument("--config", default="config.yaml",
+                     help="path to the run configuration (default: config.yaml)")
+    fit.add_argument("--input", action="append",
+                     help="review file to fit on, JSON or JSONL (repeatable; default: embeddings.options.fit_on)")
+    fit.set_defaults(run=run_fit_embeddings)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if args.command in FORWARDED:
+        run_forwarded(args.command, rest)
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    else:
+        args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from typing import Optional
+
+import numpy as np
+
+from evaluation.diversity import _normalize, lexical_index_from_config
+
+DEFAULT_BLOCK_SIZE = 4096
+
+
+class UnionFind:
+    """
+    Disjoint sets over the integers [0, n), with the parents in one
+    int64 array (8 bytes per element).
+    """
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]  # path halving
+            i = parent[i]
+        return int(i)
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # The smaller index becomes the root, so every root is the
+            # first member of its set
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+    def roots(self) -> np.ndarray:
+        """
+        Root of every element.
+        """
+        parent = self.parent
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                return parent.copy()
+            parent = grand
+
+
+def block_size_for_budget(memory_mb: float, dim: int) -> int:
+    """
+    Largest block size whose working set fits in `memory_mb`: two blocks
+    of float32 embeddings plus their float32 similarity matrix and the
+    boolean threshold mask.
+    """
+    budget = memory_mb * 1024 * 1024
+    # 5 * b^2 (similarities + mask) + 8 * b * dim (two embedding blocks)
+    b = (-8 * dim + np.sqrt(64 * dim * dim + 20 * budget)) / 10
+    return max(1, int(b))
+
+
+def similar_pairs(embeddings, threshold: float, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    Find every pair i < j whose cosine similarity is >= `threshold`.
+    Yields one (i, j, similarity) triple of equal-length arrays per tile.
+
+    The similarity matrix is computed one (block_size x block_size) tile
+    at a time over the upper triangle, so memory stays bounded by the
+    block size whatever the number of rows. `embeddings` may be a
+    memory map (e.g. a columnar bundle's), in which case only the two
+    blocks of the current tile are paged in.
+    """
+    n = len(embeddings)
+    for a in range(0, n, block_size):
+        left = _normalize(np.asarray(embeddings[a:a + block_size], dtype=np.float32))
+        for b in range(a, n, block_size):
+            right = left if b == a else _normalize(np.asarray(embeddings[b:b + block_size], dtype=np.float32))
+            sims = left @ right.T
+            if b == a:
+                # Upper triangle only: each pair once, no self-pairs.
+                # Masked row by row, as np.tril_indices would allocate
+                # b^2 / 2 int64 index pairs on top of the tile budget
+                for i in range(len(left)):
+                    sims[i, :i + 1] = -1.0
+            rows, cols = np.nonzero(sims >= threshold)
+            if len(rows):
+                yield a + rows, b + cols, sims[rows, cols]
+
+
+def overlapping_pairs(texts, overlap_cfg: dict):
+    """
+    Yield (i, j, overlap) for every pair i < j whose vocabulary overlap
+    exceeds `overlap_cfg["threshold"]`.
+
+    Each text is matched against the lexical index of the texts before
+    it and then added, which covers every pair exactly once. With
+    `method: "exact"` every pair is found; with `"minhash"` the LSH
+    candidates keep the per-text cost flat, at the price of occasionally
+    missing a pair close to the threshold.
+    """
+    index = lexical_index_from_config(overlap_cfg)
+    for j, text in enumerate(texts):
+        for i, overlap in index.matches(text):
+            yield i, j, overlap
+        index.add(text)
+
+
+def duplicate_clusters(embeddings, texts, cfg: dict, block_size: Optional[int] = None) -> dict:
+    """
+    Group the reviews of a dataset into clusters of near-duplicates.
+
+    Two reviews are linked when their embeddings are at least
+    `guardrails.semantic_similarity.threshold` similar or their
+    vocabulary overlap exceeds `guardrails.vocabulary_overlap.threshold`,
+    the generation guardrails. Clusters are the connected components of
+    these links, so unlike the earlier-reviews-only check of
+    `score_dataset.py` they do not depend on the order of the dataset.
+
+    `embeddings` holds one row per review and `texts` is an iterable
+    over the review texts in the same order (consumed once).
+    `dedup.lexical_method` overrides the vocabulary-overlap method, e.g.
+    "minhash" for datasets too large for the exact inverted index. The
+    tile size is `block_size`, or derived from `dedup.memory_mb`.
+
+    Memory is O(n) for the per-review bookkeeping plus one similarity
+    tile and the lexical index; pairs are folded into the clusters as
+    they are found and never stored.
+
+    Returns {"keep": boolean mask of the reviews to keep (the first
+    member of each cluster and every unclustered review), "clusters":
+    list of clusters of two or more reviews, largest first}.
+    """
+    dedup_cfg = cfg.get("dedup") or {}
+    semantic_threshold = cfg["guardrails"]["semantic_similarity"]["threshold"]
+    overlap_cfg = dict(cfg["guardrails"]["vocabulary_overlap"])
+    if dedup_cfg.get("lexical_method"):
+        overlap_cfg["method"] = dedup_cfg["lexical_method"]
+    n = len(embeddings)
+    if block_size is None:
+        block_size = (block_size_for_budget(dedup_cfg["memory_mb"], embeddings.shape[1])
+                      if dedup_cfg.get("memory_mb") and n else DEFAULT_BLOCK_SIZE)
+
+    uf = UnionFind(n)
+    semantic_links = np.zeros(n, dtype=np.int32)
+    lexical_links = np.zeros(n, dtype=np.int32)
+    max_similarity = np.full(n, -1.0, dtype=np.float32)
+    max_overlap = np.zeros(n, dtype=np.float32)
+
+    for rows, cols, sims in similar_pairs(embeddings, semantic_threshold, block_size):
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            uf.union(i, j)
+        for ends in (rows, cols):
+            np.add.at(semantic_links, ends, 1)
+            np.maximum.at(max_similarity, ends, sims)
+
+    for i, j, overlap in overlapping_pairs(texts, overlap_cfg):
+        uf.union(i, j)
+        for end in (i, j):
+            lexical_links[end] += 1
+            max_overlap[end] = max(max_overlap[end], overlap)
+
+    roots = uf.roots()
+    keep = roots == np.arange(n)
+    order = np.argsort(roots, kind="stable")
+    starts = np.flatnonzero(np.r_[True, roots[order][1:] != roots[order][:-1]]) if n else np.empty(0, dtype=int)
+
+    clusters = []
+    for start, stop in zip(starts, np.r_[starts[1:], n]):
+        if stop - start < 2:
+            continue
+        members = order[start:stop]
+        clusters.append({
+            "canonical": int(members[0]),
+            "size": int(len(members)),
+            "members": members.tolist(),
+            # Every link is counted at both of its ends
+            "semantic_links": int(semantic_links[members].sum()) // 2,
+            "lexical_links": int(lexical_links[members].sum()) // 2,
+            "max_similarity": round(float(max_similarity[members].max()), 4),
+            "max_overlap": round(float(max_overlap[members].max()), 4),
+        })
+    clusters.sort(key=lambda c: (-c["size"], c["canonical"]))
+    return {"keep": keep, "clusters": clusters}
@@ -1,4 +1,8 @@
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+from collections import Counter
+from typing import Optional
+
+import numpy as np
 
 def vocab_overlap(a: str, b: str) -> float:
     """
@@ -13,8 +17,8 @@ def vocab_overlap(a: str, b: str) -> float:
     excessive word reuse between reviews and encourage
     surface-level linguistic diversity.
     """
-    sa = set(a.lower().split())
-    sb = set(b.lower().split())
+    sa = _token_set(a)
+    sb = _token_set(b)
     if not sa or not sb:
         return 0.0
     return len(sa & sb) / len(sa | sb)
@@ -32,9 +36,377 @@ def too_similar_embedding(new_vec, existing_vecs, threshold: float) -> bool:
 
     This guardrail prevents semantic duplication even when
     surface wording differs.
+
+    `existing_vecs` may be an `EmbeddingIndex` (preferred) or any
+    sequence of vectors; either way the comparison is a single
+    matrix-vector product.
+    """
+    if isinstance(existing_vecs, EmbeddingIndex):
+        return existing_vecs.too_similar(new_vec, threshold)
+    if len(existing_vecs) == 0:
+        return False
+    matrix = _normalize(np.asarray(existing_vecs, dtype=np.float32))
+    sims = matrix @ _normalize(np.asarray(new_vec, dtype=np.float32))
+    return bool(sims.max() >= threshold)
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize a vector or the rows of a matrix.
+
+    Zero vectors are left as zeros, which gives them a cosine
+    similarity of 0 with everything (matching sklearn's behaviour).
+    """
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+class EmbeddingIndex:
+    """
+    In-memory index of accepted embeddings for the semantic-similarity
+    guardrail.
+
+    Vectors are L2-normalized once on insertion and stored as rows of a
+    contiguous float32 matrix, so a cosine-similarity threshold query is
+    a single matrix-vector product instead of one sklearn call per
+    stored vector. The matrix grows geometrically, which keeps appends
+    amortized O(1), and uses about a tenth of the memory of a list of
+    Python float lists.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024):
+        self._dim = dim
+        self._capacity = capacity
+        self._size = 0
+        self._matrix = None if dim is None else np.empty((capacity, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        Normalized vectors currently stored, one per row (a view, not a copy).
+        """
+        if self._matrix is None:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    def _reserve(self, extra: int, dim: int):
+        if self._matrix is None:
+            self._dim = dim
+            self._capacity = max(self._capacity, extra)
+            self._matrix = np.empty((self._capacity, dim), dtype=np.float32)
+            return
+        if dim != self._dim:
+            raise ValueError(f"Expected embeddings of dimension {self._dim}, got {dim}")
+        needed = self._size + extra
+        if needed > self._capacity:
+            while self._capacity < needed:
+                self._capacity *= 2
+            grown = np.empty((self._capacity, self._dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def add(self, vec):
+        """
+        Append a single embedding.
+        """
+        self.add_batch([vec])
+
+    def add_batch(self, vecs):
+        """
+        Append several embeddings at once.
+        """
+        vecs = np.asarray(vecs, dtype=np.float32)
+        if vecs.ndim != 2 or len(vecs) == 0:
+            return
+        self._reserve(len(vecs), vecs.shape[1])
+        self._matrix[self._size:self._size + len(vecs)] = _normalize(vecs)
+        self._size += len(vecs)
+
+    def max_similarity(self, vec) -> float:
+        """
+        Highest cosine similarity between `vec` and any stored embedding
+        (-1.0 when the index is empty).
+        """
+        return float(self.max_similarity_batch([vec])[0])
+
+    def max_similarity_batch(self, vecs) -> np.ndarray:
+        """
+        Highest cosine similarity against the index for each row of `vecs`.
+        """
+        vecs = _normalize(np.asarray(vecs, dtype=np.float32))
+        if self._size == 0:
+            return np.full(len(vecs), -1.0, dtype=np.float32)
+        return (vecs @ self.matrix.T).max(axis=1)
+
+    def too_similar(self, vec, threshold: float) -> bool:
+        """
+        True if `vec` has cosine similarity >= `threshold` with any
+        stored embedding.
+        """
+        return self.max_similarity(vec) >= threshold
+
+    def query_batch(self, vecs, threshold: float) -> np.ndarray:
+        """
+        Boolean mask: for each row of `vecs`, whether it is too similar
+        to any stored embedding. Rows are not compared with each other.
+        """
+        return self.max_similarity_batch(vecs) >= threshold
+
+    def add_batch_scored(self, vecs) -> np.ndarray:
+        """
+        Append several embeddings in order and return, for each one, its
+        highest cosine similarity with every embedding stored before it:
+        the index itself plus the earlier rows of `vecs` (-1.0 if none).
+
+        Equivalent to calling `max_similarity` then `add` row by row, but
+        done with two matrix products.
+        """
+        vecs = _normalize(np.asarray(vecs, dtype=np.float32))
+        if vecs.ndim != 2 or len(vecs) == 0:
+            return np.empty(0, dtype=np.float32)
+        best = self.max_similarity_batch(vecs)
+        within = vecs @ vecs.T
+        within[np.triu_indices(len(vecs))] = -1.0
+        best = np.maximum(best, within.max(axis=1))
+        self.add_batch(vecs)
+        return best
+
+
+def _token_set(text: str) -> set[str]:
+    """
+    Tokenization used by the vocabulary-overlap guardrail
+    (lowercased whitespace split, as in `vocab_overlap`).
+    """
+    return set(text.lower().split())
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_LSH_FP_WEIGHT = 0.2
+_LSH_FN_WEIGHT = 0.8
+# MinHash mode: texts verified per colliding LSH bucket (the most recent)
+DEFAULT_MAX_CANDIDATES = 8
+
+
+def _token_hash(token: str) -> int:
+    """
+    Stable 32-bit hash of a token (Python's built-in hash is salted per process).
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """
+    Pick the number of LSH bands and rows per band for a Jaccard threshold.
+
+    Minimizes the weighted false-positive and false-negative probability
+    mass of the banding S-curve, as in the standard MinHash LSH
+    formulation. Candidates are always verified with the exact overlap,
+    so a false positive only costs CPU while a false negative lets a
+    duplicate through; false negatives are weighted accordingly.
+    """
+    xs = np.linspace(0.0, 1.0, 201)
+    best, best_err = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        p = 1.0 - (1.0 - xs ** rows) ** bands
+        fp = np.where(xs < threshold, p, 0.0).mean()
+        fn = np.where(xs >= threshold, 1.0 - p, 0.0).mean()
+        err = _LSH_FP_WEIGHT * fp + _LSH_FN_WEIGHT * fn
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+class LexicalIndex:
+    """
+    Index of accepted review texts for the vocabulary-overlap guardrail.
+
+    Token sets are computed once per stored text and tokens are interned
+    as integer IDs. Two modes are supported:
+
+    - "exact": an inverted index from token ID to the texts containing
+      it. A query only visits texts that share at least one token and
+      computes their exact Jaccard overlap from shared-token counts.
+      Results are identical to calling `vocab_overlap` against every
+      stored text.
+    - "minhash": each text is summarized by a MinHash signature and
+      bucketed with LSH banding tuned to `threshold`. Only texts that
+      collide in some band are verified with the exact Jaccard overlap,
+      in one vectorized pass. Buckets of near-identical texts grow with
+      the index, so only the `max_candidates` most recent texts of each
+      colliding bucket are verified: the per-query cost stays flat as
+      the index grows, at the price of occasionally missing a pair close
+      to the threshold (or an old near-duplicate of a crowded bucket
+      whose recent members did not match).
+
+    A text is considered too similar when its overlap is strictly
+    greater than `threshold`, matching the generation guardrail.
+    """
+
+    def __init__(self, threshold: float, method: str = "exact",
+                 num_perm: int = 128, seed: int = 1, max_candidates: int = DEFAULT_MAX_CANDIDATES):
+        if method not in ("exact", "minhash"):
+            raise ValueError(f"Unknown vocabulary overlap method: {method}")
+        self.threshold = threshold
+        self.method = method
+        self.max_candidates = max_candidates
+        self._vocab: dict[str, int] = {}
+        self._sizes: list[int] = []
+
+        # exact mode
+        self._postings: list[list[int]] = []
+
+        # minhash mode
+        self._docs: list[np.ndarray] = []
+        self._token_hashes: list[int] = []
+        self._query_mask = np.zeros(0, dtype=bool)
+        if method == "minhash":
+            rng = np.random.RandomState(seed)
+            self._a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+            self._b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+            self._bands, self._rows = _lsh_params(threshold, num_perm)
+            self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self._bands)]
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def _intern(self, tokens: set[str]) -> list[int]:
+        ids = []
+        for t in tokens:
+            tid = self._vocab.get(t)
+            if tid is None:
+                tid = len(self._vocab)
+                self._vocab[t] = tid
+                if self.method == "exact":
+                    self._postings.append([])
+                else:
+                    self._token_hashes.append(_token_hash(t))
+            ids.append(tid)
+        return ids
+
+    def _signature(self, tokens: set[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (self._token_hashes[self._vocab[t]] if t in self._vocab else _token_hash(t) for t in tokens),
+            dtype=np.uint64,
+            count=len(tokens),
+        )
+        phv = (np.outer(hashes, self._a) + self._b) % np.uint64(_MERSENNE_PRIME)
+        return (phv & np.uint64(_MAX_HASH)).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        for i in range(self._bands):
+            yield self._buckets[i], signature[i * self._rows:(i + 1) * self._rows].tobytes()
+
+    def add(self, text: str) -> int:
+        """
+        Store a text and return its position in the index.
+        """
+        tokens = _token_set(text)
+        doc_id = len(self._sizes)
+        ids = self._intern(tokens)
+        self._sizes.append(len(ids))
+
+        if self.method == "exact":
+            for tid in ids:
+                self._postings[tid].append(doc_id)
+        else:
+            self._docs.append(np.array(sorted(ids), dtype=np.int32))
+            if tokens:
+                for bucket, key in self._band_keys(self._signature(tokens)):
+                    bucket.setdefault(key, []).append(doc_id)
+        return doc_id
+
+    def _overlaps(self, text: str):
+        """
+        Yield (doc_id, Jaccard overlap) for every stored text that the
+        index considers a candidate for `text`.
+        """
+        tokens = _token_set(text)
+        if not tokens or not self._sizes:
+            return
+        size = len(tokens)
+        known = [self._vocab[t] for t in tokens if t in self._vocab]
+
+        if self.method == "exact":
+            shared = Counter()
+            for tid in known:
+                shared.update(self._postings[tid])
+            items = shared.items()
+        else:
+            candidates = set()
+            for bucket, key in self._band_keys(self._signature(tokens)):
+                candidates.update(bucket.get(key, ())[-self.max_candidates:])
+            items = self._shared_counts(known, candidates)
+
+        for doc_id, n_shared in items:
+            other = self._sizes[doc_id]
+            if other == 0:
+                continue
+            yield doc_id, n_shared / (size + other - n_shared)
+
+    def _shared_counts(self, known: list[int], candidates: set[int]):
+        """
+        (doc_id, tokens shared with the query) for the non-empty
+        `candidates`, computed for all of them at once through a boolean
+        mask over the vocabulary.
+        """
+        docs = [(d, self._docs[d]) for d in candidates if len(self._docs[d])]
+        if not docs:
+            return []
+        if len(self._query_mask) < len(self._vocab):
+            self._query_mask = np.zeros(2 * len(self._vocab), dtype=bool)
+        mask = self._query_mask
+        mask[known] = True
+        try:
+            hits = mask[np.concatenate([tokens for _, tokens in docs])]
+        finally:
+            mask[known] = False
+        lengths = np.fromiter((len(tokens) for _, tokens in docs), dtype=np.int64, count=len(docs))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        shared = np.add.reduceat(hits, starts, dtype=np.int64)
+        return zip((d for d, _ in docs), shared.tolist())
+
+    def max_overlap(self, text: str) -> float:
+        """
+        Highest Jaccard overlap between `text` and any stored text that
+        the index considers a candidate (0.0 if there is none).
+        """
+        return max((overlap for _, overlap in self._overlaps(text)), default=0.0)
+
+    def matches(self, text: str) -> list[tuple[int, float]]:
+        """
+        (doc_id, overlap) of every stored text that `text` overlaps by
+        more than `threshold`, in no particular order.
+        """
+        return [(d, overlap) for d, overlap in self._overlaps(text) if overlap > self.threshold]
+
+    def too_similar(self, text: str) -> bool:
+        """
+        True if `text` overlaps some stored text by more than `threshold`.
+        """
+        return self.max_overlap(text) > self.threshold
+
+    def query_batch(self, texts: list[str]) -> list[bool]:
+        """
+        `too_similar` for several texts. Texts are checked against the
+        index only, not against each other.
+        """
+        return [self.too_similar(t) for t in texts]
+
+
+def lexical_index_from_config(overlap_cfg: dict) -> LexicalIndex:
+    """
+    Build a `LexicalIndex` from the `guardrails.vocabulary_overlap`
+    section of config.yaml.
     """
-    for vec in existing_vecs:
-        sim = cosine_similarity([new_vec], [vec])[0][0]
-        if sim >= threshold:
-            return True
-    return False
+    return LexicalIndex(
+        overlap_cfg["threshold"],
+        method=overlap_cfg.get("method", "exact"),
+        num_perm=overlap_cfg.get("num_perm", 128),
+        max_candidates=overlap_cfg.get("max_candidates", DEFAULT_MAX_CANDIDATES),
+    )
@@ -0,0 +1,48 @@
+def sentiment_polarity(text: str) -> float:
+    """
+    TextBlob sentiment polarity of `text`, in [-1, 1].
+
+    TextBlob pulls in NLTK and SciPy, which take about a second to
+    import, so it is loaded on first use rather than when this module is
+    imported (commands that only read stored features never load it).
+    """
+    from textblob import TextBlob
+    return TextBlob(text).sentiment.polarity
+
+
+def compute_features(text: str) -> dict:
+    """
+    Compute the per-text features shared by the guardrails and the
+    analysis passes.
+
+    TextBlob polarity is by far the most expensive step of the pipeline,
+    so it is computed once here and then read back by every consumer
+    (sentiment guardrail, bias analysis, real vs synthetic comparison,
+    scoring) instead of being recomputed by each of them.
+
+    Features:
+    - polarity: TextBlob sentiment polarity in [-1, 1]
+    - length: character count
+    - n_words: whitespace-separated word count
+    - n_unique_tokens: size of the lowercased token set used by the
+      vocabulary-overlap guardrail
+    """
+    words = text.lower().split()
+    return {
+        "polarity": sentiment_polarity(text),
+        "length": len(text),
+        "n_words": len(words),
+        "n_unique_tokens": len(set(words)),
+    }
+
+
+def review_features(record: dict) -> dict:
+    """
+    Return the feature record attached to a review, computing and
+    attaching it first if the review predates feature records.
+    """
+    features = record.get("features")
+    if features is None:
+        features = compute_features(record["review"])
+        record["features"] = features
+    return features
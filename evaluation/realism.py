@@ -1,27 +1,213 @@
-def keyword_hits(text: str, keywords: list[str]) -> int:
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable, Union
+
+MATCH_MODES = ("substring", "word", "prefix")
+
+# Joins texts in the batch APIs; it never occurs in patterns and is not a
+# word character, so no match can span two texts.
+_SEPARATOR = "\x00"
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class PatternMatcher:
+    """
+    Precompiled matcher that finds which of a set of patterns (domain
+    keywords, drawback markers) occur in a text, in a single scan.
+
+    All patterns are compiled into one regular expression whose
+    alternation is factored into a trie, so the scan cost grows with the
+    length of the text rather than with the number of patterns (the same
+    idea as an Aho-Corasick automaton, executed by the C regex engine).
+    Matching is case-insensitive.
+
+    Modes:
+    - "substring": pattern anywhere (original behaviour; "but" matches
+      inside "button")
+    - "word": pattern delimited by word boundaries on both sides
+    - "prefix": pattern at the start of a word ("integration" matches
+      "integrations", "but" does not match "attribute")
+
+    Word boundaries follow the regex `\\b` rule, so in "word" and "prefix"
+    modes patterns should start (and, for "word", end) with a word
+    character.
+
+    Overlapping patterns are all reported: the regex finds the longest
+    pattern starting at each position, and the shorter patterns that
+    also match there (its prefixes) are added from the trie.
+    """
+
+    def __init__(self, patterns: Iterable[str], mode: str = "substring"):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {mode}")
+        self.mode = mode
+        self.patterns = list(dict.fromkeys(p.lower() for p in patterns if p))
+
+        trie: dict = {}
+        for p in self.patterns:
+            node = trie
+            for ch in p:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        before = r"\b" if mode in ("word", "prefix") else ""
+        after = r"\b" if mode == "word" else ""
+        body = _trie_regex(trie) if self.patterns else "(?!)"
+        self._regex = re.compile(f"(?={before}({body}){after})")
+        self._implied = {p: self._prefixes(trie, p) for p in self.patterns}
+
+    def _prefixes(self, trie: dict, pattern: str) -> tuple:
+        """
+        Patterns that necessarily also match wherever `pattern` matches
+        at the same position (its prefixes, ending on a word boundary in
+        "word" mode), including `pattern` itself.
+        """
+        found = []
+        node = trie
+        for i, ch in enumerate(pattern):
+            node = node[ch]
+            if "" in node:
+                end_ok = (
+                    self.mode != "word"
+                    or i + 1 == len(pattern)
+                    or _is_word_char(pattern[i]) != _is_word_char(pattern[i + 1])
+                )
+                if end_ok:
+                    found.append(pattern[:i + 1])
+        return tuple(found)
+
+    def find(self, text: str) -> set[str]:
+        """
+        Set of patterns occurring in `text`.
+        """
+        found = set()
+        for m in self._regex.finditer(text.lower()):
+            found.update(self._implied[m.group(1)])
+        return found
+
+    def count(self, text: str) -> int:
+        """
+        Number of distinct patterns occurring in `text`.
+        """
+        return len(self.find(text))
+
+    def any(self, text: str) -> bool:
+        """
+        True if at least one pattern occurs in `text`.
+        """
+        return self._regex.search(text.lower()) is not None
+
+    def find_batch(self, texts: list[str]) -> list[set[str]]:
+        """
+        `find` for many texts, scanning them as one concatenated string.
+        """
+        found = [set() for _ in texts]
+        if not texts:
+            return found
+        lowered = [t.lower() for t in texts]
+        starts, pos = [], 0
+        for t in lowered:
+            starts.append(pos)
+            pos += len(t) + 1
+        joined = _SEPARATOR.join(lowered)
+        for m in self._regex.finditer(joined):
+            found[bisect_right(starts, m.start()) - 1].update(self._implied[m.group(1)])
+        return found
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        return [len(f) for f in self.find_batch(texts)]
+
+    def any_batch(self, texts: list[str]) -> list[bool]:
+        return [bool(f) for f in self.find_batch(texts)]
+
+
+def _trie_regex(node: dict) -> str:
+    """
+    Regex source matching exactly the patterns stored in a character
+    trie, preferring the longest one.
+    """
+    branches = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+@lru_cache(maxsize=64)
+def compile_patterns(patterns: tuple, mode: str = "substring") -> PatternMatcher:
+    """
+    Cached `PatternMatcher` for a tuple of patterns, so matchers built
+    from config.yaml lists are compiled once per process.
+    """
+    return PatternMatcher(patterns, mode)
+
+
+def _matcher(patterns: Union[PatternMatcher, list[str]], mode: str) -> PatternMatcher:
+    if isinstance(patterns, PatternMatcher):
+        return patterns
+    return compile_patterns(tuple(patterns), mode)
+
+
+def keyword_hits(text: str, keywords: Union[PatternMatcher, list[str]], mode: str = "substring") -> int:
     """
     Count how many domain-specific keywords appear in a given text.
 
-    This function performs a simple substring check (case-insensitive)
-    for each keyword and counts how many are present at least once.
+    Each keyword counts once, however often it appears. `keywords` is a
+    list of keywords (compiled once and cached) or a prebuilt
+    `PatternMatcher`; `mode` selects substring, whole-word or word-prefix
+    matching (see `PatternMatcher`) and is case-insensitive.
 
     It is used as a lightweight realism guardrail to ensure that
     generated reviews reference relevant SaaS task-management concepts
     (e.g. tasks, workflows, integrations).
     """
-    text = text.lower()
-    return sum(1 for k in keywords if k in text)
+    return _matcher(keywords, mode).count(text)
 
 
-def has_drawback(text: str, markers: list[str]) -> bool:
+def has_drawback(text: str, markers: Union[PatternMatcher, list[str]], mode: str = "substring") -> bool:
     """
     Check whether a review mentions at least one drawback or limitation.
 
     The function searches for predefined drawback markers
-    (e.g. 'however', 'but', 'although') in a case-insensitive manner.
+    (e.g. 'however', 'but', 'although') in a case-insensitive manner,
+    using the same matching modes as `keyword_hits`. With "word" mode,
+    'but' no longer matches inside 'button' or 'attribute'.
 
     This guardrail enforces realism by requiring mild criticism
     in high-rating reviews (4–5 stars), reflecting real user behavior.
     """
-    text = text.lower()
-    return any(m in text for m in markers)
+    return _matcher(markers, mode).any(text)
+
+
+def keyword_hits_batch(texts: list[str], keywords: Union[PatternMatcher, list[str]],
+                       mode: str = "substring") -> list[int]:
+    """
+    `keyword_hits` for many texts in one scan.
+    """
+    return _matcher(keywords, mode).count_batch(texts)
+
+
+def has_drawback_batch(texts: list[str], markers: Union[PatternMatcher, list[str]],
+                       mode: str = "substring") -> list[bool]:
+    """
+    `has_drawback` for many texts in one scan.
+    """
+    return _matcher(markers, mode).any_batch(texts)
+
+
+def realism_matchers(cfg: dict) -> tuple[PatternMatcher, PatternMatcher]:
+    """
+    (keyword matcher, drawback matcher) for the domain keywords and
+    drawback markers in config.yaml, with the match modes set by
+    `guardrails.realism.keyword_match` / `drawback_match`.
+
+    Matchers come from the bounded `compile_patterns` cache, keyed by the
+    patterns and the mode, so they are compiled once per process.
+    """
+    realism = cfg["guardrails"]["realism"]
+    return (compile_patterns(tuple(cfg["domain"]["keywords"]), realism.get("keyword_match", "substring")),
+            compile_patterns(tuple(realism["drawback_markers"]), realism.get("drawback_match", "substring")))
@@ -1,8 +1,11 @@
-from textblob import TextBlob
+from typing import Optional
+
+from evaluation.features import sentiment_polarity
 
 def rating_sentiment_ok(text: str, rating: int,
                         low_rating_positive_cutoff: float,
-                        high_rating_negative_cutoff: float) -> bool:
+                        high_rating_negative_cutoff: float,
+                        polarity: Optional[float] = None) -> bool:
     """
     Validate alignment between a review's star rating and its textual sentiment.
 
@@ -18,12 +21,15 @@ def rating_sentiment_ok(text: str, rating: int,
     - rating: Star rating (1–5)
     - low_rating_positive_cutoff: Maximum allowed polarity for low ratings
     - high_rating_negative_cutoff: Minimum allowed polarity for high ratings
+    - polarity: Precomputed polarity (see `evaluation.features`); computed
+      from `text` when omitted
 
     Returns:
     - True if sentiment and rating are logically consistent
     - False if the combination is deemed unrealistic
     """
-    polarity = TextBlob(text).sentiment.polarity
+    if polarity is None:
+        polarity = sentiment_polarity(text)
 
     if rating <= 2 and polarity > low_rating_positive_cutoff:
         return False
@@ -1,43 +1,41 @@
+import sys
 import time
-import json
-import random
+import asyncio
+import argparse
+import subprocess
+import functools
 import yaml
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from tqdm import tqdm
 
-from models.openai_model import generate_review as openai_generate
-from models.openai_model import generate_embedding
-from models.anthropic_model import generate_review as anthropic_generate
+from models.provider import get_provider, configure_providers, estimate_tokens, parse_json
+from models.embeddings import agenerate_embedding, embed_config_texts, set_embedding_cache
+from models.embedding_cache import EmbeddingCache
+from models.streaming import DEFAULT_SHAPE_CHARS, StreamMonitor
 
 from evaluation.sentiment import rating_sentiment_ok
-from evaluation.diversity import vocab_overlap, too_similar_embedding
-from evaluation.realism import keyword_hits, has_drawback
+from evaluation.diversity import too_similar_embedding, EmbeddingIndex, LexicalIndex
+from evaluation.realism import keyword_hits, has_drawback, realism_matchers
+from evaluation.features import compute_features, review_features
 
-from analysis.bias_analysis import (
-    analyze_sentiment,
-    analyze_ratings,
-    analyze_personas,
-)
+from pipeline.dataset import DatasetWriter, read_dataset
+from pipeline.columnar import open_columnar, write_columnar
+from pipeline.sharding import dedup_merge, find_shards, merge_model_stats, parse_shard, shard_config
+from pipeline.candidates import CandidateStore
+from pipeline.state import RunState, load_run_log
+from pipeline.tracing import TraceWriter, read_trace, token_cost
+from analysis.trace_stats import TraceStats
+from pipeline.scheduler import UniformScheduler, make_scheduler
+from pipeline.sampler import RandomSampler, make_sampler
 
-from analysis.real_comparison import (
-    load_real_reviews,
-    compare_real_vs_synthetic,
-)
 
-from analysis.report import generate_report
+DEFAULT_CONCURRENCY = 4
 
-
-def weighted_choice(distribution: dict) -> int:
-    """
-    Sample a rating according to a predefined probability distribution.
-    """
-    r = random.random()
-    cumulative = 0.0
-    for rating, prob in distribution.items():
-        cumulative += prob
-        if r <= cumulative:
-            return int(rating)
-    return int(list(distribution.keys())[-1])
+# Rejections caused by the run rather than the model: the review's cell
+# was filled while it was in flight, or the target was already met
+DISCARD_REASONS = ("quota", "target")
 
 
 def build_prompt(domain, persona, style_notes, rating, min_chars, max_chars):
@@ -58,36 +56,51 @@ Rules:
 """.strip()
 
 
-def main():
+def build_batch_prompt(domain, slots, min_chars, max_chars):
     """
-    Orchestrates the full synthetic data pipeline:
-    generation → filtering → analysis → reporting.
+    Prompt asking for several reviews in one call, one per
+    (persona_cfg, rating) slot, returned as a JSON array in slot order.
     """
-    cfg = yaml.safe_load(open("config.yaml"))
-    os.makedirs(os.path.dirname(cfg["outputs"]["dataset_path"]), exist_ok=True)
-    target = cfg["generation"]["target_accepted"]
-    max_attempts = cfg["generation"]["max_attempts"]
-
-    accepted = []
-    embeddings = []
-
-    model_stats = {
-        "openai": {"accepted": 0, "rejected": 0, "time": 0.0},
-        "anthropic": {"accepted": 0, "rejected": 0, "time": 0.0},
-    }
-
-    attempts = 0
-    pbar = tqdm(total=target)
+    specs = "\n".join(
+        f"{i}. Persona: {persona_cfg['name']} ({persona_cfg['style_notes']}); Rating: {rating} out of 5"
+        for i, (persona_cfg, rating) in enumerate(slots, 1)
+    )
+    return f"""
+Generate {len(slots)} realistic reviews for a {domain}, one for each of:
 
-    while len(accepted) < target and attempts < max_attempts:
-        attempts += 1
+{specs}
 
-        model_cfg = random.choice(cfg["models"])
-        model_provider = model_cfg["provider"]
+Rules:
+- Write like a real human user, not marketing.
+- Mention at least two concrete product features.
+- If rating is 4 or 5, include at least one drawback.
+- Keep each review between {min_chars} and {max_chars} characters.
+- Make every review clearly different in wording and focus.
+- Output a STRICT JSON array with {len(slots)} objects, in the order above, each with keys: persona, rating, review.
+- No text outside JSON.
+""".strip()
 
-        persona_cfg = random.choice(cfg["generation"]["personas"])
-        rating = weighted_choice(cfg["generation"]["rating_distribution"])
 
+def sample_attempt(cfg: dict, scheduler: UniformScheduler, sampler: RandomSampler,
+                   candidates: Optional[list[dict]] = None):
+    """
+    Draw the model, the (persona, rating) slots and the prompt for one
+    attempt (one API call).
+
+    The model is picked by `scheduler`, among `candidates` if given, and
+    each slot by `sampler`. Models
+    with `reviews_per_call` > 1 get that many slots and a batch prompt.
+    Each slot is started on the sampler as soon as it is drawn, so the
+    next draw already counts it against its cell's quota.
+    """
+    model_cfg = scheduler.choose(candidates)
+    slots = []
+    for _ in range(model_cfg.get("reviews_per_call", 1)):
+        slots.append(sampler.sample())
+        sampler.start(*slots[-1])
+
+    if len(slots) == 1:
+        persona_cfg, rating = slots[0]
         prompt = build_prompt(
             cfg["domain"]["name"],
             persona_cfg["name"],
@@ -96,124 +109,760 @@ def main():
             cfg["generation"]["min_chars"],
             cfg["generation"]["max_chars"],
         )
+    else:
+        prompt = build_batch_prompt(
+            cfg["domain"]["name"],
+            slots,
+            cfg["generation"]["min_chars"],
+            cfg["generation"]["max_chars"],
+        )
+    return model_cfg, slots, prompt
 
-        start = time.time()
 
-        if model_provider == "openai":
-            result = openai_generate(
-                prompt,
-                model_cfg["model"],
-                model_cfg["temperature"],
-                model_cfg["max_tokens"],
-            )
-        else:
-            result = anthropic_generate(
-                prompt,
-                model_cfg["model"],
-                model_cfg["temperature"],
-                model_cfg["max_tokens"],
-            )
-
-        elapsed = time.time() - start
-        model_stats[model_provider]["time"] += elapsed
-
-        if not result or "review" not in result:
-            model_stats[model_provider]["rejected"] += 1
-            continue
-
-        review_text = result["review"]
+def content_rejection(review_text: str, rating: int, features: dict, cfg: dict,
+                      timings: Optional[dict] = None) -> Optional[str]:
+    """
+    Run the per-review guardrails that do not depend on previously
+    accepted samples (sentiment alignment and domain realism).
 
-        # ---- Guardrails ----
+    `features` is the review's feature record (see
+    `evaluation.features`); its polarity is reused instead of running
+    TextBlob again.
 
-        # Sentiment vs rating
-        if not rating_sentiment_ok(
-            review_text,
-            rating,
-            cfg["guardrails"]["sentiment"]["low_rating_positive_cutoff"],
-            cfg["guardrails"]["sentiment"]["high_rating_negative_cutoff"],
-        ):
-            model_stats[model_provider]["rejected"] += 1
-            continue
-
-        # Domain realism
-        if keyword_hits(review_text, cfg["domain"]["keywords"]) < cfg["guardrails"]["realism"]["min_keyword_hits"]:
-            model_stats[model_provider]["rejected"] += 1
-            continue
+    Returns the name of the first failing guardrail, or None if the
+    review passes all of them. These checks are pure CPU work and can
+    be evaluated before paying for an embedding call. The time each
+    guardrail took is added to `timings`, keyed by its name, if given.
+    """
+    timings = {} if timings is None else timings
+
+    # Sentiment vs rating
+    start = time.perf_counter()
+    sentiment_ok = rating_sentiment_ok(
+        review_text,
+        rating,
+        cfg["guardrails"]["sentiment"]["low_rating_positive_cutoff"],
+        cfg["guardrails"]["sentiment"]["high_rating_negative_cutoff"],
+        polarity=features["polarity"],
+    )
+    timings["sentiment"] = time.perf_counter() - start
+    if not sentiment_ok:
+        return "sentiment"
+
+    # Domain realism
+    start = time.perf_counter()
+    keywords, drawback_markers = realism_matchers(cfg)
+    hits = keyword_hits(review_text, keywords)
+    timings["realism"] = time.perf_counter() - start
+    if hits < cfg["guardrails"]["realism"]["min_keyword_hits"]:
+        return "realism"
+
+    if rating >= 4 and cfg["guardrails"]["realism"]["require_drawback_for_high_ratings"]:
+        start = time.perf_counter()
+        drawback = has_drawback(review_text, drawback_markers)
+        timings["drawback"] = time.perf_counter() - start
+        if not drawback:
+            return "drawback"
+
+    return None
+
+
+def diversity_rejection(review_text: str, embedding, embeddings: EmbeddingIndex,
+                        lexical: LexicalIndex, cfg: dict, timings: Optional[dict] = None) -> Optional[str]:
+    """
+    Run the dedup guardrails against the samples accepted so far.
+
+    Returns the name of the failing guardrail, or None if the review is
+    sufficiently different from every accepted sample. The caller must
+    not yield control between this check and adding the review to
+    `embeddings` / `lexical`, otherwise two near-duplicates could both
+    be accepted. As in `content_rejection`, the time of each guardrail
+    is added to `timings` if given.
+    """
+    timings = {} if timings is None else timings
+
+    # Embedding similarity
+    start = time.perf_counter()
+    too_similar = too_similar_embedding(
+        embedding,
+        embeddings,
+        cfg["guardrails"]["semantic_similarity"]["threshold"],
+    )
+    timings["semantic_similarity"] = time.perf_counter() - start
+    if too_similar:
+        return "semantic_similarity"
 
-        if rating >= 4 and cfg["guardrails"]["realism"]["require_drawback_for_high_ratings"]:
-            if not has_drawback(review_text, cfg["guardrails"]["realism"]["drawback_markers"]):
-                model_stats[model_provider]["rejected"] += 1
-                continue
+    # Vocabulary overlap
+    start = time.perf_counter()
+    too_similar = lexical.too_similar(review_text)
+    timings["vocabulary_overlap"] = time.perf_counter() - start
+    if too_similar:
+        return "vocabulary_overlap"
 
-        # Embedding similarity
-        new_embedding = generate_embedding(
-            review_text,
-            cfg["embeddings"]["model"]
-        )
+    return None
 
-        if too_similar_embedding(
-            new_embedding,
-            embeddings,
-            cfg["guardrails"]["semantic_similarity"]["threshold"],
-        ):
-            model_stats[model_provider]["rejected"] += 1
-            continue
 
-        # Vocabulary overlap
-        if any(
-            vocab_overlap(review_text, r["review"]) > cfg["guardrails"]["vocabulary_overlap"]["threshold"]
-            for r in accepted
-        ):
-            model_stats[model_provider]["rejected"] += 1
-            continue
-
-        # ---- ACCEPT ----
-        record = {
+def complete_attempt(cfg: dict, state: RunState, scheduler: UniformScheduler, sampler: RandomSampler,
+                     model_cfg: dict, persona_cfg: dict, rating: int, outcome) -> bool:
+    """
+    Apply the dedup guardrails to a finished attempt and record the
+    outcome in `state`, `scheduler` and `sampler`.
+
+    With quota sampling, a review whose (persona, rating) cell was filled
+    while it was in flight is rejected, so the dataset matches the target
+    distribution exactly. Such "quota" rejections, and "target" ones once
+    the run is complete, are not the model's doing: they are counted as
+    `discarded` and left out of its accepted / rejected counts and time,
+    of the scheduler's estimates and of the cell's yield.
+
+    `outcome` is the (elapsed, review_text, features, embedding, raw)
+    tuple returned by `_attempt` / `_attempt_async`; `review_text` is
+    None when the attempt already failed parsing or a content guardrail,
+    and `raw` holds what the candidate pool records about the attempt.
+    Returns True if the review was accepted.
+    """
+    elapsed, review_text, features, new_embedding, raw = outcome
+    model_provider = model_cfg["provider"]
+
+    rejection = raw["rejection"]
+    if rejection is None:
+        if len(state.accepted) >= cfg["generation"]["target_accepted"]:
+            rejection = "target"
+        elif sampler.is_full(persona_cfg, rating):
+            rejection = "quota"
+        else:
+            rejection = diversity_rejection(review_text, new_embedding, state.embeddings, state.lexical, cfg,
+                                            timings=raw["guardrail_time"])
+    accepted = rejection is None
+    discarded = rejection in DISCARD_REASONS
+
+    if not discarded:
+        state.record_time(model_provider, elapsed)
+    if accepted:
+        state.accept({
             "model": model_provider,
             "persona": persona_cfg["name"],
             "rating": rating,
             "review": review_text,
-        }
+            "features": features,
+        }, new_embedding)
+    elif discarded:
+        state.discard(model_provider)
+    else:
+        state.reject(model_provider)
+
+    if state.candidates is not None:
+        record_candidate(cfg, state.candidates, model_cfg, persona_cfg, rating, outcome, rejection)
+    state.trace(trace_event(cfg, model_cfg, persona_cfg, rating, outcome, rejection))
+
+    if discarded:
+        sampler.cancel(persona_cfg, rating)
+    else:
+        scheduler.update(model_cfg, accepted, elapsed)
+        sampler.finish(persona_cfg, rating, accepted)
+    return accepted
+
+
+def record_candidate(cfg: dict, candidates: CandidateStore, model_cfg: dict, persona_cfg: dict,
+                     rating: int, outcome, rejection: Optional[str]):
+    """
+    Add a finished attempt to the candidate pool, with everything
+    `pipeline.candidates.refilter` needs to replay the guardrails
+    offline. Token usage is that of the whole call, shared by its
+    `reviews_per_call` reviews.
+    """
+    elapsed, _, features, embedding, raw = outcome
+    text = raw["review"]
+    keywords, drawback_markers = realism_matchers(cfg)
+    candidates.add({
+        "model": model_cfg["provider"],
+        "model_name": model_cfg["model"],
+        "persona": persona_cfg["name"],
+        "rating": rating,
+        "temperature": model_cfg["temperature"],
+        "max_tokens": model_cfg["max_tokens"],
+        "reviews_per_call": raw["reviews_per_call"],
+        "latency": elapsed,
+        "input_tokens": raw["input_tokens"],
+        "output_tokens": raw["output_tokens"],
+        "review": text,
+        "features": features,
+        "keyword_hits": keyword_hits(text, keywords) if features is not None else None,
+        "has_drawback": has_drawback(text, drawback_markers) if features is not None else None,
+        "rejection": rejection,
+        "accepted": rejection is None,
+    }, embedding)
+
+
+def trace_event(cfg: dict, model_cfg: dict, persona_cfg: dict, rating: int, outcome,
+                rejection: Optional[str]) -> dict:
+    """
+    Trace event of a finished attempt (one review of a call): provider,
+    model and prompt parameters, the latency of the LLM call and of the
+    review's embedding call (None if it was not embedded), the time of
+    each guardrail that ran, token usage, estimated cost and the
+    rejection reason (None if accepted).
+
+    LLM latency and tokens are those of the whole call, repeated on each
+    of its `reviews_per_call` reviews (`slot` 0, 1, ...); the cost is the
+    review's share of the call plus its embedding, priced with the
+    `pricing` of the model entry and of `embeddings`.
+    """
+    _, _, _, embedding, raw = outcome
+    n_slots = raw["reviews_per_call"]
+    embedding_tokens = estimate_tokens(raw["review"]) if embedding is not None else 0
+    cost = (token_cost(model_cfg.get("pricing"), raw["input_tokens"], raw["output_tokens"]) / n_slots
+            + token_cost(cfg["embeddings"].get("pricing"), embedding_tokens))
+    return {
+        "time": round(time.time(), 3),
+        "provider": model_cfg["provider"],
+        "model": model_cfg["model"],
+        "persona": persona_cfg["name"],
+        "rating": rating,
+        "reviews_per_call": n_slots,
+        "slot": raw["slot"],
+        "llm_latency": round(raw["llm_latency"], 6),
+        "embedding_latency": round(raw["embedding_latency"], 6) if raw["embedding_latency"] is not None else None,
+        "guardrail_time": {name: round(seconds, 7) for name, seconds in raw["guardrail_time"].items()},
+        "input_tokens": raw["input_tokens"],
+        "output_tokens": raw["output_tokens"],
+        "embedding_tokens": embedding_tokens,
+        "cost": cost,
+        "aborted": raw["aborted"],
+        "rejection": rejection,
+    }
+
+
+def _review_texts(result, n_slots: int) -> list[Optional[str]]:
+    """
+    Review text for each slot of an attempt from the parsed model
+    response (None where the response is missing or malformed).
+    """
+    items = result if isinstance(result, list) else [result]
+    texts = []
+    for i in range(n_slots):
+        item = items[i] if i < len(items) else None
+        if not item or not isinstance(item, dict) or "review" not in item:
+            texts.append(None)
+        else:
+            texts.append(item["review"])
+    return texts
+
+
+def _screen(cfg: dict, review_text: Optional[str], rating: int, timings: Optional[dict] = None):
+    """
+    Compute features for one slot and run the content guardrails.
+    Returns (features, rejection): features are None if the slot failed
+    parsing, and rejection names the failing guardrail ("parse" for a
+    missing or malformed review) or is None. Timings of the feature
+    extraction and of each guardrail are added to `timings` if given.
+    """
+    timings = {} if timings is None else timings
+    if review_text is None:
+        return None, "parse"
+    start = time.perf_counter()
+    features = compute_features(review_text)
+    timings["features"] = time.perf_counter() - start
+    return features, content_rejection(review_text, rating, features, cfg, timings)
+
+
+def _max_review_chars(cfg: dict) -> Optional[int]:
+    """
+    Length above which a streamed review is rejected: `max_chars *
+    generation.streaming.max_chars_factor`, or None without streaming.
+    """
+    streaming = cfg["generation"].get("streaming") or {}
+    factor = streaming.get("max_chars_factor")
+    return int(cfg["generation"]["max_chars"] * factor) if streaming.get("enabled") and factor else None
+
+
+def _monitor_factory(cfg: dict, n_slots: int):
+    """
+    With `generation.streaming.enabled`, a callable creating the
+    `StreamMonitor` that decides when to cancel a streamed response for
+    `n_slots` reviews: once a review passes `_max_review_chars`, or if no
+    JSON has started within `shape_chars` characters. None otherwise.
+    """
+    streaming = cfg["generation"].get("streaming") or {}
+    if not streaming.get("enabled"):
+        return None
+    return functools.partial(StreamMonitor, _max_review_chars(cfg),
+                             streaming.get("shape_chars", DEFAULT_SHAPE_CHARS), n_slots)
+
+
+def _screen_completion(cfg: dict, completion, slots: list):
+    """
+    Review text of each slot of a completion, its (features, rejection)
+    from `_screen` and its guardrail timings. Slots missing from a
+    response cancelled mid-stream are rejected with the reason of the
+    cancellation, and streamed reviews over the length limit the monitor
+    let through (see `StreamMonitor`) with "length".
+    """
+    start = time.perf_counter()
+    texts = _review_texts(parse_json(completion.text), len(slots))
+    parse_time = (time.perf_counter() - start) / len(slots)
+    max_review_chars = _max_review_chars(cfg)
+    screened, timings = [], []
+    for text, (_, rating) in zip(texts, slots):
+        slot_timings = {"parse": parse_time}
+        if text is None and completion.aborted:
+            screened.append((None, completion.aborted))
+        elif text is not None and max_review_chars is not None and len(text) > max_review_chars:
+            screened.append((None, "length"))
+        else:
+            screened.append(_screen(cfg, text, rating, slot_timings))
+        timings.append(slot_timings)
+    return texts, screened, timings
+
+
+def _to_embed(cfg: dict, screened: list) -> list[bool]:
+    """
+    Which screened slots of an attempt need an embedding: the ones that
+    passed the content guardrails and, while a candidate pool is kept,
+    every parsed review, so the pool can be re-filtered under looser
+    content thresholds. `candidates.embed_rejected: false` opts out of
+    the extra embedding calls.
+    """
+    embed_rejected = (cfg.get("candidates") or {}).get("dir") and cfg["candidates"].get("embed_rejected", True)
+    return [rejection is None or (embed_rejected and features is not None) for features, rejection in screened]
+
+
+def _outcomes(completion, texts: list, screened: list, timings: list, vectors: list,
+              embedding_latencies: list) -> list:
+    """
+    Per-slot (elapsed, review_text, features, embedding, raw) outcomes of
+    an attempt, with review_text None for slots rejected by a content
+    guardrail. `elapsed` is each slot's share of the latency of the
+    request itself (`Completion.latency`: no rate-limit waits, backoff
+    or time the event loop spent on other attempts).
+    """
+    latency = completion.latency or 0.0
+    elapsed = latency / len(texts)
+    return [
+        (elapsed, text if rejection is None else None, features, vector, {
+            "review": text,
+            "rejection": rejection,
+            "input_tokens": completion.input_tokens,
+            "output_tokens": completion.output_tokens,
+            "reviews_per_call": len(texts),
+            "slot": slot,
+            "llm_latency": latency,
+            "embedding_latency": embedding_latency,
+            "guardrail_time": slot_timings,
+            "aborted": completion.aborted,
+        })
+        for slot, (text, (features, rejection), slot_timings, vector, embedding_latency) in enumerate(
+            zip(texts, screened, timings, vectors, embedding_latencies))
+    ]
+
+
+def _attempt(cfg: dict, model_cfg: dict, prompt: str, slots: list) -> list:
+    """
+    One generation attempt in sequential mode: one LLM call for all
+    slots, content guardrails per review and one (batched) embedding
+    request for the reviews that pass them.
+
+    Returns one outcome per slot (see `_outcomes`); the call latency is
+    split evenly across slots, and so is the embedding request's across
+    the reviews it embedded.
+    """
+    provider = get_provider(model_cfg["provider"])
+    request = (prompt, model_cfg["model"], model_cfg["temperature"], model_cfg["max_tokens"] * len(slots))
+    make_monitor = _monitor_factory(cfg, len(slots))
+
+    if make_monitor is None:
+        completion = provider.complete(*request)
+    else:
+        completion = provider.complete_stream(*request, make_monitor)
+
+    # ---- Guardrails ----
+
+    texts, screened, timings = _screen_completion(cfg, completion, slots)
+
+    to_embed = _to_embed(cfg, screened)
+    start = time.time()
+    vectors = iter(embed_config_texts([t for t, e in zip(texts, to_embed) if e], cfg["embeddings"]))
+    embedding_latency = (time.time() - start) / max(sum(to_embed), 1)
+    vectors = [next(vectors) if e else None for e in to_embed]
+
+    return _outcomes(completion, texts, screened, timings, vectors,
+                     [embedding_latency if e else None for e in to_embed])
 
-        accepted.append(record)
-        embeddings.append(new_embedding)
-        model_stats[model_provider]["accepted"] += 1
-        pbar.update(1)
+
+def run_generation(cfg: dict, state: RunState):
+    """
+    Sequential generation loop: one blocking LLM call and one blocking
+    embedding call per attempt.
+
+    Accepted records and per-provider statistics are accumulated in
+    `state`, which may already hold records from an interrupted run.
+    Each review requested from the model counts as one attempt towards
+    `max_attempts`.
+    """
+    target = cfg["generation"]["target_accepted"]
+    max_attempts = cfg["generation"]["max_attempts"]
+    scheduler = make_scheduler(cfg, state.model_stats)
+    sampler = make_sampler(cfg, state.accepted)
+
+    attempts = state.attempts
+    pbar = tqdm(total=target, initial=len(state.accepted))
+
+    while len(state.accepted) < target and attempts < max_attempts:
+        model_cfg, slots, prompt = sample_attempt(cfg, scheduler, sampler)
+        attempts += len(slots)
+
+        outcomes = _attempt(cfg, model_cfg, prompt, slots)
+
+        for (persona_cfg, rating), outcome in zip(slots, outcomes):
+            if complete_attempt(cfg, state, scheduler, sampler, model_cfg, persona_cfg, rating, outcome):
+                pbar.update(1)
 
     pbar.close()
 
-    
-    with open(cfg["outputs"]["dataset_path"], "w") as f:
-        for r in accepted:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
-    
-    with open(cfg["outputs"]["run_log_path"], "w") as f:
-        json.dump(model_stats, f, indent=2)
+async def _attempt_async(cfg: dict, model_cfg: dict, prompt: str, slots: list,
+                         embedding_sem: asyncio.Semaphore, guardrail_pool: ThreadPoolExecutor) -> list:
+    """
+    One generation attempt in async mode: LLM call, content guardrails
+    and (for the reviews that pass them) the embedding calls.
+
+    Only order-independent work happens here. The dedup guardrails are
+    applied by the caller as results complete, so that the shared
+    `accepted` / `embeddings` state is only touched from one place.
+
+    Parsing, feature extraction (TextBlob) and the content guardrails run
+    on `guardrail_pool`, off the event loop, so they do not stall the
+    other attempts' requests nor inflate their measured latencies.
+    """
+    provider = get_provider(model_cfg["provider"])
+    request = (prompt, model_cfg["model"], model_cfg["temperature"], model_cfg["max_tokens"] * len(slots))
+    make_monitor = _monitor_factory(cfg, len(slots))
+
+    if make_monitor is None:
+        completion = await provider.acomplete(*request)
+    else:
+        completion = await provider.acomplete_stream(*request, make_monitor)
+
+    texts, screened, timings = await asyncio.get_running_loop().run_in_executor(
+        guardrail_pool, _screen_completion, cfg, completion, slots)
+
+    async def embed(text, needed):
+        if not needed:
+            return None, None
+        async with embedding_sem:
+            start = time.time()
+            vector = await agenerate_embedding(text, cfg["embeddings"]["model"], cfg["embeddings"]["provider"])
+            return vector, time.time() - start
+
+    embedded = await asyncio.gather(*(embed(t, e) for t, e in zip(texts, _to_embed(cfg, screened))))
+    vectors, embedding_latencies = zip(*embedded)
+
+    return _outcomes(completion, texts, screened, timings, vectors, embedding_latencies)
+
+
+async def run_generation_async(cfg: dict, state: RunState):
+    """
+    Concurrent generation loop.
+
+    Keeps up to `concurrency` requests in flight per provider (set on each
+    entry of `models`) and up to `embeddings.concurrency` embedding calls.
+    Every provider with a free slot is topped up, the configured scheduler
+    choosing among the models of those providers; the loop only waits for
+    an attempt to finish once every provider is at its limit.
+    Completed attempts are pushed through the dedup guardrails one at a
+    time in completion order, so the dedup state in `state` stays
+    consistent even though requests finish out of order.
+
+    Stops launching new attempts once `target_accepted` or `max_attempts`
+    is reached, and cancels whatever is still in flight once the target
+    has been met.
+    """
+    target = cfg["generation"]["target_accepted"]
+    max_attempts = cfg["generation"]["max_attempts"]
+    scheduler = make_scheduler(cfg, state.model_stats)
+    sampler = make_sampler(cfg, state.accepted)
+
+    limits = {m["provider"]: 0 for m in cfg["models"]}
+    for m in cfg["models"]:
+        limits[m["provider"]] += m.get("concurrency", DEFAULT_CONCURRENCY)
+    in_flight = {p: 0 for p in limits}
+    embedding_sem = asyncio.Semaphore(cfg["embeddings"].get("concurrency", DEFAULT_CONCURRENCY))
+    # One worker: guardrail work is CPU-bound, and TextBlob's lazy loading
+    # is not thread-safe
+    guardrail_pool = ThreadPoolExecutor(max_workers=1)
+
+    pending = {}
+    attempts = state.attempts
+    pbar = tqdm(total=target, initial=len(state.accepted))
+
+    try:
+        while len(state.accepted) < target:
+            # Launch attempts while some provider has a free slot
+            while attempts < max_attempts:
+                free = [m for m in cfg["models"] if in_flight[m["provider"]] < limits[m["provider"]]]
+                if not free:
+                    break
+                model_cfg, slots, prompt = sample_attempt(cfg, scheduler, sampler, free)
+                attempts += len(slots)
+                in_flight[model_cfg["provider"]] += 1
+                task = asyncio.ensure_future(
+                    _attempt_async(cfg, model_cfg, prompt, slots, embedding_sem, guardrail_pool)
+                )
+                pending[task] = (model_cfg, slots)
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                model_cfg, slots = pending.pop(task)
+                in_flight[model_cfg["provider"]] -= 1
+
+                for (persona_cfg, rating), outcome in zip(slots, task.result()):
+                    if complete_attempt(cfg, state, scheduler, sampler, model_cfg, persona_cfg, rating, outcome):
+                        pbar.update(1)
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        guardrail_pool.shutdown(cancel_futures=True)
+        pbar.close()
+
+
+def load_state(cfg: dict, resume: bool) -> RunState:
+    """
+    Create the run state, streaming accepted records to the dataset file.
+
+    With `resume`, the partial dataset written by an interrupted run is
+    reloaded and the embedding / vocabulary dedup state is rebuilt from
+    it (embeddings come from the embedding cache where available and are
+    otherwise fetched in batches). Per-provider statistics are restored
+    from the last run-log checkpoint, with accepted counts taken from the
+    dataset itself since it may be ahead of the checkpoint, and the trace
+    statistics from the attempt trace.
+    """
+    dataset_path = cfg["outputs"]["dataset_path"]
+    fsync = cfg["outputs"].get("fsync", False)
+
+    if not resume:
+        return RunState(cfg, writer=DatasetWriter(dataset_path, fsync=fsync), candidates=open_candidates(cfg),
+                        tracer=open_trace(cfg))
+
+    records = read_dataset(dataset_path)
+    model_stats = _restored_model_stats(cfg, records)
+
+    state = RunState(cfg, writer=DatasetWriter(dataset_path, append=True, fsync=fsync), model_stats=model_stats,
+                     candidates=open_candidates(cfg, append=True), tracer=open_trace(cfg, append=True),
+                     trace_stats=TraceStats.from_traces([cfg["outputs"].get("trace_path")]))
+    if records:
+        embeddings = embed_config_texts([r["review"] for r in records], cfg["embeddings"])
+        state.restore(records, embeddings)
+    print(f"Resuming with {len(records)} accepted reviews.")
+    return state
+
+
+def open_candidates(cfg: dict, append: bool = False) -> Optional[CandidateStore]:
+    """
+    The candidate pool configured at `candidates.dir`, or None if
+    disabled. A fresh run starts an empty pool; resumed runs and the
+    top-up after a shard merge append to the existing one.
+    """
+    directory = (cfg.get("candidates") or {}).get("dir")
+    return CandidateStore(directory, append=append) if directory else None
+
+
+def open_trace(cfg: dict, append: bool = False) -> Optional[TraceWriter]:
+    """
+    The attempt trace writer for `outputs.trace_path`, or None if
+    disabled. As with the candidate pool, resumed runs and the top-up
+    after a shard merge append to the existing trace.
+    """
+    path = cfg["outputs"].get("trace_path")
+    return TraceWriter(path, append=append) if path else None
+
+
+def _restored_model_stats(cfg: dict, records: list[dict]) -> dict:
+    """
+    Per-provider statistics of an earlier run: the last run-log
+    checkpoint, with accepted counts taken from its dataset (`records`),
+    which may be ahead of the checkpoint. Attaches missing feature
+    records.
+    """
+    model_stats = load_run_log(cfg["outputs"]["run_log_path"]) or {}
+    for stats in model_stats.values():
+        stats["accepted"] = 0
+    for r in records:
+        model_stats.setdefault(r["model"], {"accepted": 0, "rejected": 0, "time": 0.0})
+        model_stats[r["model"]]["accepted"] += 1
+        review_features(r)
+    return model_stats
+
+
+def run(cfg: dict, state: RunState):
+    """
+    Run the configured generation loop until `target_accepted` (or
+    `max_attempts`) is reached, close the run (final checkpoint and
+    report) and write the columnar bundle.
+    """
+    try:
+        if cfg["generation"].get("mode", "sequential") == "async":
+            asyncio.run(run_generation_async(cfg, state))
+        else:
+            run_generation(cfg, state)
+    finally:
+        state.close()
+
+    # Columnar copy of the dataset, with the embeddings already computed
+    # for the dedup guardrails, for the downstream passes to memory-map
+    if cfg["outputs"].get("columnar_path"):
+        write_columnar(cfg["outputs"]["columnar_path"], state.accepted, state.embeddings.matrix,
+                       embedding_model=cfg["embeddings"]["model"], source_path=cfg["outputs"]["dataset_path"])
 
     print("Generation complete.")
-    print(model_stats)
-
-    
-    sentiment_stats = analyze_sentiment(accepted)
-    rating_stats = analyze_ratings(accepted)
-    persona_stats = analyze_personas(accepted)
-
-    
-    real_reviews = load_real_reviews(cfg["outputs"]["real_reviews_path"])
-
-    
-    comparison = compare_real_vs_synthetic(real_reviews, accepted)
-
-    
-    generate_report(
-        sentiment_stats=sentiment_stats,
-        rating_stats=rating_stats,
-        persona_stats=persona_stats,
-        comparison=comparison,
-        model_stats=model_stats,
-        output_path=cfg["outputs"]["report_path"],
-    )
+    print(state.model_stats)
+
+
+def load_shard(cfg: dict, shard_cfg: dict):
+    """
+    Accepted records, embeddings and per-provider statistics of one
+    shard. Embeddings come from the shard's columnar bundle; a shard that
+    stopped before writing it is read from its JSONL and re-embedded.
+    """
+    records, vectors = None, None
+    dataset = open_columnar(shard_cfg)
+    if dataset is not None and dataset.embedding_model == cfg["embeddings"]["model"]:
+        records, vectors = dataset.records(), dataset.embeddings
+    else:
+        records = read_dataset(shard_cfg["outputs"]["dataset_path"])
+        vectors = embed_config_texts([r["review"] for r in records], cfg["embeddings"])
+    return records, vectors, _restored_model_stats(shard_cfg, records)
+
+
+def merge(cfg: dict):
+    """
+    Merge the shards found under `outputs.shard_dir` into the main
+    dataset under global dedup (see `pipeline.sharding.dedup_merge`),
+    then top up any shortfall left by cross-shard duplicates with a
+    regular generation run seeded with the merged records.
+    """
+    count = find_shards(cfg)
+    shards, shard_stats, shard_cfgs = [], [], []
+    for index in range(count):
+        shard_cfgs.append(shard_config(cfg, index, count))
+        records, vectors, stats = load_shard(cfg, shard_cfgs[-1])
+        shards.append((records, vectors))
+        shard_stats.append(stats)
+
+    model_stats = merge_model_stats(shard_stats)
+    records, vectors = dedup_merge(cfg, shards, model_stats)
+    total = sum(len(r) for r, _ in shards)
+    print(f"Merged {count} shards: kept {len(records)} of {total} reviews "
+          f"({total - len(records)} cross-shard duplicates or over quota).")
+
+    dataset_path = cfg["outputs"]["dataset_path"]
+    fsync = cfg["outputs"].get("fsync", False)
+    with DatasetWriter(dataset_path, fsync=fsync) as writer:
+        for r in records:
+            writer.write(r)
+
+    state = RunState(cfg, writer=DatasetWriter(dataset_path, append=True, fsync=fsync), model_stats=model_stats,
+                     candidates=open_candidates(cfg, append=True), tracer=open_trace(cfg))
+    state.restore(records, vectors)
+    merge_traces(state, shard_cfgs)
+    shortfall = cfg["generation"]["target_accepted"] - len(records)
+    if shortfall > 0:
+        print(f"Topping up {shortfall} reviews.")
+    run(cfg, state)
+
+
+def merge_traces(state: RunState, shard_cfgs: list[dict]):
+    """
+    Copy the attempt traces of the shards into the run's trace (and its
+    statistics), so `outputs.trace_path` covers the whole run with the
+    top-up appended. Their tokens and cost are already in the merged
+    `model_stats`.
+    """
+    for shard_cfg in shard_cfgs:
+        path = shard_cfg["outputs"].get("trace_path")
+        if not path or not os.path.exists(path):
+            continue
+        events = list(read_trace(path))
+        state.trace_stats.update(events)
+        if state.tracer is not None:
+            state.tracer.extend(events)
+
+
+def prepare_shared_models(cfg: dict):
+    """
+    Fit the local embedding model (`embeddings.provider: "local"` with
+    an `options.model_path`) before the shards start, so every shard
+    loads the same saved model instead of fitting and saving its own.
+    """
+    emb = cfg["embeddings"]
+    if emb["provider"] == "local" and (emb.get("options") or {}).get("model_path"):
+        configure_providers(cfg)
+        get_provider("local").vectorizer(emb["model"])
+
+
+def run_shards(config_path: str, count: int, resume: bool):
+    """
+    Run `count` shards as local worker processes (the same command each
+    node runs in a multi-node setup) and wait for all of them.
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--config", config_path]
+    procs = [
+        subprocess.Popen(command + ["--shard", f"{i}/{count}"] + (["--resume"] if resume else []))
+        for i in range(count)
+    ]
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        sys.exit(f"Shard(s) {failed} failed; rerun them with --shard INDEX/{count} --resume, then --merge.")
+
+
+def main(argv: Optional[list[str]] = None):
+    """
+    Orchestrates the full synthetic data pipeline:
+    generation → filtering → analysis → reporting.
+    """
+    parser = argparse.ArgumentParser(description="Generate the synthetic review dataset.")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run from the partial dataset")
+    parser.add_argument("--config", default="config.yaml",
+                        help="path to the run configuration (default: config.yaml)")
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument("--shards", type=int, metavar="N",
+                          help="generate with N local worker processes, then merge")
+    sharding.add_argument("--shard", metavar="INDEX/COUNT",
+                          help="generate one shard only (e.g. 0/4), for multi-node runs")
+    sharding.add_argument("--merge", action="store_true",
+                          help="merge the shards in outputs.shard_dir and top up the shortfall")
+    args = parser.parse_args(argv)
+
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    cfg = yaml.safe_load(open(args.config))
+    if args.shards:
+        prepare_shared_models(cfg)
+        run_shards(args.config, args.shards, args.resume)
+    if shard:
+        cfg = shard_config(cfg, *shard)
+    os.makedirs(os.path.dirname(cfg["outputs"]["dataset_path"]), exist_ok=True)
+
+    configure_providers(cfg)
+    if cfg["embeddings"].get("cache_dir"):
+        set_embedding_cache(EmbeddingCache(cfg["embeddings"]["cache_dir"]))
+
+    if args.shards or args.merge:
+        merge(cfg)
+    else:
+        run(cfg, load_state(cfg, args.resume))
 
 
 if __name__ == "__main__":
@@ -1,11 +1,119 @@
 import os
-import json
-from anthropic import Anthropic
-from typing import Dict, Optional
+import anthropic
+from typing import Dict, List, Optional, Union
 
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+from models.provider import (
+    SYSTEM_PROMPT,
+    Completion,
+    Provider,
+    get_provider,
+    register_provider,
+)
 
-def generate_review(prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[Dict]:
+
+@register_provider
+class AnthropicProvider(Provider):
+    """
+    Adapter for the Anthropic Messages API.
+    """
+
+    name = "anthropic"
+    transient_errors = (anthropic.APIConnectionError,)
+
+    def _make_client(self):
+        return anthropic.Anthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            timeout=self.timeout,
+            max_retries=0,
+        )
+
+    def _make_async_client(self):
+        return anthropic.AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            timeout=self.timeout,
+            max_retries=0,
+        )
+
+    @staticmethod
+    def _messages(prompt: str) -> list[dict]:
+        return [
+            {
+                "role": "user",
+                "content": SYSTEM_PROMPT + "\n\n" + prompt
+            }
+        ]
+
+    @staticmethod
+    def _completion(message) -> Completion:
+        usage = message.usage
+        return Completion(
+            text=message.content[0].text.strip(),
+            input_tokens=usage.input_tokens if usage else 0,
+            output_tokens=usage.output_tokens if usage else 0,
+        )
+
+    def _complete(self, prompt, model, temperature, max_tokens) -> Completion:
+        message = self.client.messages.create(
+            model=model,
+            timeout=self._timeout(model),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=self._messages(prompt),
+        )
+        return self._completion(message)
+
+    async def _acomplete(self, prompt, model, temperature, max_tokens) -> Completion:
+        message = await self.async_client.messages.create(
+            model=model,
+            timeout=self._timeout(model),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=self._messages(prompt),
+        )
+        return self._completion(message)
+
+    @staticmethod
+    def _event_text(event, usage: Completion) -> Optional[str]:
+        """
+        Text delta carried by a stream event, if any, recording the
+        usage reported by the message events on `usage`.
+        """
+        if event.type == "message_start":
+            usage.input_tokens = event.message.usage.input_tokens
+        elif event.type == "message_delta":
+            usage.output_tokens = event.usage.output_tokens
+        elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+            return event.delta.text
+        return None
+
+    def _stream(self, prompt, model, temperature, max_tokens, usage):
+        with self.client.messages.stream(
+            model=model,
+            timeout=self._timeout(model),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=self._messages(prompt),
+        ) as stream:
+            for event in stream:
+                text = self._event_text(event, usage)
+                if text:
+                    yield text
+
+    async def _astream(self, prompt, model, temperature, max_tokens, usage):
+        async with self.async_client.messages.stream(
+            model=model,
+            timeout=self._timeout(model),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=self._messages(prompt),
+        ) as stream:
+            async for event in stream:
+                text = self._event_text(event, usage)
+                if text:
+                    yield text
+
+
+def generate_review(prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[Union[Dict, List[Dict]]]:
     """
     Generate a single synthetic SaaS review using an Anthropic Claude model.
 
@@ -17,42 +125,16 @@ def generate_review(prompt: str, model: str, temperature: float, max_tokens: int
     - persona
     - rating
     - review
-    """
-    message = client.messages.create(
-        model=model,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        messages=[
-            {
-                "role": "user",
-                "content": (
-                    "You generate realistic SaaS product reviews.\n\n"
-                    + prompt
-                )
-            }
-        ]
-    )
-
-    text = message.content[0].text.strip()
-    return _safe_parse_json(text)
 
-
-def _safe_parse_json(text: str) -> Optional[Dict]:
+    For multi-review prompts the parsed result is a list of such objects.
+    Rate limiting and retries are handled by the shared provider layer
+    (see `models.provider`).
     """
-    Safely extract and parse a JSON object from raw model output.
+    return get_provider("anthropic").generate_review(prompt, model, temperature, max_tokens)
 
-    This helper function searches for the first opening brace '{'
-    and the last closing brace '}' to isolate a JSON object,
-    then attempts to parse it.
 
-    The function is intentionally defensive and will return None
-    rather than raising an exception if parsing fails.
+async def agenerate_review(prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[Union[Dict, List[Dict]]]:
     """
-    try:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start == -1 or end == -1:
-            return None
-        return json.loads(text[start:end + 1])
-    except Exception:
-        return None
+    Async counterpart of `generate_review`.
+    """
+    return await get_provider("anthropic").agenerate_review(prompt, model, temperature, max_tokens)
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+# Characters not allowed in a model's subdirectory name
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+class _VectorStore:
+    """
+    One directory of the cache, holding vectors of a single dimension:
+
+    - vectors.f32: append-only float32 matrix, one row per entry
+    - index.tsv:   append-only "key<TAB>row" lines
+    - meta.json:   the vector dimension
+
+    A crash can at worst leave a partial last row or line, which is
+    discarded on the next open.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._index_path = os.path.join(directory, "index.tsv")
+        self._meta_path = os.path.join(directory, "meta.json")
+
+        self.dim = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)["dim"]
+
+        self._rows = 0
+        if self.dim is not None and os.path.exists(self._vectors_path):
+            row_bytes = self.dim * 4
+            size = os.path.getsize(self._vectors_path)
+            self._rows = size // row_bytes
+            if size != self._rows * row_bytes:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(self._rows * row_bytes)
+
+        self._index: dict[str, int] = {}
+        if os.path.exists(self._index_path):
+            valid_bytes = 0
+            with open(self._index_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    valid_bytes += len(line)
+                    key, row = line.decode("ascii").rstrip("\n").split("\t")
+                    if int(row) < self._rows:
+                        self._index[key] = int(row)
+            if valid_bytes != os.path.getsize(self._index_path):
+                with open(self._index_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+
+        self._mmap = None
+        self._mapped_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def _matrix(self) -> np.ndarray:
+        if self._mmap is None or self._mapped_rows != self._rows:
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim)
+            )
+            self._mapped_rows = self._rows
+        return self._mmap
+
+    def get_many(self, keys: list[str]) -> list[Optional[np.ndarray]]:
+        rows = [self._index.get(k) for k in keys]
+        if all(r is None for r in rows):
+            return [None] * len(keys)
+        matrix = self._matrix()
+        return [None if r is None else matrix[r] for r in rows]
+
+    def put_many(self, keys: list[str], vectors: np.ndarray):
+        fresh = [i for i, k in enumerate(keys) if k not in self._index]
+        if not fresh:
+            return
+
+        if self.dim is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.dim = int(vectors.shape[1])
+            with open(self._meta_path, "w") as f:
+                json.dump({"dim": self.dim}, f)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dimension {self.dim}, got {vectors.shape[1]}")
+
+        with open(self._vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors[fresh]).tobytes())
+        with open(self._index_path, "a") as f:
+            for offset, i in enumerate(fresh):
+                f.write(f"{keys[i]}\t{self._rows + offset}\n")
+                self._index[keys[i]] = self._rows + offset
+        self._rows += len(fresh)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, persistent cache of embedding vectors.
+
+    Entries are keyed by (embedding model, SHA-256 of the text), so the
+    same review embedded by generation and later by scoring is only paid
+    for once. Each embedding model gets its own subdirectory
+    (`models/<model name>/`, see `_VectorStore`) with its own vector
+    dimension, so switching `embeddings.model` to a model of another
+    dimension starts a new store next to the old one. Caches written
+    before the per-model layout (one store at the top of the directory)
+    are still read.
+
+    Vectors are read through a read-only memory map, so a lookup returns
+    a view into the file rather than a copy.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._stores: dict[str, _VectorStore] = {}
+        self._legacy = _VectorStore(directory) if os.path.exists(os.path.join(directory, "meta.json")) else None
+
+    def __len__(self) -> int:
+        models_dir = os.path.join(self.directory, "models")
+        names = os.listdir(models_dir) if os.path.isdir(models_dir) else []
+        return sum(len(self._store_at(name)) for name in names) + (len(self._legacy) if self._legacy else 0)
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """
+        Cache key for a (model, text) pair.
+        """
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _store_at(self, name: str) -> _VectorStore:
+        if name not in self._stores:
+            self._stores[name] = _VectorStore(os.path.join(self.directory, "models", name))
+        return self._stores[name]
+
+    def _store(self, model: str) -> _VectorStore:
+        return self._store_at(_UNSAFE_CHARS.sub("_", model))
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """
+        Cached vector for `text` under `model`, or None on a miss.
+        The returned array is a read-only view into the memory map.
+        """
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[np.ndarray]]:
+        """
+        `get` for several texts.
+        """
+        keys = [self.key(model, t) for t in texts]
+        vectors = self._store(model).get_many(keys)
+        if self._legacy is not None and any(v is None for v in vectors):
+            legacy = self._legacy.get_many(keys)
+            vectors = [v if v is not None else old for v, old in zip(vectors, legacy)]
+        return vectors
+
+    def put(self, model: str, text: str, vector):
+        """
+        Store a vector for `text` under `model`.
+        """
+        self.put_many(model, [text], [vector])
+
+    def put_many(self, model: str, texts: list[str], vectors):
+        """
+        Store several vectors at once. Entries already present are skipped.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [self.key(model, t) for t in texts]
+        if self._legacy is not None:
+            fresh = [i for i, k in enumerate(keys) if k not in self._legacy]
+            keys, vectors = [keys[i] for i in fresh], vectors[fresh]
+        if keys:
+            self._store(model).put_many(keys, vectors)
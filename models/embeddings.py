@@ -0,0 +1,125 @@
+import numpy as np
+from typing import Optional
+
+from models.embedding_cache import EmbeddingCache
+from models.provider import estimate_tokens, get_provider
+
+DEFAULT_EMBEDDING_BATCH_SIZE = 256
+DEFAULT_EMBEDDING_BATCH_TOKENS = 100_000
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]):
+    """
+    Install (or remove, with None) the persistent cache consulted by
+    `generate_embedding`, `agenerate_embedding` and `generate_embeddings`.
+    """
+    global _embedding_cache
+    _embedding_cache = cache
+
+
+def generate_embedding(text: str, model: str, provider: str = "openai") -> list[float]:
+    """
+    Generate a semantic embedding vector for a given text using the
+    embedding model of `provider` (the `embeddings` section of
+    config.yaml).
+
+    The resulting vector represents the semantic meaning of the input text
+    and is used to measure similarity between reviews via cosine similarity.
+    This enables detection of near-duplicate or highly similar synthetic
+    samples during both generation and post-generation scoring.
+
+    If an embedding cache is installed (see `set_embedding_cache`), hits
+    are served from it without a network call and returned as read-only
+    numpy views; misses are fetched and written back.
+    """
+    if _embedding_cache is not None:
+        cached = _embedding_cache.get(model, text)
+        if cached is not None:
+            return cached
+
+    vector = get_provider(provider).embed([text], model)[0]
+    if _embedding_cache is not None:
+        _embedding_cache.put(model, text, vector)
+    return vector
+
+
+async def agenerate_embedding(text: str, model: str, provider: str = "openai") -> list[float]:
+    """
+    Async counterpart of `generate_embedding` (same caching behaviour).
+    """
+    if _embedding_cache is not None:
+        cached = _embedding_cache.get(model, text)
+        if cached is not None:
+            return cached
+
+    vector = (await get_provider(provider).aembed([text], model))[0]
+    if _embedding_cache is not None:
+        _embedding_cache.put(model, text, vector)
+    return vector
+
+
+def generate_embeddings(texts: list[str], model: str, provider: str = "openai",
+                        batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+                        max_batch_tokens: int = DEFAULT_EMBEDDING_BATCH_TOKENS) -> np.ndarray:
+    """
+    Embed many texts with as few API requests as possible.
+
+    Texts already present in the embedding cache are not sent. The
+    remaining unique texts are split into requests of at most
+    `batch_size` inputs and roughly `max_batch_tokens` tokens each
+    (the endpoint caps both), and the results are written back to the
+    cache.
+
+    Returns a float32 matrix with one row per input text, in input order.
+    """
+    vectors: list = [None] * len(texts)
+    if _embedding_cache is not None:
+        vectors = _embedding_cache.get_many(model, texts)
+
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    fetched = {}
+    for batch in _embedding_batches(missing, batch_size, max_batch_tokens):
+        batch_vectors = get_provider(provider).embed(batch, model)
+        fetched.update(zip(batch, batch_vectors))
+        if _embedding_cache is not None:
+            _embedding_cache.put_many(model, batch, batch_vectors)
+
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.asarray(
+        [fetched[t] if v is None else v for t, v in zip(texts, vectors)],
+        dtype=np.float32,
+    )
+
+
+def embed_config_texts(texts: list[str], embeddings_cfg: dict) -> np.ndarray:
+    """
+    `generate_embeddings` with the provider, model and batching limits
+    taken from the `embeddings` section of config.yaml.
+    """
+    return generate_embeddings(
+        texts,
+        embeddings_cfg["model"],
+        provider=embeddings_cfg.get("provider", "openai"),
+        batch_size=embeddings_cfg.get("batch_size", DEFAULT_EMBEDDING_BATCH_SIZE),
+        max_batch_tokens=embeddings_cfg.get("max_batch_tokens", DEFAULT_EMBEDDING_BATCH_TOKENS),
+    )
+
+
+def _embedding_batches(texts: list[str], batch_size: int, max_batch_tokens: int):
+    """
+    Split texts into consecutive request batches bounded by input count
+    and estimated token count.
+    """
+    batch, tokens = [], 0
+    for text in texts:
+        n = estimate_tokens(text)
+        if batch and (len(batch) >= batch_size or tokens + n > max_batch_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += n
+    if batch:
+        yield batch
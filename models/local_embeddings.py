@@ -0,0 +1,202 @@
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from models.provider import Provider, register_provider
+
+METHODS = ("svd", "hashing")
+
+
+class LocalVectorizer:
+    """
+    CPU-only text embedding: hashed word n-gram counts, sublinear TF-IDF
+    weighting and, with method "svd", a truncated SVD (LSA) down to `dim`
+    dense dimensions. With method "hashing" the TF-IDF vector itself is
+    the embedding, hashed into `dim` buckets.
+
+    Fitting only learns the IDF weights and the SVD basis from a corpus.
+    The SVD components are zero on every hashed feature the corpus never
+    contains, so only the columns it uses are kept: a fitted model is a
+    few MB whatever `n_features` is. Words unseen at fit time still count
+    towards the TF-IDF norm but, under "svd", not towards the projection,
+    so fit on a corpus that covers the vocabulary of the reviews (the
+    real reviews, an earlier dataset, or both).
+    """
+
+    def __init__(self, method: str = "svd", dim: int = 256, n_features: int = 2 ** 18,
+                 ngram_max: int = 2, seed: int = 0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown local embedding method: {method}")
+        self.method = method
+        self.dim = dim
+        self.n_features = dim if method == "hashing" else n_features
+        self.ngram_max = ngram_max
+        self.seed = seed
+        self._hasher = HashingVectorizer(n_features=self.n_features, ngram_range=(1, ngram_max),
+                                         alternate_sign=False, norm=None, dtype=np.float32)
+        self.idf: Optional[np.ndarray] = None
+        self.columns: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    def _tfidf(self, texts: list[str]):
+        counts = self._hasher.transform(texts)
+        counts.data = 1.0 + np.log(counts.data)
+        return normalize(counts.multiply(self.idf).tocsr())
+
+    def fit(self, texts: list[str]) -> "LocalVectorizer":
+        counts = self._hasher.transform(texts)
+        n = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=self.n_features)
+        # Smoothed IDF, as scikit-learn's TfidfTransformer
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        if self.method == "svd":
+            self.columns = np.flatnonzero(df).astype(np.int32)
+            tfidf = self._tfidf(texts)[:, self.columns]
+            dim = min(self.dim, n - 1, len(self.columns) - 1)
+            if dim < 1:
+                raise ValueError(f"Cannot fit a local embedding model on {n} texts")
+            svd = TruncatedSVD(dim, random_state=self.seed).fit(tfidf)
+            self.components = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        return self
+
+    def transform(self, texts: list[str]) -> np.ndarray:
+        """
+        Float32 embedding matrix, one row per text.
+        """
+        tfidf = self._tfidf(texts)
+        if self.method == "hashing":
+            return tfidf.toarray()
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        vectors[:, :self.components.shape[1]] = tfidf[:, self.columns] @ self.components
+        return vectors
+
+    def save(self, path: str):
+        """
+        Write the fitted model to `path` through a uniquely named
+        temporary file, so concurrent writers (e.g. shard processes)
+        never rename each other's files.
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        arrays = {"idf": self.idf}
+        if self.method == "svd":
+            arrays.update(columns=self.columns, components=self.components)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp.npz", delete=False) as f:
+            try:
+                np.savez(f, params=np.array([self.method, self.dim, self.n_features, self.ngram_max, self.seed]),
+                         **arrays)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorizer":
+        with np.load(path) as data:
+            method, dim, n_features, ngram_max, seed = data["params"]
+            vectorizer = cls(str(method), int(dim), int(n_features), int(ngram_max), int(seed))
+            vectorizer.idf = data["idf"]
+            if vectorizer.method == "svd":
+                vectorizer.columns, vectorizer.components = data["columns"], data["components"]
+        return vectorizer
+
+
+def fit_corpus(paths: list[str], max_docs: Optional[int] = None, seed: int = 0) -> list[str]:
+    """
+    Review texts to fit on: every existing file of `paths` (real-review
+    JSON arrays or JSONL datasets), reservoir-sampled down to `max_docs`.
+    """
+    from analysis.real_comparison import iter_real_reviews, reservoir_sample
+
+    texts = (t for path in paths if os.path.exists(path) for t in iter_real_reviews(path))
+    return reservoir_sample(texts, max_docs, seed) if max_docs else list(texts)
+
+
+@register_provider
+class LocalEmbeddingProvider(Provider):
+    """
+    Offline embedding provider backed by `LocalVectorizer`: no network
+    call, so the semantic-similarity guardrail costs a few hundred
+    microseconds per review.
+
+    Options (the `options` mapping of the `embeddings` entry):
+
+    - method: "svd" (TF-IDF + truncated SVD) or "hashing" (TF-IDF only)
+    - dim: embedding dimension
+    - n_features: hashed n-gram buckets before the SVD
+    - ngram_max: longest word n-gram
+    - fit_on: review files (JSON or JSONL) to fit the IDF weights and
+      SVD basis on, e.g. the real reviews and an earlier dataset
+    - max_fit_docs: reservoir-sample the fit corpus down to this size
+    - model_path: where the fitted model is saved on first use and
+      loaded from afterwards, so every run embeds with the same basis
+    - seed: random seed of the SVD and the sampling
+    """
+
+    name = "local"
+
+    def __init__(self):
+        super().__init__()
+        self._specs: dict = {}
+        self._vectorizers: dict = {}
+
+    def configure(self, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                  timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                  method: str = "svd", dim: int = 256, n_features: int = 2 ** 18, ngram_max: int = 2,
+                  fit_on: Optional[list[str]] = None, max_fit_docs: Optional[int] = None,
+                  model_path: Optional[str] = None, seed: int = 0):
+        super().configure(model, rpm, tpm, timeout, max_retries)
+        self._specs[model] = {
+            "method": method, "dim": dim, "n_features": n_features, "ngram_max": ngram_max,
+            "fit_on": fit_on or [], "max_fit_docs": max_fit_docs, "model_path": model_path, "seed": seed,
+        }
+        self._vectorizers.pop(model, None)
+
+    def vectorizer(self, model: str) -> LocalVectorizer:
+        """
+        The fitted vectorizer for `model`: loaded from `model_path` if it
+        exists, otherwise fitted on `fit_on` (and saved to `model_path`).
+        `generate.py --shards` fits it once before starting the shards;
+        shards racing to fit it otherwise all save the same model.
+        """
+        if model not in self._vectorizers:
+            path = self._spec(model)["model_path"]
+            if path and os.path.exists(path):
+                self._vectorizers[model] = LocalVectorizer.load(path)
+            else:
+                self.fit(model)
+        return self._vectorizers[model]
+
+    def fit(self, model: str, paths: Optional[list[str]] = None) -> LocalVectorizer:
+        """
+        (Re)fit `model` on `paths` (default: its `fit_on` files), save it
+        to `model_path` and use it from now on.
+        """
+        spec = self._spec(model)
+        paths = paths or spec["fit_on"]
+        texts = fit_corpus(paths, spec["max_fit_docs"], spec["seed"])
+        if not texts:
+            raise ValueError(f"No texts to fit local embedding model {model!r} on: "
+                             f"set options.fit_on to existing review files")
+        vectorizer = LocalVectorizer(spec["method"], spec["dim"], spec["n_features"], spec["ngram_max"],
+                                     spec["seed"]).fit(texts)
+        if spec["model_path"]:
+            vectorizer.save(spec["model_path"])
+        self._vectorizers[model] = vectorizer
+        return vectorizer
+
+    def _spec(self, model: str) -> dict:
+        if model not in self._specs:
+            self.configure(model)
+        return self._specs[model]
+
+    def _embed(self, texts, model):
+        return self.vectorizer(model).transform(texts)
+
+    async def _aembed(self, texts, model):
+        return self._embed(texts, model)
@@ -0,0 +1,372 @@
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from models.provider import Completion, Provider, estimate_tokens, register_provider
+
+
+# Vocabulary for the synthetic reviews. DOMAIN_FEATURES are the default
+# domain keywords from config.yaml (so generated reviews pass the realism
+# guardrail); the other pools only add variety, so that independently
+# generated reviews rarely trip the similarity guardrails.
+DOMAIN_FEATURES = [
+    "tasks", "projects", "workflow", "dashboard", "integration",
+    "notifications", "permissions", "reporting", "automation", "templates",
+]
+EXTRA_FEATURES = [
+    "kanban board", "calendar view", "time tracking", "API", "mobile app",
+    "search", "comment threads", "file attachments", "sprint planning",
+    "recurring reminders", "Gantt chart", "Slack connector", "audit log",
+    "custom fields", "bulk editing", "task dependencies", "guest access",
+    "CSV export", "keyboard shortcuts", "offline mode", "webhooks",
+    "approval flows", "workload view", "timeline", "subtasks", "labels",
+    "email digests", "single sign-on", "burndown charts", "goal tracking",
+    "form builder", "whiteboards", "status updates", "billing page",
+]
+POSITIVE = [
+    "great", "easy to use", "reliable", "fast", "clean", "helpful",
+    "really useful", "simple", "excellent", "smooth", "nice", "solid",
+    "pleasant", "quick", "well designed", "flexible", "powerful",
+    "straightforward", "polished", "handy", "stable", "impressive",
+]
+NEGATIVE = [
+    "slow", "confusing", "frustrating", "unreliable", "clunky", "awful",
+    "painfully slow", "terrible", "bad", "broken", "annoying", "poor",
+    "useless", "buggy", "messy", "disappointing", "horrible", "sluggish",
+    "inconsistent", "overcomplicated", "unusable", "worse than expected",
+]
+MILD = [
+    "a bit slow", "hard to find", "limited", "missing a few options",
+    "occasionally laggy", "not very flexible", "tricky to configure",
+    "somewhat cluttered", "slightly dated", "hidden behind menus",
+    "rough around the edges", "underpowered", "inconsistent at times",
+]
+CONTEXTS = [
+    "on large boards", "during onboarding", "on the mobile app",
+    "with bigger teams", "when switching workspaces", "in older browsers",
+    "during release weeks", "with many guests", "after the last update",
+    "on slow connections", "for cross-team work", "at the end of the month",
+    "with nested subtasks", "during audits", "for client handoffs",
+    "in quarterly planning", "with external contractors", "on Android",
+]
+TOPICS = [
+    "hiring pipelines", "content calendars", "bug triage", "vendor onboarding",
+    "release checklists", "customer escalations", "budget approvals",
+    "event logistics", "design reviews", "sales handoffs", "office moves",
+    "compliance evidence", "incident follow-ups", "training plans",
+    "marketing launches", "partner integrations", "QA regression runs",
+    "invoice tracking", "roadmap grooming", "support macros", "data migrations",
+    "security reviews", "localization", "procurement", "research interviews",
+    "quarterly OKRs", "asset requests", "editorial workflows", "grant reports",
+]
+TEAMS = [
+    "engineering", "design", "marketing", "support", "finance", "operations",
+    "research", "sales", "legal", "product", "data", "platform", "growth",
+    "security", "people", "facilities", "editorial", "logistics",
+]
+SYLLABLES = [
+    "ka", "lo", "mi", "ra", "ven", "tor", "sel", "bri", "dan", "qu", "zel",
+    "nor", "pax", "li", "mon", "ter", "vi", "sha", "gor", "ell", "fin", "ost",
+]
+
+POSITIVE_SENTENCES = [
+    "The {f1} is {pos} and the {f2} saves our team of {n} a lot of time.",
+    "Setting up {f1} with the {f2} took about {n} minutes and it has been {pos} since.",
+    "I really like how {pos} the {f1} feels, especially next to the {f2}.",
+    "Our {f1} finally makes sense thanks to the {pos} {f2}.",
+    "After {n} weeks the {f1} and {f2} are still {pos} and people actually use them.",
+    "Connecting the {f1} to our {f2} was {pos}, which I did not expect.",
+    "For {topic} the {f1} plus {f2} combo is {pos}.",
+    "{F1} feels {pos}; {f2} too.",
+    "Love that {f1} syncs with {f2}, super {pos}.",
+    "Rolled out {f1} to {n} people, {f2} made adoption {pos}.",
+    "{F1} + {f2} = {pos} mornings.",
+    "Nobody complains about {f1} anymore, {f2} is {pos}.",
+]
+NEGATIVE_SENTENCES = [
+    "The {f1} is {neg} and the {f2} keeps failing for our team of {n}.",
+    "Honestly the {f1} feels {neg} and I gave up on the {f2} after {n} days.",
+    "We lost {n} hours last month because the {f1} and {f2} were {neg}.",
+    "Every time we touch the {f1} or the {f2} it is {neg}, and support never helped.",
+    "The {f1} is {neg} {ctx}, which makes the whole {f2} pointless.",
+    "For {topic} the {f1} turned out {neg} and the {f2} did not help either.",
+    "{F1}: {neg}. {F2}: also {neg}.",
+    "Tried {f1} {ctx}, {neg} experience, {f2} crashed twice.",
+    "{F1} broke {n} times this quarter; {f2} is {neg}.",
+    "Cannot recommend {f1}, {f2} feels {neg}.",
+    "Support ignored our {f1} ticket for {n} days and {f2} stays {neg}.",
+]
+DRAWBACK_SENTENCES = [
+    "My only complaint is that the {f1} is {mild} {ctx}, but it is manageable.",
+    "However, the {f1} can be {mild} {ctx}.",
+    "It is not perfect though, the {f1} is {mild} {ctx}.",
+    "The main issue is that the {f1} gets {mild} {ctx}.",
+    "Although the {f1} is {mild} {ctx}, we work around it.",
+    "One limitation: the {f1} is {mild} {ctx}.",
+    "{F1} is {mild} {ctx} but tolerable.",
+    "Minor problem, {f1} {ctx} seems {mild}.",
+]
+NEUTRAL_SENTENCES = [
+    "I run a {n}-person {team} team at {company}.",
+    "At {company} our {team} folks mostly use it for {topic} and {topic2}.",
+    "We moved {n} projects from {company2} over to it for {topic}.",
+    "As a {persona} at {company} I check it daily for {topic}.",
+    "Our {team} group at {company} relies on it for {topic} every sprint.",
+    "{Company} switched {n} weeks ago.",
+    "{Team} at {company}, {n} seats, mainly {topic}.",
+    "Came from {company2} for {topic} and {topic2}.",
+    "Using it across {team} and {team2} for {topic}.",
+    "{Persona} here, {n} months in, mostly {topic}.",
+    "Bought it for {topic}; now {topic2} lives there too.",
+    "{Company} pays for {n} licenses.",
+    "Evaluated {company2} and {company} before picking it for {topic}.",
+]
+
+# Function words left out of the mock embeddings, which would otherwise
+# dominate the bag-of-words vectors and make every review look similar.
+STOPWORDS = set(
+    "a an and are as at be but by did do for from has i in is it its me my "
+    "not of on or our so that the them then they this to was we were when "
+    "which with".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'-]*")
+_SLOT_RE = re.compile(r"Persona: ([^\n(;]+?)\s*(?:\(|\n|$).*?Rating: (\d)", re.S)
+
+
+class MockAPIError(Exception):
+    """
+    Simulated retryable server error (HTTP 503).
+    """
+    status_code = 503
+    response = None
+
+
+def _name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def make_review(rng: random.Random, persona: str, rating: int) -> str:
+    """
+    One synthetic review for (persona, rating) drawn with `rng`: a
+    context sentence, rating-consistent opinions naming two domain
+    keywords, and a drawback for 3-5 stars.
+    """
+    def fill(template, **fixed):
+        f1 = fixed.get("f1", rng.choice(EXTRA_FEATURES))
+        f2 = fixed.get("f2", rng.choice(EXTRA_FEATURES))
+        team, company, persona_ = rng.choice(TEAMS), _name(rng), persona.lower()
+        return template.format(
+            f1=f1, F1=f1[:1].upper() + f1[1:],
+            f2=f2, F2=f2[:1].upper() + f2[1:],
+            pos=rng.choice(POSITIVE),
+            neg=rng.choice(NEGATIVE),
+            mild=rng.choice(MILD),
+            ctx=rng.choice(CONTEXTS),
+            topic=rng.choice(TOPICS),
+            topic2=rng.choice(TOPICS),
+            team=team, Team=team.capitalize(), team2=rng.choice(TEAMS),
+            company=company, Company=company,
+            company2=_name(rng),
+            n=rng.randint(2, 90),
+            persona=persona_, Persona=persona_.capitalize(),
+        )
+
+    f1, f2 = rng.sample(DOMAIN_FEATURES, 2)
+    if rating >= 4:
+        opinion = rng.sample(POSITIVE_SENTENCES, 2)
+        extra = [rng.choice(DRAWBACK_SENTENCES)]
+    elif rating == 3:
+        opinion = [rng.choice(POSITIVE_SENTENCES), rng.choice(NEGATIVE_SENTENCES)]
+        extra = [rng.choice(DRAWBACK_SENTENCES)]
+    else:
+        opinion = rng.sample(NEGATIVE_SENTENCES, 2)
+        extra = []
+    sentences = (
+        [fill(rng.choice(NEUTRAL_SENTENCES))]
+        + [fill(opinion[0], f1=f1, f2=f2)]
+        + [fill(t) for t in opinion[1:] + extra]
+    )
+    return " ".join(sentences)
+
+
+@register_provider
+class MockProvider(Provider):
+    """
+    Offline, deterministic provider for tests and benchmarks.
+
+    Completions are synthetic reviews assembled from templates for every
+    (persona, rating) requested by the prompt, written to pass the
+    content guardrails most of the time (rating-consistent sentiment,
+    domain keywords, a drawback for 4-5 stars). Embeddings are hashed
+    bag-of-words vectors, so identical and near-identical texts get
+    near-identical vectors.
+
+    Behaviour is set per model through the `options` mapping of a config
+    entry:
+
+    - latency: {distribution: constant|uniform|exponential|lognormal,
+      mean, sigma (lognormal), low / high (uniform)}, in seconds
+    - failure_rate: share of calls raising a retryable 503 error
+    - malformed_rate: share of responses that are not valid JSON
+    - duplicate_rate: share of reviews that repeat an earlier review
+    - overlong_rate: share of reviews that ramble on to about three
+      times the usual length
+    - dim: embedding dimension (embedding models only)
+    - seed: random seed
+    """
+
+    name = "mock"
+
+    def __init__(self):
+        super().__init__(backoff_base=0.01, backoff_max=0.5)
+        self._models: dict = {}
+        self._token_vectors: dict = {}
+
+    def configure(self, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                  timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                  latency: Optional[dict] = None, failure_rate: float = 0.0,
+                  malformed_rate: float = 0.0, duplicate_rate: float = 0.0,
+                  overlong_rate: float = 0.0, dim: int = 256, seed: int = 0):
+        super().configure(model, rpm, tpm, timeout, max_retries)
+        self._models[model] = {
+            "rng": random.Random(f"{seed}:{model}"),
+            "latency": latency or {},
+            "failure_rate": failure_rate,
+            "malformed_rate": malformed_rate,
+            "duplicate_rate": duplicate_rate,
+            "overlong_rate": overlong_rate,
+            "dim": dim,
+            "recent": deque(maxlen=512),
+        }
+
+    def _model(self, model: str) -> dict:
+        if model not in self._models:
+            self.configure(model)
+        return self._models[model]
+
+    # ---- simulated service behaviour ----
+
+    def _latency(self, m: dict) -> float:
+        spec, rng = m["latency"], m["rng"]
+        distribution = spec.get("distribution", "constant")
+        mean = spec.get("mean", 0.0)
+        if distribution == "constant":
+            return mean
+        if distribution == "uniform":
+            return rng.uniform(spec.get("low", 0.0), spec.get("high", 2 * mean))
+        if distribution == "exponential":
+            return rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+        if distribution == "lognormal":
+            sigma = spec.get("sigma", 0.5)
+            return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0.0
+        raise ValueError(f"Unknown mock latency distribution: {distribution}")
+
+    def _fail(self, m: dict):
+        if m["rng"].random() < m["failure_rate"]:
+            raise MockAPIError("mock provider overloaded")
+
+    # ---- synthetic reviews ----
+
+    def _review(self, m: dict, persona: str, rating: int) -> str:
+        rng = m["rng"]
+        if m["recent"] and rng.random() < m["duplicate_rate"]:
+            return rng.choice(m["recent"])
+
+        text = make_review(rng, persona, rating)
+        if m["overlong_rate"] and rng.random() < m["overlong_rate"]:
+            text = " ".join([text] + [make_review(rng, persona, rating) for _ in range(2)])
+        m["recent"].append(text)
+        return text
+
+    def _respond(self, m: dict, prompt: str) -> str:
+        if m["rng"].random() < m["malformed_rate"]:
+            return "Sure! Here is a review: the tasks view is nice"
+
+        items = [
+            {"persona": persona, "rating": int(rating), "review": self._review(m, persona, int(rating))}
+            for persona, rating in _SLOT_RE.findall(prompt)
+        ]
+        return json.dumps(items[0] if len(items) == 1 else items)
+
+    def _completion(self, m: dict, prompt: str) -> Completion:
+        self._fail(m)
+        text = self._respond(m, prompt)
+        return Completion(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def _complete(self, prompt, model, temperature, max_tokens) -> Completion:
+        m = self._model(model)
+        time.sleep(self._latency(m))
+        return self._completion(m, prompt)
+
+    async def _acomplete(self, prompt, model, temperature, max_tokens) -> Completion:
+        m = self._model(model)
+        await asyncio.sleep(self._latency(m))
+        return self._completion(m, prompt)
+
+    # Characters per streamed chunk (roughly a few tokens, as the APIs send)
+    stream_chunk_chars = 16
+
+    def _chunks(self, latency: float, text: str):
+        """
+        (delay, delta) pairs of a streamed completion, with the call
+        latency spread evenly over the text.
+        """
+        size = self.stream_chunk_chars
+        for i in range(0, len(text), size):
+            yield latency * min(size, len(text) - i) / max(len(text), 1), text[i:i + size]
+
+    def _stream(self, prompt, model, temperature, max_tokens, usage):
+        m = self._model(model)
+        latency = self._latency(m)
+        completion = self._completion(m, prompt)
+        for delay, delta in self._chunks(latency, completion.text):
+            time.sleep(delay)
+            yield delta
+        usage.input_tokens, usage.output_tokens = completion.input_tokens, completion.output_tokens
+
+    async def _astream(self, prompt, model, temperature, max_tokens, usage):
+        m = self._model(model)
+        latency = self._latency(m)
+        completion = self._completion(m, prompt)
+        for delay, delta in self._chunks(latency, completion.text):
+            await asyncio.sleep(delay)
+            yield delta
+        usage.input_tokens, usage.output_tokens = completion.input_tokens, completion.output_tokens
+
+    # ---- embeddings ----
+
+    def _vector(self, text: str, dim: int) -> np.ndarray:
+        vector = np.zeros(dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            if token in STOPWORDS:
+                continue
+            key = (token, dim)
+            if key not in self._token_vectors:
+                self._token_vectors[key] = _token_vector(token, dim)
+            vector += self._token_vectors[key]
+        return vector
+
+    def _embed(self, texts, model):
+        m = self._model(model)
+        time.sleep(self._latency(m))
+        self._fail(m)
+        return [self._vector(t, m["dim"]) for t in texts]
+
+    async def _aembed(self, texts, model):
+        m = self._model(model)
+        await asyncio.sleep(self._latency(m))
+        self._fail(m)
+        return [self._vector(t, m["dim"]) for t in texts]
@@ -1,11 +1,123 @@
 import os
-import json
-from openai import OpenAI
-from typing import Dict, Optional
+import openai
+from typing import Dict, List, Optional, Union
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from models.provider import (
+    SYSTEM_PROMPT,
+    Completion,
+    Provider,
+    get_provider,
+    register_provider,
+)
+from models.embeddings import generate_embedding as _generate_embedding
 
-def generate_review(prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[Dict]:
+
+@register_provider
+class OpenAIProvider(Provider):
+    """
+    Adapter for OpenAI chat completions and embeddings.
+    """
+
+    name = "openai"
+    transient_errors = (openai.APIConnectionError,)
+
+    def _make_client(self):
+        return openai.OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=self.timeout,
+            max_retries=0,
+        )
+
+    def _make_async_client(self):
+        return openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=self.timeout,
+            max_retries=0,
+        )
+
+    @staticmethod
+    def _messages(prompt: str) -> list[dict]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        usage = response.usage
+        return Completion(
+            text=response.choices[0].message.content.strip(),
+            input_tokens=usage.prompt_tokens if usage else 0,
+            output_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    def _complete(self, prompt, model, temperature, max_tokens) -> Completion:
+        response = self.client.chat.completions.create(
+            model=model,
+            timeout=self._timeout(model),
+            messages=self._messages(prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return self._completion(response)
+
+    async def _acomplete(self, prompt, model, temperature, max_tokens) -> Completion:
+        response = await self.async_client.chat.completions.create(
+            model=model,
+            timeout=self._timeout(model),
+            messages=self._messages(prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return self._completion(response)
+
+    @staticmethod
+    def _usage(chunk, usage: Completion):
+        # With include_usage, the last chunk carries the usage and no choices
+        if chunk.usage:
+            usage.input_tokens = chunk.usage.prompt_tokens
+            usage.output_tokens = chunk.usage.completion_tokens
+
+    def _stream(self, prompt, model, temperature, max_tokens, usage):
+        with self.client.chat.completions.create(
+            model=model,
+            timeout=self._timeout(model),
+            messages=self._messages(prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        ) as stream:
+            for chunk in stream:
+                self._usage(chunk, usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def _astream(self, prompt, model, temperature, max_tokens, usage):
+        async with await self.async_client.chat.completions.create(
+            model=model,
+            timeout=self._timeout(model),
+            messages=self._messages(prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        ) as stream:
+            async for chunk in stream:
+                self._usage(chunk, usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def _embed(self, texts, model):
+        emb = self.client.embeddings.create(model=model, input=texts, timeout=self._timeout(model))
+        return [d.embedding for d in sorted(emb.data, key=lambda d: d.index)]
+
+    async def _aembed(self, texts, model):
+        emb = await self.async_client.embeddings.create(model=model, input=texts, timeout=self._timeout(model))
+        return [d.embedding for d in sorted(emb.data, key=lambda d: d.index)]
+
+
+def generate_review(prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[Union[Dict, List[Dict]]]:
     """
     Generate a single synthetic SaaS review using openai chat model.
 
@@ -17,54 +129,25 @@ def generate_review(prompt: str, model: str, temperature: float, max_tokens: int
     - persona
     - rating
     - review
-    """
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You generate realistic SaaS product reviews."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
 
-    text = response.choices[0].message.content.strip()
+    For multi-review prompts the parsed result is a list of such objects.
+    Rate limiting and retries are handled by the shared provider layer
+    (see `models.provider`).
+    """
+    return get_provider("openai").generate_review(prompt, model, temperature, max_tokens)
 
-    return _parse_json(text)
 
-def generate_embedding(text: str, model: str) -> list[float]:
+async def agenerate_review(prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[Union[Dict, List[Dict]]]:
     """
-    Generate a semantic embedding vector for a given text using an OpenAI
-    embedding model.
-
-    The resulting vector represents the semantic meaning of the input text
-    and is used to measure similarity between reviews via cosine similarity.
-    This enables detection of near-duplicate or highly similar synthetic
-    samples during both generation and post-generation scoring.
+    Async counterpart of `generate_review`.
     """
-    emb = client.embeddings.create(
-        model=model,
-        input=text
-    )
-    return emb.data[0].embedding
+    return await get_provider("openai").agenerate_review(prompt, model, temperature, max_tokens)
 
 
-def _parse_json(text: str) -> Optional[Dict]:
+def generate_embedding(text: str, model: str) -> list[float]:
     """
-    Safely extract and parse a JSON object from raw model output.
-
-    This helper function searches for the first opening brace '{'
-    and the last closing brace '}' to isolate a JSON object,
-    then attempts to parse it.
-
-    The function is intentionally defensive and will return None
-    rather than raising an exception if parsing fails.
+    Embedding of `text` with an OpenAI embedding model. Kept for callers
+    of the original helper; see `models.embeddings.generate_embedding`,
+    which also serves other providers and the embedding cache.
     """
-    try:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start == -1 or end == -1:
-            return None
-        return json.loads(text[start:end + 1])
-    except Exception:
-        return None
+    return _generate_embedding(text, model, provider="openai")
@@ -0,0 +1,509 @@
+import json
+import time
+import random
+import asyncio
+import importlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+
+# Provider name -> module that defines and registers its adapter.
+# Modules are imported on first use so only the SDKs actually needed
+# by a run get loaded.
+PROVIDER_MODULES = {
+    "openai": "models.openai_model",
+    "anthropic": "models.anthropic_model",
+    "mock": "models.mock_model",
+    "local": "models.local_embeddings",
+}
+
+_PROVIDER_CLASSES: dict = {}
+_PROVIDERS: dict = {}
+
+SYSTEM_PROMPT = "You generate realistic SaaS product reviews."
+
+
+@dataclass
+class Completion:
+    """
+    Raw text of a model response plus the token usage reported for it.
+    `aborted` names the reason a streamed response was cancelled early
+    (see `models.streaming.StreamMonitor`); `text` then holds only what
+    is worth parsing. `latency` is the time spent in the request itself,
+    summed over retried attempts but excluding rate-limit waits and
+    retry backoff.
+    """
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    aborted: Optional[str] = None
+    latency: Optional[float] = None
+
+
+def parse_json(text: str) -> Optional[Union[Dict, List[Dict]]]:
+    """
+    Safely extract and parse a JSON object (or array of objects) from
+    raw model output.
+
+    This helper function searches for the first opening brace '{'
+    and the last closing brace '}' to isolate a JSON object,
+    then attempts to parse it. If an opening bracket '[' comes before
+    the first brace, the text between the first '[' and the last ']'
+    is parsed as an array instead (multi-review responses).
+
+    The function is intentionally defensive and will return None
+    rather than raising an exception if parsing fails.
+    """
+    try:
+        start = text.find("{")
+        array_start = text.find("[")
+        if array_start != -1 and (start == -1 or array_start < start):
+            start, end = array_start, text.rfind("]")
+        else:
+            end = text.rfind("}")
+        if start == -1 or end == -1:
+            return None
+        return json.loads(text[start:end + 1])
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap upper-leaning token estimate (~3 characters per token for
+    English text), used for client-side token budgeting.
+    """
+    return len(text) // 3 + 1
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` units per minute,
+    holding at most one minute's worth.
+
+    `reserve` always succeeds immediately and returns how long the
+    caller must wait before proceeding; the balance may go negative, so
+    concurrent callers queue up behind each other instead of all waking
+    at once. This lets the same bucket serve sync (time.sleep) and async
+    (asyncio.sleep) callers.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        """
+        Return units reserved but not used (e.g. when the actual token
+        usage is lower than the estimate). Negative amounts charge extra.
+        """
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute limits for one
+    (provider, model) pair. Either limit may be None (unlimited).
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def settle(self, reserved: int, used: int):
+        if self.tokens is not None and used:
+            self.tokens.refund(reserved - used)
+
+
+class Provider:
+    """
+    Base class for LLM / embedding provider adapters.
+
+    Handles everything that is common across providers:
+
+    - one lazily created SDK client per process (and one async client
+      per event loop), so keep-alive connections are pooled and reused
+      across calls instead of opening a new connection per request
+    - per-call timeouts
+    - client-side request and token rate limiting per model
+    - retries with jittered exponential backoff that honour Retry-After
+
+    An adapter only has to build its SDK clients and translate a single
+    request, by overriding `_make_client`, `_make_async_client`,
+    `_complete`, `_acomplete`, (for streaming) `_stream` / `_astream` and
+    (for embedding providers) `_embed` / `_aembed`, then register itself
+    with `register_provider`.
+    """
+
+    name = "base"
+
+    # Exception types that are always worth retrying (connection
+    # errors, timeouts). HTTP errors are classified by status code.
+    transient_errors: tuple = ()
+    retry_statuses = (408, 409, 429, 500, 502, 503, 504, 529)
+
+    def __init__(self, timeout: float = 60.0, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limiters: dict[str, RateLimiter] = {}
+        self._timeouts: dict[str, float] = {}
+        self._retry_budgets: dict[str, int] = {}
+        self._client = None
+        self._async_clients: dict = {}
+
+    # ---- configuration ----
+
+    def configure(self, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                  timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                  **options):
+        """
+        Set the rate limits for `model` and, optionally, its request
+        timeout and retry budget (the provider's defaults otherwise).
+        Adapter-specific `options` (the `options` mapping of a config
+        entry) are ignored by default.
+        """
+        self._limiters[model] = RateLimiter(rpm, tpm)
+        if timeout is not None:
+            self._timeouts[model] = timeout
+        if max_retries is not None:
+            self._retry_budgets[model] = max_retries
+
+    def _limiter(self, model: str) -> RateLimiter:
+        if model not in self._limiters:
+            self._limiters[model] = RateLimiter()
+        return self._limiters[model]
+
+    def _timeout(self, model: str) -> float:
+        """
+        Request timeout in seconds for `model`, passed on every SDK call.
+        """
+        return self._timeouts.get(model, self.timeout)
+
+    # ---- clients ----
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._make_client()
+        return self._client
+
+    @property
+    def async_client(self):
+        # async connection pools are bound to the event loop that created them
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            self._async_clients.clear()
+            client = self._make_async_client()
+            self._async_clients[loop] = client
+        return client
+
+    def _make_client(self):
+        raise NotImplementedError
+
+    def _make_async_client(self):
+        raise NotImplementedError
+
+    # ---- retries ----
+
+    def _retry_delay(self, exc: Exception, attempt: int, max_retries: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying after `exc`, or None if the
+        error is not retryable or the retry budget is spent.
+        """
+        if attempt >= max_retries:
+            return None
+        status = getattr(exc, "status_code", None)
+        if not isinstance(exc, self.transient_errors) and status not in self.retry_statuses:
+            return None
+
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _call(self, model: str, tokens: int, fn, *args):
+        limiter = self._limiter(model)
+        max_retries = self._retry_budgets.get(model, self.max_retries)
+        attempt = 0
+        while True:
+            time.sleep(limiter.reserve(tokens))
+            try:
+                return fn(*args)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, max_retries)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    async def _acall(self, model: str, tokens: int, fn, *args):
+        limiter = self._limiter(model)
+        max_retries = self._retry_budgets.get(model, self.max_retries)
+        attempt = 0
+        while True:
+            await asyncio.sleep(limiter.reserve(tokens))
+            try:
+                return await fn(*args)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, max_retries)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _timed(fn):
+        """
+        Wrap a request function returning a `Completion` so the time of
+        every attempt, failed ones included, is added to its `latency`.
+        """
+        spent = [0.0]
+
+        def call(*args):
+            start = time.perf_counter()
+            try:
+                completion = fn(*args)
+            finally:
+                spent[0] += time.perf_counter() - start
+            completion.latency = spent[0]
+            return completion
+        return call
+
+    @staticmethod
+    def _atimed(fn):
+        """
+        Async counterpart of `_timed`.
+        """
+        spent = [0.0]
+
+        async def call(*args):
+            start = time.perf_counter()
+            try:
+                completion = await fn(*args)
+            finally:
+                spent[0] += time.perf_counter() - start
+            completion.latency = spent[0]
+            return completion
+        return call
+
+    # ---- completions ----
+
+    def complete(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Completion:
+        """
+        Send one prompt and return the raw completion, subject to the
+        rate limits and retry policy.
+        """
+        reserved = estimate_tokens(prompt) + max_tokens
+        completion = self._call(model, reserved, self._timed(self._complete),
+                                prompt, model, temperature, max_tokens)
+        self._limiter(model).settle(reserved, completion.input_tokens + completion.output_tokens)
+        return completion
+
+    async def acomplete(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Completion:
+        """
+        Async counterpart of `complete`.
+        """
+        reserved = estimate_tokens(prompt) + max_tokens
+        completion = await self._acall(model, reserved, self._atimed(self._acomplete),
+                                       prompt, model, temperature, max_tokens)
+        self._limiter(model).settle(reserved, completion.input_tokens + completion.output_tokens)
+        return completion
+
+    def complete_stream(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                        make_monitor) -> Completion:
+        """
+        Like `complete`, but the response is streamed through a fresh
+        `make_monitor()` (a `StreamMonitor`) and the request is cancelled
+        as soon as the monitor gives up on it. Retries start over with a
+        new monitor.
+        """
+        reserved = estimate_tokens(prompt) + max_tokens
+        completion = self._call(model, reserved, self._timed(self._stream_complete),
+                                prompt, model, temperature, max_tokens, make_monitor)
+        self._limiter(model).settle(reserved, completion.input_tokens + completion.output_tokens)
+        return completion
+
+    async def acomplete_stream(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                               make_monitor) -> Completion:
+        """
+        Async counterpart of `complete_stream`.
+        """
+        reserved = estimate_tokens(prompt) + max_tokens
+        completion = await self._acall(model, reserved, self._atimed(self._astream_complete),
+                                       prompt, model, temperature, max_tokens, make_monitor)
+        self._limiter(model).settle(reserved, completion.input_tokens + completion.output_tokens)
+        return completion
+
+    @staticmethod
+    def _streamed(prompt: str, monitor, usage: Completion) -> Completion:
+        """
+        Completion of a streamed request. Streams cancelled early report
+        no usage, so it is estimated from what was received.
+        """
+        return Completion(
+            text=monitor.text.strip(),
+            input_tokens=usage.input_tokens or estimate_tokens(prompt),
+            output_tokens=usage.output_tokens or estimate_tokens(monitor.received),
+            aborted=monitor.aborted,
+        )
+
+    def _stream_complete(self, prompt, model, temperature, max_tokens, make_monitor) -> Completion:
+        monitor, usage = make_monitor(), Completion("")
+        chunks = self._stream(prompt, model, temperature, max_tokens, usage)
+        try:
+            for delta in chunks:
+                if monitor.feed(delta):
+                    break
+        finally:
+            chunks.close()  # closes the SDK stream, i.e. the connection
+        return self._streamed(prompt, monitor, usage)
+
+    async def _astream_complete(self, prompt, model, temperature, max_tokens, make_monitor) -> Completion:
+        monitor, usage = make_monitor(), Completion("")
+        chunks = self._astream(prompt, model, temperature, max_tokens, usage)
+        try:
+            async for delta in chunks:
+                if monitor.feed(delta):
+                    break
+        finally:
+            await chunks.aclose()
+        return self._streamed(prompt, monitor, usage)
+
+    def generate_review(self, prompt: str, model: str, temperature: float,
+                        max_tokens: int) -> Optional[Union[Dict, List[Dict]]]:
+        """
+        Generate review(s) for `prompt` and parse the JSON response
+        (None if the output is not valid JSON).
+        """
+        return parse_json(self.complete(prompt, model, temperature, max_tokens).text)
+
+    async def agenerate_review(self, prompt: str, model: str, temperature: float,
+                               max_tokens: int) -> Optional[Union[Dict, List[Dict]]]:
+        """
+        Async counterpart of `generate_review`.
+        """
+        return parse_json((await self.acomplete(prompt, model, temperature, max_tokens)).text)
+
+    def _complete(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Completion:
+        raise NotImplementedError
+
+    async def _acomplete(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Completion:
+        raise NotImplementedError
+
+    def _stream(self, prompt: str, model: str, temperature: float, max_tokens: int, usage: Completion):
+        """
+        Generator of the text deltas of a streamed completion. Token usage
+        reported by the API is stored on `usage`.
+        """
+        raise NotImplementedError(f"{self.name} does not support streaming")
+
+    async def _astream(self, prompt: str, model: str, temperature: float, max_tokens: int, usage: Completion):
+        raise NotImplementedError(f"{self.name} does not support streaming")
+        yield  # makes this an async generator
+
+    # ---- embeddings ----
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        """
+        Embed a batch of texts in one request, subject to the rate limits
+        and retry policy.
+        """
+        tokens = sum(estimate_tokens(t) for t in texts)
+        return self._call(model, tokens, self._embed, texts, model)
+
+    async def aembed(self, texts: list[str], model: str) -> list[list[float]]:
+        """
+        Async counterpart of `embed`.
+        """
+        tokens = sum(estimate_tokens(t) for t in texts)
+        return await self._acall(model, tokens, self._aembed, texts, model)
+
+    def _embed(self, texts: list[str], model: str) -> list[list[float]]:
+        raise NotImplementedError(f"{self.name} does not provide embeddings")
+
+    async def _aembed(self, texts: list[str], model: str) -> list[list[float]]:
+        raise NotImplementedError(f"{self.name} does not provide embeddings")
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """
+    Server-requested delay from a Retry-After (or retry-after-ms) header
+    on the error's HTTP response, if present.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def register_provider(cls):
+    """
+    Register a Provider subclass under its `name`.
+    """
+    _PROVIDER_CLASSES[cls.name] = cls
+    return cls
+
+
+def get_provider(name: str) -> Provider:
+    """
+    Shared adapter instance for a provider, importing its module on
+    first use.
+    """
+    if name not in _PROVIDERS:
+        if name not in _PROVIDER_CLASSES and name in PROVIDER_MODULES:
+            importlib.import_module(PROVIDER_MODULES[name])
+        if name not in _PROVIDER_CLASSES:
+            raise ValueError(f"Unknown provider: {name}")
+        _PROVIDERS[name] = _PROVIDER_CLASSES[name]()
+    return _PROVIDERS[name]
+
+
+def configure_providers(cfg: dict):
+    """
+    Apply the per-model limits from config.yaml (`rpm`, `tpm`, `timeout`,
+    `max_retries` on each `models` entry and on `embeddings`) and any
+    adapter-specific `options`.
+    """
+    for entry in cfg["models"] + [cfg["embeddings"]]:
+        get_provider(entry["provider"]).configure(
+            entry["model"],
+            rpm=entry.get("rpm"),
+            tpm=entry.get("tpm"),
+            timeout=entry.get("timeout"),
+            max_retries=entry.get("max_retries"),
+            **(entry.get("options") or {}),
+        )
@@ -0,0 +1,157 @@
+from typing import Optional
+
+# Default number of characters a response may open with (e.g. a code
+# fence or a short preamble) before it must have started a JSON value
+DEFAULT_SHAPE_CHARS = 200
+
+
+class StreamMonitor:
+    """
+    Incremental scanner for a streamed review response, deciding after
+    every chunk whether the request is worth finishing.
+
+    It follows the JSON structure character by character (strings,
+    escapes, object keys and nesting) without building any objects, and
+    aborts when:
+
+    - "shape": no JSON object or array has started within `shape_chars`
+      characters, or an array response holds something other than
+      objects (`parse_json` would reject it anyway)
+    - "length": the value of a "review" key has grown past
+      `max_review_chars`. In an array response of `items` reviews this
+      only aborts on the last one: cancelling earlier would also lose
+      the reviews after it, so those over-long reviews are left for the
+      caller to reject once the response is complete.
+
+    Reviews of an array response that were complete before the abort are
+    kept: `text` then holds just those items, as a valid JSON array.
+    """
+
+    def __init__(self, max_review_chars: Optional[int] = None, shape_chars: int = DEFAULT_SHAPE_CHARS,
+                 items: int = 1):
+        self.max_review_chars = max_review_chars
+        self.shape_chars = shape_chars
+        self.items = items
+        self.aborted: Optional[str] = None
+        self._chunks: list[str] = []
+        self._received = 0
+
+        self._root_start: Optional[int] = None
+        self._root_is_array = False
+        self._last_item_end: Optional[int] = None
+        self._item = -1
+        # Open containers: "{" / "[" per nesting level
+        self._stack: list[str] = []
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._last_key: Optional[str] = None
+        self._key_chars: list[str] = []
+        self._in_review = False
+        self._review_chars = 0
+
+    @property
+    def received(self) -> str:
+        """
+        Everything streamed so far.
+        """
+        return "".join(self._chunks)
+
+    @property
+    def text(self) -> str:
+        """
+        Text to parse as the response: everything received, or after an
+        abort the complete items of an array response (or "").
+        """
+        if self.aborted is None:
+            return self.received
+        if self._root_is_array and self._last_item_end is not None:
+            return self.received[self._root_start:self._last_item_end] + "]"
+        return ""
+
+    def feed(self, delta: str) -> bool:
+        """
+        Scan the next chunk of the response. Returns True once the
+        request should be aborted (`aborted` holds the reason).
+        """
+        if self.aborted is not None:
+            return True
+        offset = self._received
+        self._chunks.append(delta)
+        self._received += len(delta)
+
+        for k, ch in enumerate(delta):
+            if self._scan(ch, offset + k):
+                return True
+
+        if self._root_start is None and self._received > self.shape_chars:
+            self.aborted = "shape"
+        return self.aborted is not None
+
+    def _scan(self, ch: str, pos: int) -> bool:
+        if self._root_start is None:
+            if ch in "{[":
+                self._root_start = pos
+                self._root_is_array = ch == "["
+                self._open(ch)
+            return False
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._in_review:
+                    self._in_review = False
+                elif self._expect_key:
+                    self._last_key = "".join(self._key_chars)
+                return False
+            if self._in_review:
+                if not self._escape:
+                    self._review_chars += 1
+                if (self.max_review_chars is not None and self._review_chars > self.max_review_chars
+                        and (not self._root_is_array or self._item >= self.items - 1)):
+                    self.aborted = "length"
+                    return True
+            elif self._expect_key and len(self._key_chars) < 16:
+                self._key_chars.append(ch)
+            return False
+
+        if not self._stack:
+            return False  # trailing text after the JSON value
+        top = self._stack[-1]
+        if ch == '"':
+            self._in_string = True
+            if top == "{" and self._expect_key:
+                self._key_chars = []
+            elif top == "{" and self._last_key == "review":
+                self._in_review = True
+                self._review_chars = 0
+        elif ch in "{[":
+            if self._root_is_array and len(self._stack) == 1:
+                if ch != "{":
+                    self.aborted = "shape"
+                    return True
+                self._item += 1
+            self._open(ch)
+        elif ch in "}]":
+            self._stack.pop()
+            if self._root_is_array and len(self._stack) == 1:
+                self._last_item_end = pos + 1
+            self._expect_key = False
+        elif top == "{" and ch == ":":
+            self._expect_key = False
+        elif top == "{" and ch == ",":
+            self._expect_key = True
+            self._last_key = None
+        elif self._root_is_array and len(self._stack) == 1 and ch not in ", \t\r\n":
+            self.aborted = "shape"
+            return True
+        return False
+
+    def _open(self, ch: str):
+        self._stack.append(ch)
+        self._expect_key = ch == "{"
+        self._last_key = None
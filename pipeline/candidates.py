@@ -0,0 +1,231 @@
+import os
+import json
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+from evaluation.realism import realism_matchers
+from pipeline.sharding import dedup_merge
+
+# Order of the guardrail chain; refilter reports rejections in this order
+REJECTION_REASONS = [
+    "shape", "length", "parse", "sentiment", "realism", "drawback", "no_embedding",
+    "target", "quota", "semantic_similarity", "vocabulary_overlap",
+]
+
+
+class CandidateStore:
+    """
+    Append-only pool of every generation candidate, accepted or not, so
+    guardrail thresholds can be re-tuned offline (see `refilter`).
+
+    The pool lives in a directory with three files:
+
+    - candidates.jsonl: one JSON object per candidate (prompt parameters,
+                        model, latency, token usage, review text,
+                        features, keyword hits, drawback presence, the
+                        guardrail that rejected it, and `row`, its
+                        embedding row or -1 if it was never embedded)
+    - embeddings.f32:   append-only float32 matrix of the embeddings
+    - meta.json:        the embedding dimension
+
+    Every candidate is flushed as it is added. A crash can at worst leave
+    a partial last line or row, which is discarded when the pool is
+    reopened for appending (`generate.py --resume`).
+    """
+
+    def __init__(self, directory: str, append: bool = False):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._records_path = os.path.join(directory, "candidates.jsonl")
+        self._vectors_path = os.path.join(directory, "embeddings.f32")
+        self._meta_path = os.path.join(directory, "meta.json")
+
+        self.dim = None
+        self.count = 0
+        self._rows = 0
+        if append:
+            self._recover()
+        else:
+            for path in (self._records_path, self._vectors_path, self._meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._records = open(self._records_path, "a")
+        self._vectors = open(self._vectors_path, "ab")
+
+    def _recover(self):
+        """
+        Drop a partial last line / row left by an interrupted run and
+        restore the counters.
+        """
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)["dim"]
+
+        rows = 0
+        if self.dim is not None and os.path.exists(self._vectors_path):
+            rows = os.path.getsize(self._vectors_path) // (self.dim * 4)
+
+        valid_bytes = 0
+        if os.path.exists(self._records_path):
+            with open(self._records_path, "rb") as f:
+                for line in f:
+                    # Embeddings are written before their line, so a
+                    # complete line never points past the last full row
+                    if not line.endswith(b"\n"):
+                        break
+                    row = json.loads(line)["row"]
+                    if row >= rows:
+                        break
+                    valid_bytes += len(line)
+                    self.count += 1
+                    self._rows = max(self._rows, row + 1)
+            with open(self._records_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        if os.path.exists(self._vectors_path):
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(self._rows * (self.dim or 0) * 4)
+
+    def add(self, candidate: dict, embedding=None):
+        """
+        Append one candidate and, if it was embedded, its embedding.
+        """
+        row = -1
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32).ravel()
+            if self.dim is None:
+                self.dim = len(vector)
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            elif len(vector) != self.dim:
+                raise ValueError(f"Expected embeddings of dimension {self.dim}, got {len(vector)}")
+            self._vectors.write(vector.tobytes())
+            self._vectors.flush()
+            row = self._rows
+            self._rows += 1
+
+        self._records.write(json.dumps({**candidate, "row": row}, ensure_ascii=False) + "\n")
+        self._records.flush()
+        self.count += 1
+
+    def close(self):
+        for f in (self._records, self._vectors):
+            if not f.closed:
+                f.close()
+
+
+def load_candidates(directory: str) -> tuple[list[dict], np.ndarray]:
+    """
+    Candidates of a pool and its embedding matrix (memory-mapped; row i
+    belongs to the candidate whose `row` is i).
+    """
+    candidates = []
+    with open(os.path.join(directory, "candidates.jsonl")) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            candidates.append(json.loads(line))
+
+    meta_path = os.path.join(directory, "meta.json")
+    vectors_path = os.path.join(directory, "embeddings.f32")
+    if not os.path.exists(meta_path) or not os.path.getsize(vectors_path):
+        return candidates, np.empty((0, 0), dtype=np.float32)
+    with open(meta_path) as f:
+        dim = json.load(f)["dim"]
+    rows = os.path.getsize(vectors_path) // (dim * 4)
+    return candidates, np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+
+
+def content_mask(cfg: dict, candidates: list[dict]) -> list[Optional[str]]:
+    """
+    Vectorized replay of the order-independent guardrails (parsing,
+    sentiment alignment, keyword coverage, drawback presence) under the
+    thresholds in `cfg`. Returns, per candidate, the first failing
+    guardrail or None. Candidates whose stream was cancelled keep the
+    reason of the cancellation ("shape" or "length").
+
+    Polarity comes from the stored feature records, so TextBlob is never
+    run again. Keyword and drawback matches are recomputed from the text
+    with the batch matchers, so new keyword lists or match modes apply.
+    """
+    sentiment = cfg["guardrails"]["sentiment"]
+    realism = cfg["guardrails"]["realism"]
+    parsed = [i for i, c in enumerate(candidates) if c.get("review") is not None and c.get("features")]
+    reasons: list[Optional[str]] = [
+        c["rejection"] if c.get("rejection") in ("shape", "length") else "parse" for c in candidates
+    ]
+    if not parsed:
+        return reasons
+
+    texts = [candidates[i]["review"] for i in parsed]
+    polarity = np.array([candidates[i]["features"]["polarity"] for i in parsed])
+    rating = np.array([candidates[i]["rating"] for i in parsed])
+    keywords, drawback_markers = realism_matchers(cfg)
+    hits = np.array(keywords.count_batch(texts))
+    drawback = np.array(drawback_markers.any_batch(texts))
+
+    sentiment_fail = (((rating <= 2) & (polarity > sentiment["low_rating_positive_cutoff"]))
+                      | ((rating >= 4) & (polarity < sentiment["high_rating_negative_cutoff"])))
+    realism_fail = hits < realism["min_keyword_hits"]
+    drawback_fail = (rating >= 4) & bool(realism["require_drawback_for_high_ratings"]) & ~drawback
+
+    for j, i in enumerate(parsed):
+        if sentiment_fail[j]:
+            reasons[i] = "sentiment"
+        elif realism_fail[j]:
+            reasons[i] = "realism"
+        elif drawback_fail[j]:
+            reasons[i] = "drawback"
+        else:
+            reasons[i] = None
+    return reasons
+
+
+def refilter(cfg: dict, candidates: list[dict], embeddings: np.ndarray):
+    """
+    Replay the guardrail chain over a candidate pool under the
+    thresholds in `cfg`, offline: no generation or embedding calls.
+
+    Candidates are visited in the order they completed during
+    generation. The content guardrails run vectorized (`content_mask`);
+    the survivors then go through the target, quota and dedup checks
+    against the reviews kept before them, chunked and vectorized as in
+    the shard merge (`pipeline.sharding.dedup_merge`), which gives the
+    same decisions as checking them one by one. Candidates that pass the
+    content checks but were never embedded (rejected at generation time
+    by a stricter content threshold with `candidates.embed_rejected`
+    turned off) cannot be dedup-checked and are skipped as
+    "no_embedding".
+
+    Returns (records, embeddings, rejections, model_stats): the kept
+    reviews in dataset format, their L2-normalized embeddings, the number
+    of candidates rejected by each guardrail, and per-provider
+    statistics for the report.
+    """
+    rejections = Counter()
+    model_stats = {}
+    survivors, rows = [], []
+
+    for candidate, reason in zip(candidates, content_mask(cfg, candidates)):
+        stats = model_stats.setdefault(candidate["model"], {"accepted": 0, "rejected": 0, "time": 0.0})
+        stats["time"] += candidate.get("latency", 0.0)
+        if reason is None and candidate["row"] < 0:
+            reason = "no_embedding"
+        if reason is not None:
+            rejections[reason] += 1
+            stats["rejected"] += 1
+            continue
+        stats["accepted"] += 1
+        survivors.append({
+            "model": candidate["model"],
+            "persona": candidate["persona"],
+            "rating": candidate["rating"],
+            "review": candidate["review"],
+            "features": candidate["features"],
+        })
+        rows.append(candidate["row"])
+
+    vectors = np.asarray(embeddings[rows]) if rows else np.empty((0, 0), dtype=np.float32)
+    records, matrix = dedup_merge(cfg, [(survivors, vectors)], model_stats, reasons=rejections)
+    return records, matrix, rejections, model_stats
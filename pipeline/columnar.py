@@ -0,0 +1,223 @@
+import os
+import json
+import shutil
+from typing import Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Feature columns (see `evaluation.features`) and the ones stored as ints
+FEATURE_NAMES = ["polarity", "length", "n_words", "n_unique_tokens"]
+INT_FEATURES = {"length", "n_words", "n_unique_tokens"}
+
+# Low-cardinality string columns, stored as codes into a dictionary
+CATEGORICAL = ["model", "persona"]
+
+
+def _categorical(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    """
+    Dictionary-encode `values`: int16 codes plus the distinct values in
+    order of first appearance.
+    """
+    dictionary: dict[str, int] = {}
+    codes = np.fromiter((dictionary.setdefault(v, len(dictionary)) for v in values),
+                        dtype=np.int16, count=len(values))
+    return codes, list(dictionary)
+
+
+def _source_stamp(path: Optional[str]) -> dict:
+    """
+    Name, size and modification time (ns) of the JSONL file a bundle
+    mirrors, for `open_columnar` to tell whether it has changed since.
+    """
+    if not path or not os.path.exists(path):
+        return {"source": os.path.basename(path) if path else None, "source_bytes": None, "source_mtime_ns": None}
+    stat = os.stat(path)
+    return {"source": os.path.basename(path), "source_bytes": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def write_columnar(path: str, records: list[dict], embeddings, embedding_model: Optional[str] = None,
+                   source_path: Optional[str] = None):
+    """
+    Write accepted reviews as a columnar bundle: a directory of `.npy`
+    columns plus a JSON index, readable through memory maps by
+    `ColumnarDataset`.
+
+    Files:
+    - meta.json:        row count, dictionaries of the categorical columns,
+                        feature names, embedding model and the size and
+                        modification time of the JSONL dataset the bundle
+                        mirrors (`source_path`)
+    - rating.npy:       int8
+    - model.npy,
+      persona.npy:      int16 codes into the meta.json dictionaries
+    - features.npy:     float64 matrix, one column per FEATURE_NAMES entry
+    - text.bin,
+      text_offsets.npy: UTF-8 review texts back to back, and the int64
+                        offset of each one (n + 1 entries)
+    - embeddings.npy:   float32 matrix, one L2-normalized row per review
+
+    The bundle is written to a temporary directory and swapped in, so
+    readers never see a half-written one.
+    """
+    n = len(records)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if n and len(embeddings) != n:
+        raise ValueError(f"Expected {n} embeddings, got {len(embeddings)}")
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "count": n,
+        "features": FEATURE_NAMES,
+        "embedding_model": embedding_model,
+        "dictionaries": {},
+        **_source_stamp(source_path),
+    }
+    for name in CATEGORICAL:
+        codes, meta["dictionaries"][name] = _categorical([r[name] for r in records])
+        np.save(os.path.join(tmp_path, f"{name}.npy"), codes)
+
+    np.save(os.path.join(tmp_path, "rating.npy"), np.array([r["rating"] for r in records], dtype=np.int8))
+
+    features = np.array([[r["features"][f] for f in FEATURE_NAMES] for r in records], dtype=np.float64)
+    np.save(os.path.join(tmp_path, "features.npy"), features.reshape(n, len(FEATURE_NAMES)))
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    with open(os.path.join(tmp_path, "text.bin"), "wb") as f:
+        for i, r in enumerate(records):
+            data = r["review"].encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(tmp_path, "text_offsets.npy"), offsets)
+
+    np.save(os.path.join(tmp_path, "embeddings.npy"), embeddings.reshape(n, -1) if n else embeddings)
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # A directory cannot be renamed over a non-empty one, so move the old
+    # bundle aside first
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class ColumnarDataset:
+    """
+    Read-only view of a bundle written by `write_columnar`.
+
+    Every column is memory-mapped, so opening the bundle is O(1) and the
+    analysis passes read ratings, features and embeddings straight from
+    the page cache without parsing JSON. Review texts are decoded only
+    when asked for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version in {path}: {self.meta.get('version')}")
+        self.feature_names = self.meta["features"]
+        self.dictionaries = self.meta["dictionaries"]
+        self.embedding_model = self.meta["embedding_model"]
+
+        self.rating = self._load("rating")
+        self.codes = {name: self._load(name) for name in CATEGORICAL}
+        self.features = self._load("features")
+        self.embeddings = self._load("embeddings")
+        self._offsets = self._load("text_offsets")
+        text_path = os.path.join(path, "text.bin")
+        self._text = (np.memmap(text_path, dtype=np.uint8, mode="r")
+                      if os.path.getsize(text_path) else np.empty(0, dtype=np.uint8))
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def feature(self, name: str) -> np.ndarray:
+        """
+        One feature column (e.g. "polarity"), as a memory-mapped view.
+        """
+        return self.features[:, self.feature_names.index(name)]
+
+    def values(self, name: str) -> list[str]:
+        """
+        Decoded values of a categorical column ("model" or "persona").
+        """
+        dictionary = self.dictionaries[name]
+        return [dictionary[c] for c in self.codes[name]]
+
+    def value_counts(self, name: str) -> dict[str, int]:
+        """
+        Row count per value of a categorical column, in order of first
+        appearance.
+        """
+        counts = np.bincount(self.codes[name], minlength=len(self.dictionaries[name]))
+        return {v: int(c) for v, c in zip(self.dictionaries[name], counts) if c}
+
+    def text(self, i: int) -> str:
+        return bytes(self._text[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def texts(self, start: int = 0, stop: Optional[int] = None) -> list[str]:
+        stop = len(self) if stop is None else stop
+        return [self.text(i) for i in range(start, stop)]
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> list[dict]:
+        """
+        Rows [start, stop) as dataset records, identical to the lines of
+        the JSONL dataset.
+        """
+        stop = len(self) if stop is None else stop
+        models, personas = self.dictionaries["model"], self.dictionaries["persona"]
+        records = []
+        for i in range(start, stop):
+            row = self.features[i]
+            records.append({
+                "model": models[self.codes["model"][i]],
+                "persona": personas[self.codes["persona"][i]],
+                "rating": int(self.rating[i]),
+                "review": self.text(i),
+                "features": {
+                    name: int(value) if name in INT_FEATURES else float(value)
+                    for name, value in zip(self.feature_names, row)
+                },
+            })
+        return records
+
+    def iter_chunks(self, chunk_size: int):
+        """
+        Stream the bundle as (start, records) pairs of at most
+        `chunk_size` rows.
+        """
+        for start in range(0, len(self), chunk_size):
+            yield start, self.records(start, min(start + chunk_size, len(self)))
+
+
+def open_columnar(cfg: dict, dataset_path: Optional[str] = None) -> Optional[ColumnarDataset]:
+    """
+    The columnar bundle configured at `outputs.columnar_path`, or None if
+    it is disabled, missing, or stale, i.e. the JSONL dataset it mirrors
+    (`dataset_path`, default `outputs.dataset_path`) has a different name,
+    size or modification time than when the bundle was written. Callers
+    then fall back to the JSONL file.
+    """
+    path = cfg["outputs"].get("columnar_path")
+    if not path or not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    dataset = ColumnarDataset(path)
+    dataset_path = dataset_path or cfg["outputs"]["dataset_path"]
+    stamp = _source_stamp(dataset_path)
+    if stamp["source_bytes"] is None or any(dataset.meta.get(key) != value for key, value in stamp.items()):
+        return None
+    return dataset
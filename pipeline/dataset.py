@@ -0,0 +1,95 @@
+import os
+import json
+
+
+class DatasetWriter:
+    """
+    Append-only JSONL writer for accepted reviews.
+
+    Every record is flushed to the OS as soon as it is written (and
+    optionally fsync'ed), so a crash, rate-limit exception or Ctrl-C only
+    loses the attempts that were in flight, never the reviews already
+    accepted and paid for.
+    """
+
+    def __init__(self, path: str, append: bool = False, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        if append:
+            truncate_partial_line(path)
+        self._f = open(path, "a" if append else "w")
+
+    def write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def truncate_partial_line(path: str):
+    """
+    Drop a trailing, newline-less line left behind by an interrupted
+    write, so that appending resumes on a clean line boundary.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_dataset(path: str) -> list[dict]:
+    """
+    Load a JSONL dataset, ignoring a partially written last line.
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            records.append(json.loads(line))
+    return records
+
+
+def iter_dataset_chunks(path: str, chunk_size: int):
+    """
+    Stream a JSONL dataset as lists of at most `chunk_size` raw lines
+    (unparsed), ignoring a partially written last line.
+    """
+    chunk = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            if not line.strip():
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_json_atomic(path: str, obj):
+    """
+    Write a JSON file via a temporary file and rename, so readers (and a
+    resumed run) never see a half-written checkpoint.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,215 @@
+import random
+from collections import Counter
+
+
+class AliasTable:
+    """
+    Vose's alias method: O(n) construction, O(1) weighted draws.
+    """
+
+    def __init__(self, weights: list[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("AliasTable needs at least one positive weight")
+
+        scaled = [w * n / total for w in weights]
+        self._prob = [0.0] * n
+        self._alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    def sample(self) -> int:
+        i = random.randrange(len(self._prob))
+        return i if random.random() < self._prob[i] else self._alias[i]
+
+
+def _largest_remainder(total: int, weights: list[float]) -> list[int]:
+    """
+    Split `total` into integers proportional to `weights` that sum
+    exactly to `total` (Hamilton / largest-remainder apportionment).
+    """
+    s = float(sum(weights))
+    raw = [total * w / s for w in weights]
+    counts = [int(r) for r in raw]
+    by_remainder = sorted(range(len(raw)), key=lambda i: raw[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def allocate_quotas(rating_distribution: dict, personas: list[dict], target: int) -> dict:
+    """
+    Per-(persona, rating) cell quotas summing exactly to `target`.
+
+    Rating totals follow `rating_distribution`; each rating's total is
+    then split across personas by their optional `weight` (uniform by
+    default), rotating which persona gets the rounding leftovers so
+    persona totals stay balanced too.
+    """
+    ratings = [int(r) for r in rating_distribution]
+    rating_totals = _largest_remainder(target, list(rating_distribution.values()))
+    weights = [p.get("weight", 1.0) for p in personas]
+
+    quotas = {}
+    for k, (rating, total) in enumerate(zip(ratings, rating_totals)):
+        shift = k % len(personas)
+        rotated = weights[shift:] + weights[:shift]
+        counts = _largest_remainder(total, rotated)
+        counts = counts[-shift:] + counts[:-shift] if shift else counts
+        for persona_cfg, count in zip(personas, counts):
+            quotas[(persona_cfg["name"], rating)] = count
+    return quotas
+
+
+class RandomSampler:
+    """
+    Independent persona and rating draws (the original behaviour): a
+    uniform persona and a rating from `rating_distribution`, drawn in
+    O(1) from an alias table.
+    """
+
+    def __init__(self, cfg: dict):
+        self.personas = cfg["generation"]["personas"]
+        distribution = cfg["generation"]["rating_distribution"]
+        self._ratings = [int(r) for r in distribution]
+        self._table = AliasTable(list(distribution.values()))
+
+    def sample(self) -> tuple[dict, int]:
+        return random.choice(self.personas), self._ratings[self._table.sample()]
+
+    def start(self, persona_cfg: dict, rating: int):
+        pass
+
+    def finish(self, persona_cfg: dict, rating: int, accepted: bool):
+        pass
+
+    def cancel(self, persona_cfg: dict, rating: int):
+        pass
+
+    def is_full(self, persona_cfg: dict, rating: int) -> bool:
+        return False
+
+
+class QuotaSampler(RandomSampler):
+    """
+    Stratified sampler that fills exact per-(persona, rating) quotas.
+
+    Each cell's quota comes from `allocate_quotas`. Draws are weighted by
+    the cell's remaining deficit (net of the acceptances expected from
+    attempts already in flight) times its estimated yield, so the most
+    under-filled, highest-yield cells are sampled first and cells that
+    are already full are never sampled. Yield is the cell's acceptance
+    rate, shrunk toward its rating's acceptance rate while the cell has
+    few attempts (e.g. 4-5 star cells that often fail the drawback
+    check).
+
+    Weights change only when an attempt starts or finishes; the alias
+    table is rebuilt lazily on the next draw, which is O(cells) and
+    keeps each draw O(1).
+    """
+
+    def __init__(self, cfg: dict, accepted: list[dict] = ()):
+        super().__init__(cfg)
+        gen = cfg["generation"]
+        self._persona_by_name = {p["name"]: p for p in self.personas}
+        quotas = allocate_quotas(gen["rating_distribution"], self.personas, gen["target_accepted"])
+        self._cells = [cell for cell, q in quotas.items() if q > 0]
+        self._quota = quotas
+
+        self._filled = Counter(
+            (r["persona"], r["rating"]) for r in accepted if (r["persona"], r["rating"]) in quotas
+        )
+        self._pending = Counter()
+        self._attempts = Counter()
+        self._accepts = Counter()
+        self._rating_attempts = Counter()
+        self._rating_accepts = Counter()
+        self._table = None
+        self._exhausted = False
+
+    def _yield(self, cell) -> float:
+        rating = cell[1]
+        prior = (self._rating_accepts[rating] + 1) / (self._rating_attempts[rating] + 2)
+        return (self._accepts[cell] + 2 * prior) / (self._attempts[cell] + 2)
+
+    def _rebuild(self):
+        deficits = [max(self._quota[c] - self._filled[c], 0) for c in self._cells]
+        weights = []
+        for cell, deficit in zip(self._cells, deficits):
+            y = self._yield(cell)
+            weights.append(max(deficit - self._pending[cell] * y, 0.0) * y)
+        if sum(weights) <= 0:
+            # Every open cell is covered by in-flight attempts; keep
+            # sampling open cells in proportion to their deficit.
+            weights = [float(d) for d in deficits]
+        self._exhausted = sum(weights) <= 0
+        self._table = None if self._exhausted else AliasTable(weights)
+
+    def sample(self) -> tuple[dict, int]:
+        """
+        Draw the next (persona, rating) cell.
+
+        If every quota is already filled (only possible when resuming a
+        dataset generated with a different distribution), falls back to
+        independent random draws.
+        """
+        if self._table is None:
+            self._rebuild()
+        if self._exhausted:
+            return super().sample()
+        persona, rating = self._cells[self._table.sample()]
+        return self._persona_by_name[persona], rating
+
+    def start(self, persona_cfg: dict, rating: int):
+        self._pending[(persona_cfg["name"], rating)] += 1
+        self._table = None
+
+    def finish(self, persona_cfg: dict, rating: int, accepted: bool):
+        cell = (persona_cfg["name"], rating)
+        self._pending[cell] -= 1
+        self._attempts[cell] += 1
+        self._rating_attempts[rating] += 1
+        if accepted:
+            self._filled[cell] += 1
+            self._accepts[cell] += 1
+            self._rating_accepts[rating] += 1
+        self._table = None
+
+    def cancel(self, persona_cfg: dict, rating: int):
+        """
+        Release a started slot without counting it as an attempt of its
+        cell: the attempt was never launched, or its review was discarded
+        for reasons unrelated to the cell's yield (quota, target).
+        """
+        self._pending[(persona_cfg["name"], rating)] -= 1
+        self._table = None
+
+    def is_full(self, persona_cfg: dict, rating: int) -> bool:
+        if self._exhausted:
+            return False
+        cell = (persona_cfg["name"], rating)
+        return self._filled[cell] >= self._quota.get(cell, 0)
+
+
+def make_sampler(cfg: dict, accepted: list[dict] = ()) -> RandomSampler:
+    """
+    Build the persona/rating sampler selected by `generation.sampling`
+    ("quota" or "random"), seeded with already accepted records when
+    resuming.
+    """
+    mode = cfg["generation"].get("sampling", "random")
+    if mode == "quota":
+        return QuotaSampler(cfg, accepted)
+    if mode != "random":
+        raise ValueError(f"Unknown sampling mode: {mode}")
+    return RandomSampler(cfg)
@@ -0,0 +1,105 @@
+import random
+from typing import Optional
+
+
+class UniformScheduler:
+    """
+    Route each attempt to a uniformly random model entry, i.e. the
+    original `random.choice(cfg["models"])` policy.
+
+    Schedulers are told the outcome of every attempt through `update`,
+    which this policy ignores.
+    """
+
+    def __init__(self, models: list[dict]):
+        self.models = models
+
+    def choose(self, candidates: Optional[list[dict]] = None) -> dict:
+        """
+        Pick the model entry for the next attempt, optionally restricted
+        to `candidates` (e.g. providers with a free concurrency slot).
+        """
+        return random.choice(candidates or self.models)
+
+    def update(self, model_cfg: dict, accepted: bool, elapsed: float):
+        pass
+
+
+class BanditScheduler(UniformScheduler):
+    """
+    Thompson-sampling scheduler that routes attempts toward the model
+    with the best accepted reviews per second.
+
+    For each model entry the acceptance rate is modelled as
+    Beta(1 + accepted, 1 + rejected) and the cost of an attempt as its
+    mean latency so far. Each draw samples an acceptance rate per model
+    and picks the highest sampled rate / latency, which balances
+    exploiting the most productive model against exploring the others.
+
+    To keep provider diversity in the dataset, every model keeps a
+    guaranteed share of attempts: with probability `min_share` per model
+    the attempt is routed uniformly across models, and only the
+    remaining share follows the bandit.
+    """
+
+    def __init__(self, models: list[dict], min_share: float = 0.1,
+                 prior_latency: float = 1.0):
+        super().__init__(models)
+        if min_share * len(models) > 1:
+            raise ValueError("scheduler min_share is too large for the number of models")
+        self.min_share = min_share
+        self.prior_latency = prior_latency
+        self._arms = [{"accepted": 0, "rejected": 0, "time": 0.0} for _ in models]
+
+    def _arm(self, model_cfg: dict) -> dict:
+        for m, arm in zip(self.models, self._arms):
+            if m is model_cfg:
+                return arm
+        return self._arms[self.models.index(model_cfg)]
+
+    def warm_start(self, model_stats: dict):
+        """
+        Seed the arms from per-provider statistics of an earlier run
+        (only for providers that map to a single model entry).
+        """
+        providers = [m["provider"] for m in self.models]
+        for m, arm in zip(self.models, self._arms):
+            stats = model_stats.get(m["provider"])
+            if stats and providers.count(m["provider"]) == 1:
+                arm.update({k: stats[k] for k in ("accepted", "rejected", "time")})
+
+    def _score(self, arm: dict) -> float:
+        n = arm["accepted"] + arm["rejected"]
+        rate = random.betavariate(1 + arm["accepted"], 1 + arm["rejected"])
+        latency = (arm["time"] + self.prior_latency) / (n + 1)
+        return rate / latency
+
+    def choose(self, candidates: Optional[list[dict]] = None) -> dict:
+        candidates = candidates or self.models
+        if random.random() < self.min_share * len(self.models):
+            return random.choice(candidates)
+        return max(candidates, key=lambda m: self._score(self._arm(m)))
+
+    def update(self, model_cfg: dict, accepted: bool, elapsed: float):
+        arm = self._arm(model_cfg)
+        arm["accepted" if accepted else "rejected"] += 1
+        arm["time"] += elapsed
+
+
+def make_scheduler(cfg: dict, model_stats: Optional[dict] = None) -> UniformScheduler:
+    """
+    Build the scheduler selected by `generation.scheduler.policy`
+    (defaults to uniform routing), warm-started from `model_stats`
+    when resuming.
+    """
+    sched_cfg = dict(cfg["generation"].get("scheduler") or {})
+    policy = sched_cfg.pop("policy", "uniform")
+    if policy == "uniform":
+        return UniformScheduler(cfg["models"])
+    if policy != "bandit":
+        raise ValueError(f"Unknown scheduler policy: {policy}")
+
+    scheduler = BanditScheduler(cfg["models"], **sched_cfg)
+    if model_stats:
+        scheduler.warm_start(model_stats)
+    return scheduler
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+from evaluation.diversity import EmbeddingIndex, lexical_index_from_config, _normalize
+from pipeline.sampler import allocate_quotas, _largest_remainder
+
+DEFAULT_SHARD_DIR = "outputs/shards"
+MERGE_CHUNK_SIZE = 1024
+
+_SHARD_NAME = re.compile(r"^shard-(\d+)-of-(\d+)$")
+
+
+def shard_name(index: int, count: int) -> str:
+    return f"shard-{index:03d}-of-{count:03d}"
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """
+    Parse a "INDEX/COUNT" shard spec (0-based index), e.g. "2/8".
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard spec {spec!r}, expected INDEX/COUNT such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard spec {spec!r}: index must be in [0, {count})")
+    return index, count
+
+
+def shard_config(cfg: dict, index: int, count: int) -> dict:
+    """
+    Configuration for shard `index` of `count`.
+
+    The shard generates its slice of `target_accepted` (and of
+    `max_attempts`) with the usual local guardrails and writes all of its
+    outputs, including a columnar bundle holding its embeddings, a
+    private embedding cache, its candidate pool and its attempt trace,
+    under `outputs.shard_dir/shard-III-of-NNN`.
+    Mock models get a per-shard seed so shards do not replay the same
+    reviews. The client-side `rpm` / `tpm` limits of every `models` entry
+    and of `embeddings` are divided by `count`, so the shards together
+    stay within the configured limits of one API key.
+    """
+    shard = json.loads(json.dumps(cfg))
+    gen = shard["generation"]
+    gen["target_accepted"] = _largest_remainder(gen["target_accepted"], [1.0] * count)[index]
+    gen["max_attempts"] = _largest_remainder(gen["max_attempts"], [1.0] * count)[index]
+
+    for m in shard["models"]:
+        options = m.get("options") or {}
+        if "seed" in options:
+            options["seed"] += 1000 * (index + 1)
+    for entry in shard["models"] + [shard["embeddings"]]:
+        for key in ("rpm", "tpm"):
+            if entry.get(key):
+                entry[key] = entry[key] / count
+
+    directory = os.path.join(cfg["outputs"].get("shard_dir", DEFAULT_SHARD_DIR), shard_name(index, count))
+    outputs = shard["outputs"]
+    for key in ("dataset_path", "report_path", "run_log_path"):
+        outputs[key] = os.path.join(directory, os.path.basename(cfg["outputs"][key]))
+    outputs["columnar_path"] = os.path.join(directory, "synthetic_reviews.columns")
+    if shard["embeddings"].get("cache_dir"):
+        # The cache is append-only and single-writer, so shards running
+        # concurrently each get their own
+        shard["embeddings"]["cache_dir"] = os.path.join(directory, "embedding_cache")
+    if (shard.get("candidates") or {}).get("dir"):
+        shard["candidates"]["dir"] = os.path.join(directory, "candidates")
+    if outputs.get("trace_path"):
+        outputs["trace_path"] = os.path.join(directory, os.path.basename(cfg["outputs"]["trace_path"]))
+    return shard
+
+
+def find_shards(cfg: dict) -> int:
+    """
+    Number of shards found under `outputs.shard_dir`. Raises if the
+    directory holds an incomplete set or shards of different runs.
+    """
+    directory = cfg["outputs"].get("shard_dir", DEFAULT_SHARD_DIR)
+    found = [m for m in map(_SHARD_NAME.match, sorted(os.listdir(directory))) if m] \
+        if os.path.isdir(directory) else []
+    counts = {int(m.group(2)) for m in found}
+    if not found:
+        raise FileNotFoundError(f"No shards found in {directory}")
+    if len(counts) > 1:
+        raise ValueError(f"{directory} holds shards of runs with different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    missing = set(range(count)) - {int(m.group(1)) for m in found}
+    if missing:
+        raise ValueError(f"Missing shards in {directory}: {sorted(missing)}")
+    return count
+
+
+def merge_model_stats(shard_stats: list[dict]) -> dict:
+    """
+    Per-provider statistics summed over shards.
+    """
+    merged = {}
+    for stats in shard_stats:
+        for provider, s in stats.items():
+            total = merged.setdefault(provider, {"accepted": 0, "rejected": 0, "time": 0.0})
+            for key, value in s.items():
+                total[key] = total.get(key, 0) + value
+    return merged
+
+
+def _interleave(shards: list[tuple[list[dict], np.ndarray]]):
+    """
+    Yield (record, vector) pairs round-robin across shards, so no shard
+    is favoured when cross-shard duplicates are dropped.
+    """
+    longest = max((len(records) for records, _ in shards), default=0)
+    for i in range(longest):
+        for records, vectors in shards:
+            if i < len(records):
+                yield records[i], vectors[i]
+
+
+def dedup_merge(cfg: dict, shards: list[tuple[list[dict], np.ndarray]], model_stats: dict,
+                reasons: Optional[Counter] = None):
+    """
+    Merge shard datasets under global guardrails.
+
+    `shards` holds each shard's accepted records and their embeddings.
+    Records are visited round-robin across shards and kept only if they
+    pass the same dedup guardrails as during generation, against every
+    record kept before them: cosine similarity below
+    `semantic_similarity.threshold` and vocabulary overlap within
+    `vocabulary_overlap.threshold`. With quota sampling, records whose
+    (persona, rating) cell already holds its global quota are dropped
+    too, and the total is capped at `target_accepted`.
+
+    Similarities are computed a chunk of candidates at a time: one
+    matrix product against the kept records and one within the chunk,
+    followed by a sequential pass that gives exactly the result of
+    checking the records one by one.
+
+    Dropped records are moved from `accepted` to `rejected` in
+    `model_stats` (updated in place), or to `discarded` when dropped for
+    the target or a quota, which are not the model's doing, and, if
+    `reasons` is given, counted
+    there under the guardrail that dropped them ("target", "quota",
+    "semantic_similarity" or "vocabulary_overlap"). Returns the kept
+    records and their L2-normalized embeddings.
+    """
+    target = cfg["generation"]["target_accepted"]
+    threshold = cfg["guardrails"]["semantic_similarity"]["threshold"]
+    quotas = None
+    if cfg["generation"].get("sampling", "random") == "quota":
+        gen = cfg["generation"]
+        quotas = allocate_quotas(gen["rating_distribution"], gen["personas"], target)
+
+    index = EmbeddingIndex()
+    lexical = lexical_index_from_config(cfg["guardrails"]["vocabulary_overlap"])
+    filled = Counter()
+    kept = []
+
+    def drop(record, reason):
+        stats = model_stats.setdefault(record["model"], {"accepted": 0, "rejected": 0, "time": 0.0})
+        stats["accepted"] -= 1
+        key = "discarded" if reason in ("target", "quota") else "rejected"
+        stats[key] = stats.get(key, 0) + 1
+        if reasons is not None:
+            reasons[reason] += 1
+
+    pairs = _interleave(shards)
+    while True:
+        chunk = [pair for _, pair in zip(range(MERGE_CHUNK_SIZE), pairs)]
+        if not chunk:
+            break
+        vecs = _normalize(np.asarray([v for _, v in chunk], dtype=np.float32))
+        best = index.max_similarity_batch(vecs)
+        within = vecs @ vecs.T
+
+        kept_rows = []
+        for i, (record, _) in enumerate(chunk):
+            cell = (record["persona"], record["rating"])
+            if len(kept) >= target:
+                drop(record, "target")
+                continue
+            if quotas is not None and filled[cell] >= quotas.get(cell, 0):
+                drop(record, "quota")
+                continue
+            if best[i] >= threshold or (kept_rows and within[i, kept_rows].max() >= threshold):
+                drop(record, "semantic_similarity")
+                continue
+            if lexical.too_similar(record["review"]):
+                drop(record, "vocabulary_overlap")
+                continue
+            lexical.add(record["review"])
+            filled[cell] += 1
+            kept.append(record)
+            kept_rows.append(i)
+        index.add_batch(vecs[kept_rows])
+
+    return kept, index.matrix
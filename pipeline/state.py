@@ -0,0 +1,157 @@
+import os
+import json
+from typing import Optional
+
+from analysis.online_stats import OnlineStats
+from analysis.report import real_review_stats, write_stats_report
+from analysis.trace_stats import TraceStats
+from evaluation.diversity import EmbeddingIndex, lexical_index_from_config
+from pipeline.candidates import CandidateStore
+from pipeline.dataset import DatasetWriter, write_json_atomic
+from pipeline.tracing import TraceWriter
+
+
+def new_model_stats(cfg: dict) -> dict:
+    """
+    Empty per-provider statistics for the providers listed in `models`.
+    """
+    return {m["provider"]: {"accepted": 0, "rejected": 0, "discarded": 0, "time": 0.0} for m in cfg["models"]}
+
+
+class RunState:
+    """
+    Mutable state of one generation run: the accepted records, the dedup
+    indexes built from them and the per-provider statistics.
+
+    Accepted records are streamed to the dataset file as they are
+    accepted (when a writer is attached) and `model_stats` is
+    checkpointed to the run log every `outputs.checkpoint_every`
+    acceptances, so an interrupted run can be resumed with
+    `generate.py --resume`.
+
+    The dataset-level analysis is kept up to date in `stats` as reviews
+    are accepted, and the quality report is rewritten from it every
+    `outputs.report_every` acceptances and when the run closes.
+
+    Every finished attempt, accepted or not, is added to `candidates`
+    when a candidate pool is attached, and its trace event (see `trace`)
+    to `trace_stats` and, when a trace writer is attached, the trace
+    file.
+    """
+
+    def __init__(self, cfg: dict, writer: Optional[DatasetWriter] = None,
+                 model_stats: Optional[dict] = None, candidates: Optional[CandidateStore] = None,
+                 tracer: Optional[TraceWriter] = None, trace_stats: Optional[TraceStats] = None):
+        self.cfg = cfg
+        self.writer = writer
+        self.candidates = candidates
+        self.tracer = tracer
+        self.trace_stats = trace_stats or TraceStats()
+        self.accepted: list[dict] = []
+        self.embeddings = EmbeddingIndex()
+        self.lexical = lexical_index_from_config(cfg["guardrails"]["vocabulary_overlap"])
+        self.stats = OnlineStats()
+        self.model_stats = new_model_stats(cfg)
+        for provider, stats in (model_stats or {}).items():
+            self.model_stats.setdefault(provider, {}).update(stats)
+        self.checkpoint_every = cfg["outputs"].get("checkpoint_every", 0)
+        self.report_every = cfg["outputs"].get("report_every", 0)
+        self._real_stats: Optional[dict] = None
+
+    @property
+    def attempts(self) -> int:
+        return sum(s["accepted"] + s["rejected"] + s.get("discarded", 0) for s in self.model_stats.values())
+
+    def restore(self, records: list[dict], embeddings):
+        """
+        Seed the dedup state with records accepted by an earlier run.
+        `embeddings` holds one row per record, in the same order.
+        """
+        self.accepted.extend(records)
+        self.embeddings.add_batch(embeddings)
+        for r in records:
+            self.lexical.add(r["review"])
+        self.stats.update(records)
+
+    def record_time(self, provider: str, elapsed: float):
+        self.model_stats[provider]["time"] += elapsed
+
+    def reject(self, provider: str):
+        self.model_stats[provider]["rejected"] += 1
+
+    def discard(self, provider: str):
+        """
+        Count a review dropped for a reason that is not the model's
+        doing (see `generate.DISCARD_REASONS`), apart from its rejections.
+        """
+        stats = self.model_stats[provider]
+        stats["discarded"] = stats.get("discarded", 0) + 1
+
+    def trace(self, event: dict):
+        """
+        Record the trace event of a finished attempt, adding its token
+        usage and estimated cost to the provider's `model_stats` (and so
+        to the run log). Tokens of a batch call are counted on its first
+        review only.
+        """
+        if self.tracer is not None:
+            self.tracer.write(event)
+        self.trace_stats.add(event)
+        stats = self.model_stats[event["provider"]]
+        tokens = (event["input_tokens"], event["output_tokens"]) if event["slot"] == 0 else (0, 0)
+        for key, value in zip(("input_tokens", "output_tokens", "embedding_tokens", "cost"),
+                              tokens + (event["embedding_tokens"], event["cost"])):
+            stats[key] = stats.get(key, 0) + value
+
+    def accept(self, record: dict, embedding):
+        """
+        Add a record that passed every guardrail. Callers must run the
+        dedup guardrails and this method without yielding in between.
+        """
+        self.accepted.append(record)
+        self.embeddings.add(embedding)
+        self.lexical.add(record["review"])
+        self.model_stats[record["model"]]["accepted"] += 1
+        self.stats.add(record)
+
+        if self.writer is not None:
+            self.writer.write(record)
+        if self.checkpoint_every and len(self.accepted) % self.checkpoint_every == 0:
+            self.checkpoint()
+        if self.report_every and len(self.accepted) % self.report_every == 0:
+            self.write_report()
+
+    def checkpoint(self):
+        """
+        Atomically persist `model_stats` to the run log.
+        """
+        write_json_atomic(self.cfg["outputs"]["run_log_path"], self.model_stats)
+
+    def write_report(self):
+        """
+        Rewrite the quality report from the online statistics.
+        """
+        if self._real_stats is None:
+            self._real_stats = real_review_stats(self.cfg)
+        write_stats_report(self.stats, self._real_stats, self.model_stats, self.cfg["outputs"]["report_path"],
+                           trace_summary=self.trace_stats.summary())
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.candidates is not None:
+            self.candidates.close()
+        if self.tracer is not None:
+            self.tracer.close()
+        self.checkpoint()
+        self.write_report()
+
+
+def load_run_log(path: str) -> Optional[dict]:
+    """
+    Per-provider statistics checkpointed by an earlier run, if any.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
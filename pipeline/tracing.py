@@ -0,0 +1,65 @@
+import os
+import json
+from typing import Optional
+
+from pipeline.dataset import truncate_partial_line
+
+# Per-1M-token prices are configured per `models` entry (and on
+# `embeddings`) under `pricing`
+TOKENS_PER_PRICE_UNIT = 1_000_000
+
+
+def token_cost(pricing: Optional[dict], input_tokens: int, output_tokens: int = 0) -> float:
+    """
+    Estimated cost in USD of `input_tokens` / `output_tokens` under
+    `pricing` ({"input": ..., "output": ...}, USD per 1M tokens), or 0.0
+    without pricing.
+    """
+    if not pricing:
+        return 0.0
+    return (input_tokens * pricing.get("input", 0.0)
+            + output_tokens * pricing.get("output", 0.0)) / TOKENS_PER_PRICE_UNIT
+
+
+class TraceWriter:
+    """
+    Append-only JSONL trace of the generation attempts, one event per
+    review requested from a model (see `generate.trace_event` for the
+    fields). Every event is flushed as it is written; reopening with
+    `append` (`generate.py --resume`) drops a partial last line left by
+    an interrupted run.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if append:
+            truncate_partial_line(path)
+        self._file = open(path, "a" if append else "w")
+
+    def write(self, event: dict):
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def extend(self, events):
+        """
+        Write many events with a single flush, e.g. when copying traces.
+        """
+        for event in events:
+            self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_trace(path: str):
+    """
+    Yield the events of a trace file, skipping a partial last line.
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            yield json.loads(line)
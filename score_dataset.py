@@ -1,47 +1,40 @@
+import os
 import json
 import yaml
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 from tqdm import tqdm
 
 from evaluation.sentiment import rating_sentiment_ok
-from evaluation.diversity import vocab_overlap, too_similar_embedding
-from evaluation.realism import keyword_hits, has_drawback
-from models.openai_model import generate_embedding
-
-# --------------------------------------------------
-# Load configuration
-# --------------------------------------------------
-
-cfg = yaml.safe_load(open("config.yaml"))
-
-dataset_path = cfg["outputs"]["dataset_path"]
-output_path = "outputs/synthetic_reviews_scored.jsonl"
-
-# --------------------------------------------------
-# Load generated synthetic reviews
-# --------------------------------------------------
-
-reviews = []
-with open(dataset_path, "r") as f:
-    for line in f:
-        reviews.append(json.loads(line))
-
-# Keep track of embeddings already seen
-# (used for semantic diversity checks)
-
-embeddings = []
-
-scored_reviews = []
-
-# --------------------------------------------------
-# Score each review independently
-# --------------------------------------------------
-
-for r in tqdm(reviews):
+from evaluation.diversity import EmbeddingIndex, lexical_index_from_config
+from evaluation.realism import keyword_hits, has_drawback, realism_matchers
+from evaluation.features import review_features
+from models.embeddings import embed_config_texts, set_embedding_cache
+from models.embedding_cache import EmbeddingCache
+from models.provider import configure_providers
+from pipeline.dataset import iter_dataset_chunks
+from pipeline.columnar import open_columnar
+
+TOTAL_CHECKS = 5  # Total number of quality dimensions
+DEFAULT_CHUNK_SIZE = 1000
+
+# Config of the current worker process (set by `_init_worker`)
+_worker_cfg: Optional[dict] = None
+
+
+def content_checks_passed(record: dict, cfg: dict) -> int:
+    """
+    Number of order-independent checks (sentiment alignment, keyword
+    coverage, drawback presence) a review passes. Attaches the feature
+    record if the review does not have one yet.
+    """
     checks_passed = 0
-    total_checks = 5 # Total number of quality dimensions
-
-    review_text = r["review"]
-    rating = r["rating"]
+    review_text = record["review"]
+    rating = record["rating"]
+    features = review_features(record)
+    keywords, drawback_markers = realism_matchers(cfg)
 
     # 1️ Sentiment–rating alignment
     if rating_sentiment_ok(
@@ -49,60 +42,177 @@ for r in tqdm(reviews):
         rating,
         cfg["guardrails"]["sentiment"]["low_rating_positive_cutoff"],
         cfg["guardrails"]["sentiment"]["high_rating_negative_cutoff"],
+        polarity=features["polarity"],
     ):
         checks_passed += 1
-        
+
     # 2️ Domain realism (keyword coverage)
-    if keyword_hits(review_text, cfg["domain"]["keywords"]) >= cfg["guardrails"]["realism"]["min_keyword_hits"]:
+    if keyword_hits(review_text, keywords) >= cfg["guardrails"]["realism"]["min_keyword_hits"]:
         checks_passed += 1
 
     # 3️ Drawback presence for high ratings
     drawback_ok = True
     if rating >= 4 and cfg["guardrails"]["realism"]["require_drawback_for_high_ratings"]:
-        drawback_ok = has_drawback(review_text, cfg["guardrails"]["realism"]["drawback_markers"])
+        drawback_ok = has_drawback(review_text, drawback_markers)
 
     if drawback_ok:
         checks_passed += 1
 
-    # 4️ Semantic diversity (embedding similarity)
-    emb = generate_embedding(review_text, cfg["embeddings"]["model"])
-    if not too_similar_embedding(
-        emb,
-        embeddings,
-        cfg["guardrails"]["semantic_similarity"]["threshold"],
-    ):
-        checks_passed += 1
-
-    embeddings.append(emb)
-
-    # 5️ Vocabulary overlap check
-    vocab_ok = True
-    for prev in scored_reviews:
-        if vocab_overlap(review_text, prev["review"]) > cfg["guardrails"]["vocabulary_overlap"]["threshold"]:
-            vocab_ok = False
-            break
-
-    if vocab_ok:
-        checks_passed += 1
-
-    # --------------------------------------------------
-    # Final quality score
-    # --------------------------------------------------
-    # Since generation already applied strict filtering,
-    # most samples will score 1.0 (all checks passed).
-
-    quality_score = round(checks_passed / total_checks, 2)
-
-    r["quality_score"] = quality_score
-    scored_reviews.append(r)
-
-    # --------------------------------------------------
-    # Save scored dataset
-    # --------------------------------------------------
-
-with open(output_path, "w") as f:
-    for r in scored_reviews:
-        f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-print("Scoring complete.")
-
+    return checks_passed
+
+
+def _init_worker(cfg: dict):
+    global _worker_cfg
+    _worker_cfg = cfg
+
+
+def _score_chunk(chunk: list) -> list[tuple[dict, int]]:
+    """
+    Worker task: parse a chunk of JSONL lines (or take already decoded
+    records) and run the content checks on each review. Returns
+    (record, checks_passed) pairs in input order.
+    """
+    records = [json.loads(item) if isinstance(item, str) else item for item in chunk]
+    return [(r, content_checks_passed(r, _worker_cfg)) for r in records]
+
+
+def _ordered_results(executor, fn, chunks, window: int):
+    """
+    Map `fn` over `chunks` in `executor` and yield the results in input
+    order, keeping at most `window` chunks in flight so the input is
+    streamed rather than read into memory all at once.
+    """
+    in_flight = deque()
+    for chunk in chunks:
+        in_flight.append(executor.submit(fn, chunk))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def score_dataset(cfg: dict, dataset_path: Optional[str] = None, output_path: Optional[str] = None,
+                  workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Score every review of the generated dataset and write the scored
+    copy (each record plus `quality_score`, the share of the 5 quality
+    checks it passes).
+
+    The dataset is streamed in chunks of `chunk_size` reviews: from the
+    memory-mapped columnar bundle (`outputs.columnar_path`) when it is up
+    to date, reusing its stored embeddings, and from the JSONL file
+    otherwise. Parsing and the order-independent checks (sentiment,
+    keywords, drawback) run in a pool of `workers` processes (all cores
+    by default; 1 runs them in this process). The diversity checks
+    depend on every earlier review, so chunks are consumed in dataset
+    order: each chunk is embedded in batched requests (or read from the
+    bundle), compared against all earlier embeddings in one vectorized
+    step (`EmbeddingIndex.add_batch_scored`) and run through the
+    vocabulary-overlap index, then written out before the next chunk is
+    processed.
+
+    Returns a summary with the number of reviews scored and their mean
+    quality score.
+    """
+    dataset_path = dataset_path or cfg["outputs"]["dataset_path"]
+    output_path = output_path or cfg["outputs"].get("scored_path", "outputs/synthetic_reviews_scored.jsonl")
+    workers = workers or os.cpu_count() or 1
+    threshold = cfg["guardrails"]["semantic_similarity"]["threshold"]
+
+    # Keep track of embeddings and vocabularies already seen
+    # (used for the diversity checks)
+    embeddings = EmbeddingIndex()
+    lexical = lexical_index_from_config(cfg["guardrails"]["vocabulary_overlap"])
+
+    # Read records and embeddings from the columnar bundle when it mirrors
+    # this dataset and was embedded with the configured model; otherwise
+    # parse the JSONL and embed (through the embedding cache)
+    columnar = open_columnar(cfg, dataset_path)
+    if columnar is not None and columnar.embedding_model == cfg["embeddings"]["model"]:
+        chunks = (records for _, records in columnar.iter_chunks(chunk_size))
+    else:
+        columnar = None
+        chunks = iter_dataset_chunks(dataset_path, chunk_size)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cfg,))
+        results = _ordered_results(executor, _score_chunk, chunks, window=2 * workers)
+    else:
+        _init_worker(cfg)
+        results = map(_score_chunk, chunks)
+
+    scored, total_score = 0, 0.0
+    pbar = tqdm(unit="reviews")
+    try:
+        with open(output_path, "w") as f:
+            for chunk in results:
+                records = [r for r, _ in chunk]
+                if columnar is not None:
+                    vectors = columnar.embeddings[scored:scored + len(records)]
+                else:
+                    vectors = embed_config_texts([r["review"] for r in records], cfg["embeddings"])
+
+                # 4️ Semantic diversity (embedding similarity)
+                semantic_ok = embeddings.add_batch_scored(vectors) < threshold
+
+                for (r, checks_passed), semantic in zip(chunk, semantic_ok):
+                    checks_passed += int(semantic)
+
+                    # 5️ Vocabulary overlap check
+                    if not lexical.too_similar(r["review"]):
+                        checks_passed += 1
+                    lexical.add(r["review"])
+
+                    # Since generation already applied strict filtering,
+                    # most samples will score 1.0 (all checks passed).
+                    r["quality_score"] = round(checks_passed / TOTAL_CHECKS, 2)
+                    total_score += r["quality_score"]
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+                scored += len(records)
+                pbar.update(len(records))
+    finally:
+        pbar.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return {
+        "scored": scored,
+        "mean_quality_score": total_score / scored if scored else None,
+    }
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Score the generated dataset.")
+    parser.add_argument("--config", default="config.yaml",
+                        help="path to the run configuration (default: config.yaml)")
+    parser.add_argument("--input", help="dataset to score (default: outputs.dataset_path)")
+    parser.add_argument("--output", help="scored dataset path (default: outputs.scored_path)")
+    parser.add_argument("--workers", type=int,
+                        help="processes for the per-review checks (default: scoring.workers, else all cores)")
+    parser.add_argument("--chunk-size", type=int,
+                        help=f"reviews per chunk (default: scoring.chunk_size, else {DEFAULT_CHUNK_SIZE})")
+    args = parser.parse_args(argv)
+
+    cfg = yaml.safe_load(open(args.config))
+    configure_providers(cfg)
+
+    # Reuse the embeddings already paid for during generation
+    if cfg["embeddings"].get("cache_dir"):
+        set_embedding_cache(EmbeddingCache(cfg["embeddings"]["cache_dir"]))
+
+    scoring_cfg = cfg.get("scoring") or {}
+    summary = score_dataset(
+        cfg,
+        dataset_path=args.input,
+        output_path=args.output,
+        workers=args.workers or scoring_cfg.get("workers"),
+        chunk_size=args.chunk_size or scoring_cfg.get("chunk_size", DEFAULT_CHUNK_SIZE),
+    )
+
+    print("Scoring complete.")
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()